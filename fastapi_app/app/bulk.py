@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+import structlog
+
+from rag.chunking import chunk_text
+
+logger = structlog.get_logger("bulk")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class BulkLimitError(ValueError):
+    """The upload exceeded a configured size limit."""
+
+
+class NDJSONStream:
+    """Incrementally split a (optionally gzip'd) byte stream into NDJSON lines.
+
+    Gzip is detected from the magic bytes. Decompression is bounded per call,
+    so a small compressed body can't expand into unbounded memory.
+    """
+
+    def __init__(self, *, max_bytes: int, max_line_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_line_bytes = max_line_bytes
+        self.decompressed = 0
+        self._inflate: Any = None
+        self._sniffed = b""
+        self._buf = b""
+
+    def feed(self, data: bytes) -> list[bytes]:
+        if self._inflate is None:
+            self._sniffed += data
+            if len(self._sniffed) < 2:
+                return []
+            data, self._sniffed = self._sniffed, b""
+            gzipped = data[:2] == _GZIP_MAGIC
+            self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else False
+        if self._inflate is False:
+            return self._split(data)
+        lines: list[bytes] = []
+        while data:
+            out = self._inflate.decompress(data, self.max_line_bytes)
+            lines.extend(self._split(out))
+            data = self._inflate.unconsumed_tail
+        return lines
+
+    def close(self) -> list[bytes]:
+        tail = self._sniffed
+        if self._inflate is None:
+            self._inflate = False
+        if self._inflate is not False:
+            tail = self._inflate.flush()
+            if not self._inflate.eof:
+                raise zlib.error("truncated gzip stream")
+        lines = self._split(tail)
+        if self._buf.strip():
+            lines.append(self._buf)
+        self._buf = b""
+        return lines
+
+    def _split(self, data: bytes) -> list[bytes]:
+        self.decompressed += len(data)
+        if self.decompressed > self.max_bytes:
+            raise BulkLimitError("upload exceeds bulk_max_bytes")
+        *lines, self._buf = (self._buf + data).split(b"\n")
+        if len(self._buf) > self.max_line_bytes:
+            raise BulkLimitError("document line exceeds bulk_max_line_bytes")
+        return [ln for ln in lines if ln.strip()]
+
+
+@dataclass
+class BulkJob:
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "receiving"  # receiving | indexing | done | failed
+    bytes_received: int = 0
+    bytes_decompressed: int = 0
+    docs: int = 0
+    chunks: int = 0
+    batches: int = 0
+    refreshes: int = 0  # index rebuilds started, the final one included
+    errors: int = 0
+    error_samples: list[str] = field(default_factory=list)
+    generation: int | None = None
+    started: float = field(default_factory=time.perf_counter)
+    finished: float | None = None
+
+    def error(self, message: str) -> None:
+        self.errors += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(message)
+
+    def snapshot(self) -> dict[str, Any]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        rate = 1 / elapsed if elapsed > 0 else 0.0
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "bytes_received": self.bytes_received,
+            "bytes_decompressed": self.bytes_decompressed,
+            "docs": self.docs,
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "error_samples": list(self.error_samples),
+            "generation": self.generation,
+            "elapsed_s": round(elapsed, 3),
+            "docs_per_s": round(self.docs * rate, 1),
+            "chunks_per_s": round(self.chunks * rate, 1),
+            "mb_per_s": round(self.bytes_decompressed * rate / 1e6, 3),
+        }
+
+
+# apply(docs, metadata, chunks) adds a batch to the corpus, replacing the earlier
+# chunks of each source document in chunks (source id -> its new chunk ids);
+# refresh() schedules a rebuild of the live backends and returns futures
+# resolving to new generations
+ApplyFn = Callable[[list[tuple[str, str]], dict[str, dict[str, str]], dict[str, list[str]]], None]
+RefreshFn = Callable[[], dict[str, Future[int]]]
+
+
+class BulkLoader:
+    """Parse, chunk, and apply NDJSON line batches on a worker thread.
+
+    The request handler only splits lines and enqueues them; the bounded queue
+    pushes back on the upload when indexing falls behind. Rebuilds are
+    coalesced: after a batch a new one starts only once the previous finished
+    and ``refresh_interval`` seconds have passed, and a final one runs when the
+    upload ends. Each rebuild re-indexes the whole corpus (re-encoding every
+    embedding), so at most ``max_refreshes`` run mid-upload: a job costs a
+    bounded number of full rebuilds rather than one per interval.
+
+    A re-uploaded document replaces all of its previous chunks. Malformed lines
+    are skipped and counted in the job's errors. An upload that fails midway
+    (:meth:`abort`: a size limit, a broken gzip stream, a client disconnect)
+    is not rolled back: batches already applied stay in the corpus and are
+    published by the final rebuild, queued ones are dropped, and the job ends
+    ``failed`` with ``docs`` counting what was applied.
+    """
+
+    def __init__(
+        self,
+        job: BulkJob,
+        *,
+        apply: ApplyFn,
+        refresh: RefreshFn,
+        max_chars: int = 800,
+        overlap: int = 120,
+        queue_batches: int = 4,
+        refresh_interval: float = 5.0,
+        max_refreshes: int = 3,
+    ) -> None:
+        self.job = job
+        self.apply = apply
+        self.refresh = refresh
+        self.max_chars = max_chars
+        self.overlap = overlap
+        self.refresh_interval = refresh_interval
+        self.max_refreshes = max_refreshes
+        self._last_refresh = time.perf_counter()
+        self._queue: queue.Queue[list[bytes] | None] = queue.Queue(maxsize=queue_batches)
+        self._pending: dict[str, Future[int]] = {}
+        self._aborted = False
+        self._thread = threading.Thread(target=self._run, name=f"bulk-{job.id[:8]}", daemon=True)
+        self._thread.start()
+
+    def put(self, lines: list[bytes]) -> None:
+        """Enqueue one batch of raw lines (blocks while the queue is full)."""
+        self._queue.put(lines)
+
+    def finish(self) -> None:
+        """Signal the end of the upload; indexing continues in the background."""
+        if self.job.status == "receiving":
+            self.job.status = "indexing"
+        self._queue.put(None)
+
+    def abort(self, message: str) -> None:
+        """End a failed upload instead of :meth:`finish`: batches not applied yet are skipped."""
+        self.job.error(message)
+        self.job.status = "failed"
+        self._aborted = True
+        # The worker skips whatever is still queued, so this waits at most for one batch
+        self._queue.put(None)
+
+    def join(self, timeout: float | None = None) -> None:
+        self._thread.join(timeout)
+
+    def _parse(self, line: bytes) -> tuple[str, list[tuple[str, str]], dict[str, dict[str, str]]]:
+        rec = json.loads(line)
+        if not isinstance(rec, dict):
+            raise ValueError("record must be a JSON object")
+        doc_id, text, extra = rec.get("id"), rec.get("text"), rec.get("metadata") or {}
+        if not isinstance(doc_id, str) or not doc_id or not isinstance(text, str):
+            raise ValueError("record needs string 'id' and 'text'")
+        if not isinstance(extra, dict):
+            raise ValueError("'metadata' must be an object")
+        chunks = chunk_text(doc_id, text, max_chars=self.max_chars, overlap=self.overlap)
+        docs: list[tuple[str, str]] = []
+        meta: dict[str, dict[str, str]] = {}
+        for n, c in enumerate(chunks):
+            chunk_id = doc_id if len(chunks) == 1 else f"{doc_id}#{n}"
+            docs.append((chunk_id, c.text))
+            fields = {**{str(k): str(v) for k, v in extra.items()}, "doc_id": doc_id}
+            if c.heading:
+                fields["heading"] = c.heading
+            meta[chunk_id] = fields
+        return doc_id, docs, meta
+
+    def _run(self) -> None:
+        job = self.job
+        line_no = 0
+        try:
+            while (lines := self._queue.get()) is not None:
+                if self._aborted:
+                    continue
+                # A document repeated within the batch keeps only its last version
+                parsed: dict[str, tuple[list[tuple[str, str]], dict[str, dict[str, str]]]] = {}
+                for line in lines:
+                    line_no += 1
+                    try:
+                        doc_id, d, m = self._parse(line)
+                    except ValueError as exc:  # includes JSON and UTF-8 errors
+                        job.error(f"line {line_no}: {exc}")
+                        continue
+                    parsed.pop(doc_id, None)
+                    parsed[doc_id] = (d, m)
+                    job.docs += 1
+                docs = [doc for d, _ in parsed.values() for doc in d]
+                meta = {k: v for _, m in parsed.values() for k, v in m.items()}
+                if docs:
+                    chunks = {doc_id: [c for c, _ in d] for doc_id, (d, _) in parsed.items()}
+                    self.apply(docs, meta, chunks)
+                    job.chunks += len(docs)
+                job.batches += 1
+                now = time.perf_counter()
+                if (
+                    job.refreshes < self.max_refreshes
+                    and now - self._last_refresh >= self.refresh_interval
+                    and all(f.done() for f in self._pending.values())
+                ):
+                    self._pending = self.refresh()
+                    self._last_refresh = now
+                    job.refreshes += 1
+            for fut in self._pending.values():
+                fut.result()
+            generations = [f.result() for f in self.refresh().values()]
+            job.refreshes += 1
+            job.generation = max(generations) if generations else None
+            if job.status != "failed":
+                job.status = "done"
+        except Exception as exc:  # pragma: no cover - surfaced via job status
+            logger.exception("bulk_failed", job_id=job.id)
+            job.error(repr(exc))
+            job.status = "failed"
+        finally:
+            job.finished = time.perf_counter()
+
+
+class BulkJobs:
+    """Most recent bulk jobs by id (bounded, oldest evicted first)."""
+
+    def __init__(self, max_jobs: int = 100) -> None:
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, BulkJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job: BulkJob) -> None:
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> BulkJob | None:
+        return self._jobs.get(job_id)
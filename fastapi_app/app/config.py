@@ -21,19 +21,124 @@ class Settings(BaseSettings):
 
     # Protection
     rate_limit_qps: float = 5.0
+    # Client IPs or CIDRs the per-IP limit doesn't apply to, e.g. a coordinator in front
+    # of this node: it is one client carrying everyone's searches
+    rate_limit_exempt_clients: list[str] = Field(default_factory=list)
     request_body_max_bytes: int = 100_000
     fuzz_mode: bool = False
+    # Adaptive concurrency limit: AIMD on successful search latency (cut by 10% when the
+    # smoothed latency exceeds concurrency_latency_tolerance x its 10 s minimum). Requests over
+    # the limit queue by class (health/ready bypass, then search, then bulk/rebuild or
+    # X-Priority: batch) and are shed with 503 + Retry-After when the queue is full or
+    # they've waited concurrency_queue_timeout_ms
+    concurrency_limit_enabled: bool = True
+    concurrency_limit_initial: int = 32
+    concurrency_limit_min: int = 4
+    concurrency_limit_max: int = 256
+    concurrency_queue_size: int = 128
+    concurrency_queue_timeout_ms: float = 1000.0
+    concurrency_latency_tolerance: float = 2.0
+    concurrency_retry_after_s: int = 1
 
     # Observability
     metrics_enabled: bool = True
+    # Saturation metrics (with metrics_enabled): an event-loop lag probe every
+    # loop_lag_interval_ms (0 = off) that also samples the worker threadpool, and GC pause
+    # timing. gc_freeze_indexes collects the young generations and calls gc.freeze() after
+    # each index is published
+    loop_lag_interval_ms: float = 100.0
+    gc_pause_metrics: bool = True
+    gc_freeze_indexes: bool = False
+    # /api/v1/debug/* (behind require_auth): on-demand stack sampling and the slow-request
+    # log. Requests slower than slow_request_ms (0 = off) are kept with their stage timings
+    # and query parameters, newest slow_request_log_size only, whether or not it's enabled
+    debug_endpoints: bool = False
+    debug_profile_max_seconds: float = 30.0
+    slow_request_ms: float = 1000.0
+    slow_request_log_size: int = 256
     json_logs: bool = True
     log_level: str = "INFO"
+    # Rendered log lines go through a queue of log_queue_size (0 = write synchronously) to a
+    # thread that writes up to log_batch_size at a time; a full queue drops them.
+    # log_access_sample_rate keeps that fraction of successful, non-slow access logs
+    log_queue_size: int = 10000
+    log_batch_size: int = 256
+    log_access_sample_rate: float = 1.0
     request_id_header: str = "X-Request-ID"
 
     # Retrieval
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
     hybrid_alpha: float = 0.5
     use_dummy_embeddings: bool = True
+    # Process-wide LRU of query vectors shared by embed and hybrid; 0 disables it
+    query_embedding_cache_bytes: int = 16 * 1024 * 1024
+    # /search deadline: timeout_ms parameter, else this header, else the default (0 = none).
+    # Counted from arrival; legs still running at the deadline are abandoned (partial: true)
+    search_timeout_ms: float = 5000.0
+    search_timeout_header: str = "X-Request-Timeout-Ms"
+    # Opt-in semantic result cache for /search: a query at least this cosine-similar to a
+    # cached one (same backend, k and filters, same index generation) gets its results.
+    # Embeds with semantic_cache_model ("hashing" needs no download)
+    semantic_cache: bool = False
+    semantic_cache_threshold: float = 0.97
+    semantic_cache_entries: int = 1024
+    semantic_cache_model: str = "hashing"
+    # backend=cascade: rescore at most this many BM25 candidates with embeddings, fewer when
+    # the request's budget_ms (or this default budget) can't afford them
+    cascade_candidates: int = 200
+    cascade_budget_ms: float | None = None
+    # Second-stage re-ranking of each /search's top rerank_candidates hits: "" (off),
+    # "proximity" (offline lexical) or a sentence-transformers cross-encoder model. Scores
+    # rerank_batch_size docs at a time until rerank_budget_ms runs out; the rest keep their order.
+    # Requests opt in with rerank=true; rerank_default makes that the default for every request
+    rerank_scorer: str = ""
+    rerank_default: bool = False
+    rerank_candidates: int = 50
+    rerank_batch_size: int = 16
+    rerank_budget_ms: float | None = 50.0
+    bm25_shards: int = 1  # >1 searches BM25 shards in parallel worker processes
+    # Static pruning: keep this fraction of BM25 postings by impact ("term" | "doc" centric)
+    bm25_prune_keep: float = 1.0
+    bm25_prune_method: str = "term"
+    # Built in the background at startup; until ready, embed answers 503 + Retry-After and
+    # hybrid degrades to BM25-only results
+    warmup_backends: list[str] = Field(default_factory=lambda: ["bm25", "embed", "hybrid"])
+    warmup_retry_after_s: int = 5
+    # Background BM25 rebuilds (POST /index/rebuild) in a niced subprocess, not a thread
+    index_rebuild_processes: bool = False
+
+    # Multi-node: a node serves one hash partition ("i/n") of the corpus, and a
+    # coordinator (coordinator_shards set) fans /search out to the nodes instead
+    corpus_partition: str | None = None
+    coordinator_shards: list[str] = Field(default_factory=list)  # "url|replica-url", ...
+    coordinator_timeout_ms: float = 500.0
+    coordinator_hedge_ms: float = 100.0
+    coordinator_max_connections: int = 100
+
+    # Document store (result hydration); unset keeps documents in a dict
+    docstore_path: str | None = None
+    docstore_cache_bytes: int = 8 * 1024 * 1024
+    docstore_block_bytes: int = 64 * 1024
+    docstore_codec: str = "zlib"  # zlib | lzma | none
+
+    # Bulk upload (POST /documents:bulk); limits apply to the decompressed stream
+    bulk_max_bytes: int = 2 * 1024**3
+    bulk_max_line_bytes: int = 1024 * 1024
+    bulk_batch_docs: int = 1000
+    bulk_chunk_chars: int = 800
+    bulk_chunk_overlap: int = 120
+    bulk_refresh_interval_s: float = 5.0  # min gap between mid-upload index rebuilds
+    # Each rebuild re-indexes the whole corpus; cap them per job (0: only at the end)
+    bulk_max_refreshes: int = 3
+
+    # Named collections (/collections/{name}/search): <dir>/<name>/docs.ndjson, loaded on
+    # demand and unloaded least-recently-used first beyond the shared memory budget
+    collections_dir: str | None = None
+    collections_memory_bytes: int = 512 * 1024 * 1024
+
+    # Snippets (search?snippet=true)
+    snippet_chars: int = 240
+    snippet_max_total_chars: int = 2000
 
 
 settings = Settings()
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+import structlog
+
+from rag.backends.bm25 import global_idf
+
+logger = structlog.get_logger("coordinator")
+
+
+@dataclass
+class ShardOutcome:
+    shard: str
+    status: str  # ok | timeout | error
+    duration_ms: float
+    hedged: bool = False
+    generation: int | None = None
+    partial: bool = False
+    body: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def results(self) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = self.body.get("results", [])
+        return results
+
+
+class Coordinator:
+    """Scatter a search over remote shard services and gather the merged top-k.
+
+    Each entry of ``shards`` is one partition; ``|``-separated URLs inside an
+    entry are replicas of that partition. Every shard gets ``timeout_ms`` to
+    answer. When the first attempt has not answered after ``hedge_ms`` (or has
+    failed), a second attempt goes to the next replica (the same URL if there is
+    only one) and whichever answers first wins. Shards that miss the deadline
+    are left out and the response is marked degraded.
+
+    Nodes compute BM25 over their own partition, so their raw scores aren't
+    comparable. A search first gathers every node's document and token counts
+    and the df of the query's terms (``/search/stats``), then has all nodes
+    score with the same collection-wide idf and average length. Terms in more
+    than half the documents get the floored idf of :func:`global_idf`, which
+    uses an estimate of the collection's mean idf, so their contribution
+    can differ slightly from one index over the whole corpus.
+    """
+
+    def __init__(
+        self,
+        shards: list[str],
+        *,
+        timeout_ms: float = 500.0,
+        hedge_ms: float = 100.0,
+        max_connections: int = 100,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.shards = [[u.strip().rstrip("/") for u in s.split("|") if u.strip()] for s in shards]
+        self.timeout_ms = timeout_ms
+        self.hedge_ms = hedge_ms
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(timeout_ms / 1000),
+            transport=transport,
+        )
+
+    async def _fetch(self, url: str, path: str, params: dict[str, Any]) -> dict[str, Any]:
+        resp = await self._client.get(f"{url}{path}", params=params)
+        resp.raise_for_status()
+        body: dict[str, Any] = resp.json()
+        return body
+
+    async def _query_shard(
+        self,
+        replicas: list[str],
+        params: dict[str, Any],
+        deadline: float,
+        path: str = "/api/v1/search",
+    ) -> ShardOutcome:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        hedge_at = start + self.hedge_ms / 1000 if self.hedge_ms > 0 else None
+        first = asyncio.ensure_future(self._fetch(replicas[0], path, params))
+        replica_of = {first: replicas[0]}
+        pending = {first}
+        hedged = False
+        error: BaseException | None = None
+        failed = replicas[0]
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    break
+                wait = deadline - now
+                if not hedged and hedge_at is not None:
+                    wait = min(wait, max(0.0, hedge_at - now))
+                done, pending = await asyncio.wait(
+                    pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        body = task.result()
+                        return ShardOutcome(
+                            shard=replica_of[task],
+                            status="ok",
+                            duration_ms=(loop.time() - start) * 1000,
+                            hedged=hedged,
+                            generation=body.get("generation"),
+                            partial=bool(body.get("partial")),
+                            body=body,
+                        )
+                    error = task.exception()
+                    failed = replica_of[task]
+                if not hedged and hedge_at is not None and (loop.time() >= hedge_at or not pending):
+                    hedged = True
+                    backup = replicas[1 % len(replicas)]
+                    task = asyncio.ensure_future(self._fetch(backup, path, params))
+                    replica_of[task] = backup
+                    pending.add(task)
+        finally:
+            for task in pending:
+                task.cancel()
+        status = (
+            "timeout" if error is None or isinstance(error, httpx.TimeoutException) else "error"
+        )
+        if error is not None:
+            logger.warning("shard_failed", shard=failed, error=repr(error))
+        return ShardOutcome(
+            shard=failed,
+            status=status,
+            duration_ms=(loop.time() - start) * 1000,
+            hedged=hedged,
+        )
+
+    async def search(
+        self,
+        q: str,
+        *,
+        backend: str,
+        k: int,
+        snippet: bool = False,
+        filters: list[str] | None = None,
+        timeout_ms: float | None = None,
+    ) -> dict[str, Any]:
+        """Scatter the search and merge what the shards return in time.
+
+        *timeout_ms* (what is left of the caller's deadline) tightens the
+        per-shard timeout, covering both rounds, and is passed on, so shards stop
+        working once nobody waits for their answer. Only ``bm25`` is supported.
+        The statistics round gets at most half the budget; shards that miss it
+        are still searched, with the statistics of the others, and the response
+        is marked degraded.
+        """
+        if backend != "bm25":
+            raise ValueError(f"coordinator can't merge {backend} scores")
+        loop = asyncio.get_running_loop()
+        budget_ms = self.timeout_ms if timeout_ms is None else min(self.timeout_ms, timeout_ms)
+        deadline = loop.time() + budget_ms / 1000
+        t0 = time.perf_counter()
+        # The counting round may take half the budget; the search gets the rest
+        counting_deadline = loop.time() + budget_ms / 2000
+        counted = await asyncio.gather(
+            *(
+                self._query_shard(replicas, {"q": q}, counting_deadline, "/api/v1/search/stats")
+                for replicas in self.shards
+            )
+        )
+        remaining_ms = max(0.0, (deadline - loop.time()) * 1000)
+        params: dict[str, Any] = {
+            "q": q,
+            "backend": backend,
+            "k": k,
+            "timeout_ms": round(max(remaining_ms, 1.0), 3),
+            "rerank": "false",  # node rankings would no longer follow their scores
+        }
+        stats = _merge_term_stats([o.body for o in counted if o.status == "ok"])
+        if stats is not None:
+            params["global_stats"] = json.dumps(stats)
+        if snippet:
+            params["snippet"] = "true"
+        if filters:
+            params["filter"] = filters
+        outcomes = await asyncio.gather(
+            *(self._query_shard(replicas, params, deadline) for replicas in self.shards)
+        )
+        merged: dict[str, dict[str, Any]] = {}
+        for outcome in outcomes:
+            for hit in outcome.results:
+                prev = merged.get(hit["doc_id"])
+                if prev is None or hit["score"] > prev["score"]:
+                    merged[hit["doc_id"]] = hit
+        results = sorted(merged.values(), key=lambda h: (-h["score"], h["doc_id"]))[:k]
+        return {
+            "query": q,
+            "backend": backend,
+            "results": results,
+            "degraded": any(o.status != "ok" for o in [*counted, *outcomes]),
+            "partial": any(o.status != "ok" or o.partial for o in outcomes),
+            "shards": [
+                {
+                    "shard": o.shard,
+                    "status": o.status,
+                    "duration_ms": round(o.duration_ms, 2),
+                    "hedged": o.hedged,
+                    "generation": o.generation,
+                    "stats": c.status,
+                }
+                for o, c in zip(outcomes, counted, strict=True)
+            ],
+            "duration_ms": round((time.perf_counter() - t0) * 1000, 2),
+        }
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def _merge_term_stats(bodies: list[dict[str, Any]]) -> dict[str, Any] | None:
+    """Collection-wide BM25 ``idf``/``avgdl`` from the nodes' ``/search/stats`` answers."""
+    n_docs = sum(b["docs"] for b in bodies)
+    if not n_docs:
+        return None
+    df: dict[str, int] = {}
+    for body in bodies:
+        for term, f in body["df"].items():
+            df[term] = df.get(term, 0) + f
+    # Each node's mean covers its own vocabulary; weight them by partition size
+    mean_idf = sum(b["mean_idf"] * b["docs"] for b in bodies) / n_docs
+    return {
+        "idf": global_idf(df, n_docs, mean_idf),
+        "avgdl": sum(b["tokens"] for b in bodies) / n_docs,
+    }
@@ -0,0 +1,179 @@
+"""In-process diagnostics: a statistical stack sampler and a slow-request log.
+
+:class:`StackSampler` polls every thread's Python stack with
+:func:`sys._current_frames` at a fixed interval, so it needs no profiler
+hooks and costs nothing while not running. Samples are reported as collapsed
+stacks (``thread;outer;...;inner count`` lines, for flamegraph tools) or as a
+speedscope "sampled" profile with one profile per thread.
+
+:class:`SlowRequestLog` keeps the most recent requests slower than a
+threshold, with their stage timings and query parameters, in a bounded ring
+buffer.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Mapping, Sequence
+from types import FrameType
+from typing import Any
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Leaf frames in these modules are threads parked on a lock, queue or selector
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "base_events.py")
+
+Frame = tuple[str, str, int]  # function, file, first line
+
+
+def _stack(frame: FrameType | None) -> tuple[Frame, ...]:
+    frames: list[Frame] = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    frames.reverse()  # outermost first
+    return tuple(frames)
+
+
+class StackSampler:
+    """Sample all threads' stacks every *interval_s* for a while, then report them."""
+
+    def __init__(self, *, interval_s: float = 0.005, include_idle: bool = False) -> None:
+        if interval_s <= 0:
+            raise ValueError("interval_s must be positive")
+        self.interval_s = interval_s
+        self.include_idle = include_idle
+        self.samples: Counter[tuple[str, tuple[Frame, ...]]] = Counter()
+        self.ticks = 0
+        self.duration_s = 0.0
+
+    def run(self, seconds: float) -> StackSampler:
+        """Sample for *seconds* on the calling thread (which is left out)."""
+        me = threading.get_ident()
+        start = time.perf_counter()
+        deadline = start + seconds
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = _stack(frame)
+                if not stack or (not self.include_idle and stack[-1][1].endswith(_IDLE_FILES)):
+                    continue
+                self.samples[(names.get(ident, str(ident)), stack)] += 1
+            self.ticks += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(min(self.interval_s, deadline - now))
+        self.duration_s = time.perf_counter() - start
+        return self
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: one ``thread;frame;...;frame count`` line per stack."""
+        lines = []
+        for (thread, stack), count in self.samples.most_common():
+            frames = ";".join(f"{name} ({path}:{line})" for name, path, line in stack)
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def speedscope(self, name: str = "profile") -> dict[str, Any]:
+        """A speedscope file with a sampled profile per thread, weighted in seconds."""
+        index: dict[Frame, int] = {}
+        frames: list[dict[str, Any]] = []
+        by_thread: dict[str, tuple[list[list[int]], list[float]]] = {}
+        for (thread, stack), count in sorted(self.samples.items()):
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples, weights = by_thread.setdefault(thread, ([], []))
+            samples.append(ids)
+            weights.append(count * self.interval_s)
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "rag-debug-profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": thread,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+                for thread, (samples, weights) in by_thread.items()
+            ],
+        }
+
+
+class SlowRequestLog:
+    """The last *capacity* requests slower than *threshold_ms* (0 records nothing)."""
+
+    def __init__(self, threshold_ms: float, capacity: int = 256, *, max_value_chars: int = 200):
+        self.threshold_ms = threshold_ms
+        self.capacity = max(1, capacity)
+        self.max_value_chars = max_value_chars
+        self._entries: deque[dict[str, Any]] = deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(
+        self,
+        *,
+        request_id: str,
+        method: str,
+        path: str,
+        status: int,
+        duration_ms: float,
+        params: Sequence[tuple[str, str]],
+        stages: Mapping[str, float] | None = None,
+    ) -> bool:
+        """Keep the request if it was slow enough; True if it was kept.
+
+        *params* are the query parameters in order; a repeated one is kept as a list.
+        """
+        if not self.threshold_ms or duration_ms < self.threshold_ms:
+            return False
+        kept: dict[str, Any] = {}
+        for key, value in params:
+            value = value[: self.max_value_chars]
+            if key not in kept:
+                kept[key] = value
+            elif isinstance(kept[key], list):
+                kept[key].append(value)
+            else:
+                kept[key] = [kept[key], value]
+        entry = {
+            "request_id": request_id,
+            "at": time.time(),
+            "method": method,
+            "path": path,
+            "status": status,
+            "duration_ms": round(duration_ms, 3),
+            "params": kept,
+            "stages_ms": {name: round(s * 1000, 3) for name, s in (stages or {}).items()},
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+        return True
+
+    def entries(self, limit: int | None = None) -> list[dict[str, Any]]:
+        """Newest first."""
+        with self._lock:
+            newest = list(reversed(self._entries))
+        return newest if limit is None else newest[:limit]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
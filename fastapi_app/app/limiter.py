@@ -0,0 +1,233 @@
+"""Adaptive concurrency limit with a bounded priority queue for load shedding.
+
+:class:`ConcurrencyLimiter` admits at most ``limit`` requests at once. The
+limit follows AIMD on observed latency. Samples are smoothed (an EWMA with
+weight ``smoothing``), so a mix of cheap and expensive requests averages
+out; the baseline is the lowest smoothed latency over the last ``window_s``
+seconds. When the smoothed latency exceeds ``tolerance`` times the baseline
+the limit is cut by ``backoff``, at most once per ``1 / smoothing`` samples
+(the time the smoothed value takes to reflect the cut); otherwise, while the
+limit is actually in use, it grows by about one per limit's worth of
+completions.
+
+Requests over the limit wait in a queue served by priority class, then
+arrival. When the queue is full a newcomer displaces the newest waiter of a
+lower class, or is shed; waiters are also shed after ``queue_timeout_s``.
+``CRITICAL`` requests (health and readiness probes) bypass the limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+CRITICAL, INTERACTIVE, BATCH = 0, 1, 2
+PRIORITY_NAMES = ("critical", "interactive", "batch")
+
+CRITICAL_PATHS = frozenset({"/api/v1/health", "/health", "/ready", "/api/v1/ready", "/metrics"})
+BATCH_PATHS = ("/api/v1/documents:bulk", "/api/v1/index/rebuild", "/api/v1/debug/")
+PRIORITY_HEADER = "X-Priority"
+
+
+def is_sampled(path: str) -> bool:
+    """Whether latency of *path* feeds the limit: only searches, whose cost it protects."""
+    return path == "/api/v1/search" or (
+        path.startswith("/api/v1/collections/") and path.endswith("/search")
+    )
+
+
+def priority_for(path: str, headers: Mapping[str, str]) -> int:
+    """Priority class of a request; a client may only lower its own (``X-Priority: batch``)."""
+    if path in CRITICAL_PATHS:
+        return CRITICAL
+    if path.startswith(BATCH_PATHS) or headers.get(PRIORITY_HEADER, "").lower() == "batch":
+        return BATCH
+    return INTERACTIVE
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    loop: asyncio.AbstractEventLoop = field(compare=False)
+    future: asyncio.Future[bool] = field(compare=False)
+    state: str = field(default="waiting", compare=False)  # waiting | granted | shed
+
+
+def _resolve(future: asyncio.Future[bool], admitted: bool) -> None:
+    if not future.done():
+        future.set_result(admitted)
+
+
+class ConcurrencyLimiter:
+    """AIMD concurrency limit in front of a bounded priority queue.
+
+    Safe to share between event loops (e.g. test clients on portal threads):
+    state is guarded by a lock and waiters are woken on their own loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial: int = 32,
+        min_limit: int = 4,
+        max_limit: int = 256,
+        queue_size: int = 128,
+        queue_timeout_s: float = 1.0,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        smoothing: float = 0.1,
+        window_s: float = 10.0,
+    ) -> None:
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("need 1 <= min_limit <= initial <= max_limit")
+        if tolerance <= 1 or not 0 < backoff < 1:
+            raise ValueError("tolerance must be > 1 and backoff in (0, 1)")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout_s = queue_timeout_s
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.window_s = window_s
+        self.smoothed_s: float | None = None
+        self.baseline_s: float | None = None  # no-load latency estimate
+        # (time, smoothed latency) with increasing latencies: a sliding-window minimum
+        self._minima: deque[tuple[float, float]] = deque()
+        self._since_cut = 0
+        self._inflight = 0
+        self._queue: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.admitted = [0, 0, 0]  # per priority class
+        self.shed = [0, 0, 0]
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @property
+    def queued(self) -> int:
+        with self._lock:
+            return self._waiting()
+
+    def _waiting(self) -> int:
+        return sum(w.state == "waiting" for w in self._queue)
+
+    def _has_room(self) -> bool:
+        return self._inflight < int(self.limit)
+
+    async def acquire(self, priority: int) -> bool:
+        """Wait for a slot; False if the request was shed instead."""
+        with self._lock:
+            if priority == CRITICAL or (self._has_room() and not self._waiting()):
+                self._inflight += 1
+                self.admitted[priority] += 1
+                return True
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(priority, next(self._seq), loop, loop.create_future())
+            if not self._enqueue(waiter):
+                self.shed[priority] += 1
+                return False
+        try:
+            admitted = await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout_s)
+        except TimeoutError:
+            admitted = False
+        except asyncio.CancelledError:
+            self._withdraw(waiter)
+            raise
+        with self._lock:
+            if waiter.state == "granted":
+                self.admitted[priority] += 1
+                return True
+            if waiter.state == "waiting":  # timed out in the queue
+                waiter.state = "shed"
+            self.shed[priority] += 1
+            return admitted
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        live = [w for w in self._queue if w.state == "waiting"]
+        if len(self._queue) > 2 * len(live) + 16:
+            # Drop waiters that timed out or were displaced since the last dispatch
+            self._queue = live[:]
+            heapq.heapify(self._queue)
+        if len(live) >= self.queue_size:
+            victim = max(live, default=None)  # lowest class, newest arrival
+            if victim is None or victim.priority <= waiter.priority:
+                return False
+            self._shed_waiter(victim)
+        heapq.heappush(self._queue, waiter)
+        return True
+
+    def _shed_waiter(self, waiter: _Waiter) -> None:
+        waiter.state = "shed"
+        waiter.loop.call_soon_threadsafe(_resolve, waiter.future, False)
+
+    def _withdraw(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.state == "granted":
+                self._release_slot()
+            waiter.state = "shed"
+
+    def _release_slot(self) -> None:
+        self._inflight -= 1
+        while self._queue and self._has_room():
+            waiter = heapq.heappop(self._queue)
+            if waiter.state != "waiting":
+                continue
+            waiter.state = "granted"
+            self._inflight += 1
+            waiter.loop.call_soon_threadsafe(_resolve, waiter.future, True)
+
+    def release(self, latency_s: float | None = None) -> None:
+        """Free a slot; *latency_s* (if given) is a sample for the limit."""
+        with self._lock:
+            if latency_s is not None:
+                self._observe(latency_s, self._inflight)
+            self._release_slot()
+
+    def _observe(self, latency_s: float, inflight: int, now: float | None = None) -> None:
+        now = time.monotonic() if now is None else now
+        smoothed = self.smoothed_s
+        if smoothed is None:
+            smoothed = latency_s
+        else:
+            smoothed += self.smoothing * (latency_s - smoothed)
+        self.smoothed_s = smoothed
+        minima = self._minima
+        while minima and minima[-1][1] >= smoothed:
+            minima.pop()
+        minima.append((now, smoothed))
+        while minima[0][0] < now - self.window_s:
+            minima.popleft()
+        self.baseline_s = baseline = minima[0][1]
+        self._since_cut += 1
+        if smoothed > self.tolerance * baseline:
+            if self._since_cut * self.smoothing >= 1:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                self._since_cut = 0
+        elif inflight >= self.limit / 2:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "inflight": self._inflight,
+                "queued": self._waiting(),
+                "baseline_ms": (self.baseline_s or 0.0) * 1000,
+                "smoothed_ms": (self.smoothed_s or 0.0) * 1000,
+                "admitted": dict(zip(PRIORITY_NAMES, self.admitted, strict=True)),
+                "shed": dict(zip(PRIORITY_NAMES, self.shed, strict=True)),
+            }
@@ -1,35 +1,192 @@
+"""structlog JSON logging through a bounded queue and a background writer.
+
+A request thread runs the structlog processors (level filter, logger name,
+timestamp, access-log sampling, so dropped samples are never rendered),
+renders the line and enqueues it. Rendering at the call, as
+``QueueHandler.prepare`` does, means arguments changed afterwards can't leak
+into the log. A ``log-writer`` thread drains the queue in batches and writes
+each batch to stdout in one call. When the queue is full the line is dropped
+and counted rather than blocking the request (``log_queue_size=0`` logs
+synchronously instead).
+"""
+
 from __future__ import annotations
 
 import logging
+import queue
+import random
 import sys
+import threading
+from collections.abc import Callable, MutableMapping
+from typing import IO, Any
 
 import structlog
 from structlog.types import Processor
 
 from .config import Settings
 
+ACCESS_LOGGER = "access"
+
+_handler: QueueLogHandler | None = None
+_sampler: AccessLogSampler | None = None
+
+
+class AccessLogSampler:
+    """Keep a *rate* fraction of successful access logs; errors and slow requests always.
+
+    A request is an error at status 400 and up and slow at ``duration_ms`` of
+    *slow_ms* and up (0: none are). Kept samples carry ``sample_rate`` so
+    counts can be re-weighted.
+    """
+
+    def __init__(
+        self, rate: float, slow_ms: float = 0.0, *, rng: Callable[[], float] = random.random
+    ) -> None:
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.slow_ms = slow_ms
+        self._rng = rng
+        self.sampled_out = 0
+
+    def __call__(
+        self, logger: Any, method_name: str, event_dict: MutableMapping[str, Any]
+    ) -> MutableMapping[str, Any]:
+        if self.rate >= 1.0 or event_dict.get("logger") != ACCESS_LOGGER:
+            return event_dict
+        if event_dict.get("status", 0) >= 400:
+            return event_dict
+        if self.slow_ms and event_dict.get("duration_ms", 0.0) >= self.slow_ms:
+            return event_dict
+        if self._rng() < self.rate:
+            event_dict["sample_rate"] = self.rate
+            return event_dict
+        self.sampled_out += 1
+        raise structlog.DropEvent
+
+
+class QueueLogHandler(logging.Handler):
+    """Render records on the calling thread; a writer thread writes them in batches."""
+
+    def __init__(self, stream: IO[str], *, queue_size: int = 10000, batch_size: int = 256):
+        super().__init__()
+        self.stream = stream
+        self.batch_size = max(1, batch_size)
+        self.queue: queue.Queue[str | None] = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Unlike Handler.handle, don't hold the handler lock around emit: the queue is
+        # thread-safe and callers shouldn't take turns rendering
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.acquire()
+            try:
+                self.dropped += 1
+            finally:
+                self.release()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [line for line in batch if line is not None]
+            if lines:
+                try:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+                    self.written += len(lines)
+                except Exception:  # pragma: no cover - stdout went away
+                    self.dropped += len(lines)
+            if None in batch:
+                return
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out what is queued, then stop the writer."""
+        if self._thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:  # pragma: no cover - writer is stuck
+                pass
+            self._thread.join(timeout)
+        super().close()
+
+    def stats(self) -> dict[str, int]:
+        return {"queued": self.queue.qsize(), "dropped": self.dropped, "written": self.written}
+
+
+def log_pipeline_stats() -> dict[str, int] | None:
+    """Queue depth and dropped/written/sampled-out counts, or None while logging synchronously."""
+    if _handler is None:
+        return None
+    stats = _handler.stats()
+    stats["sampled_out"] = _sampler.sampled_out if _sampler is not None else 0
+    return stats
+
 
 def configure_logging(settings: Settings) -> None:
     """Configure structlog-based JSON logging."""
+    global _handler, _sampler
     timestamper = structlog.processors.TimeStamper(fmt="iso", key="ts")
+    _sampler = AccessLogSampler(settings.log_access_sample_rate, settings.slow_request_ms)
     processors: list[Processor] = [
+        structlog.stdlib.filter_by_level,
         structlog.stdlib.add_log_level,
         structlog.stdlib.add_logger_name,
         timestamper,
+        _sampler,
+        # Rendering happens in the handler's formatter
+        structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
     ]
+    renderer: Processor
     if settings.json_logs:
-        processors.append(structlog.processors.JSONRenderer())
+        renderer = structlog.processors.JSONRenderer()
     else:  # pragma: no cover - human-friendly logs
-        processors.append(structlog.dev.ConsoleRenderer())
+        renderer = structlog.dev.ConsoleRenderer()
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, renderer],
+        # Records from plain stdlib loggers (uvicorn, libraries) get the same fields
+        foreign_pre_chain=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            timestamper,
+        ],
+    )
 
     structlog.configure(
         processors=processors,
         wrapper_class=structlog.stdlib.BoundLogger,
         logger_factory=structlog.stdlib.LoggerFactory(),
     )
+    handler: logging.Handler
+    if settings.log_queue_size > 0:
+        handler = _handler = QueueLogHandler(
+            sys.stdout, queue_size=settings.log_queue_size, batch_size=settings.log_batch_size
+        )
+    else:
+        handler = logging.StreamHandler(sys.stdout)
+        _handler = None
+    handler.setFormatter(formatter)
+    # force=True closes the previous handler, flushing its queue
     logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
+        handlers=[handler],
         level=getattr(logging, settings.log_level.upper(), logging.INFO),
         force=True,
     )
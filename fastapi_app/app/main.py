@@ -1,28 +1,81 @@
 from __future__ import annotations
 
+import json
 import os
+import threading
 import uuid
-from collections.abc import Awaitable, Callable
-from typing import Any
+import zlib
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from concurrent.futures import Future
+from contextlib import ExitStack
+from functools import partial
+from typing import Annotated, Any, Literal
 
 import jwt
 import structlog
-from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
 from fastapi.security import APIKeyHeader, HTTPAuthorizationCredentials, HTTPBearer
+from prometheus_client import REGISTRY
 from prometheus_fastapi_instrumentator import Instrumentator
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse, PlainTextResponse, Response
 from starlette.types import ASGIApp
 
-from rag.retriever import DOCS_BY_ID, get_backend
+from rag.backends.bm25 import BM25Backend
+from rag.backends.cascade import CascadeBackend
+from rag.backends.hybrid import HybridBackend
+from rag.backends.sharded import ShardedBackend
+from rag.catalog import CollectionCatalog
+from rag.deadline import Deadline, DeadlineExceededError
+from rag.filters import parse_filters
+from rag.models import get_embedding_model, get_query_cache
+from rag.query import QuerySyntaxError, is_structured
+from rag.rerank import Reranker, get_scorer
+from rag.retriever import (
+    BACKEND_NAMES,
+    COMPOSED_BACKENDS,
+    CorpusSnapshot,
+    add_documents,
+    backend_status,
+    get_doc_store,
+    get_registry,
+    lease_backend,
+    rebuild_backends,
+    use_corpus_partition,
+    use_doc_store,
+    use_gc_freeze,
+    use_rebuild_processes,
+    warm_backends,
+)
+from rag.semantic_cache import SemanticCache
+from rag.timing import set_tracing, span, stage, timed
 
 from .api.v1 import router as v1_router
+from .bulk import BulkJob, BulkJobs, BulkLimitError, BulkLoader, NDJSONStream
 from .config import settings
-from .logging import configure_logging
-from .middleware import RequestIdMiddleware
+from .coordinator import Coordinator
+from .debug import SlowRequestLog, StackSampler
+from .limiter import ConcurrencyLimiter
+from .logging import configure_logging, log_pipeline_stats
+from .metrics import (
+    EVENT_LOOP_LAG_SECONDS,
+    GC_PAUSE_SECONDS,
+    SEARCH_STAGE_SECONDS,
+    CollectionsCollector,
+    ConcurrencyLimiterCollector,
+    LogPipelineCollector,
+    QueryCacheCollector,
+    SaturationCollector,
+    SemanticCacheCollector,
+    observe_gc_pause,
+    observe_stages,
+)
+from .middleware import ConcurrencyLimitMiddleware, RequestIdMiddleware
 from .problem import problem
+from .runtime import LoopMonitor, install_gc_timing
 
 if settings.fuzz_mode:
     settings.rate_limit_qps = float(os.getenv("RATE_LIMIT_QPS", settings.rate_limit_qps))
@@ -52,18 +105,33 @@ if settings.cors_origins:
 # Metrics
 if settings.metrics_enabled:
     Instrumentator().instrument(app).expose(app)
+    REGISTRY.register(CollectionsCollector(lambda: _catalog))
+    REGISTRY.register(QueryCacheCollector(get_query_cache))
+    REGISTRY.register(SemanticCacheCollector(lambda: _semantic_cache))
+    REGISTRY.register(ConcurrencyLimiterCollector(lambda: _limiter))
+    REGISTRY.register(LogPipelineCollector(log_pipeline_stats))
+    REGISTRY.register(SEARCH_STAGE_SECONDS)
+    REGISTRY.register(SaturationCollector(lambda: _loop_monitor))
+    REGISTRY.register(EVENT_LOOP_LAG_SECONDS)
+    REGISTRY.register(GC_PAUSE_SECONDS)
 
 
 # --- Body-size limit middleware ------------------------------------------
 class BodySizeLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+    def __init__(self, app: ASGIApp, max_bytes: int, exempt_paths: tuple[str, ...] = ()) -> None:
         super().__init__(app)
         self.max_bytes = max(0, int(max_bytes))
+        # Streaming endpoints enforce their own limits without buffering the body
+        self.exempt_paths = exempt_paths
 
     async def dispatch(
         self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
     ) -> Response:
-        if self.max_bytes and request.method in {"POST", "PUT", "PATCH"}:
+        if (
+            self.max_bytes
+            and request.method in {"POST", "PUT", "PATCH"}
+            and request.url.path not in self.exempt_paths
+        ):
             cl = request.headers.get("content-length")
             try:
                 if cl and int(cl) > self.max_bytes:
@@ -90,8 +158,55 @@ class BodySizeLimitMiddleware(BaseHTTPMiddleware):
         return await call_next(request)
 
 
-app.add_middleware(BodySizeLimitMiddleware, max_bytes=settings.request_body_max_bytes)
-app.add_middleware(RequestIdMiddleware, header_name=settings.request_id_header)
+BULK_PATH = "/api/v1/documents:bulk"
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.request_body_max_bytes,
+    exempt_paths=(BULK_PATH,),
+)
+_limiter: ConcurrencyLimiter | None = None
+
+
+def get_concurrency_limiter() -> ConcurrencyLimiter | None:
+    """The process-wide adaptive concurrency limiter, or None if disabled in settings."""
+    global _limiter
+    if not settings.concurrency_limit_enabled:
+        return None
+    if _limiter is None:
+        _limiter = ConcurrencyLimiter(
+            initial=settings.concurrency_limit_initial,
+            min_limit=settings.concurrency_limit_min,
+            max_limit=settings.concurrency_limit_max,
+            queue_size=settings.concurrency_queue_size,
+            queue_timeout_s=settings.concurrency_queue_timeout_ms / 1000,
+            tolerance=settings.concurrency_latency_tolerance,
+        )
+    return _limiter
+
+
+# Inside the request-id/rate-limit middleware: rate-limited requests never take a slot
+app.add_middleware(
+    ConcurrencyLimitMiddleware,
+    limiter=get_concurrency_limiter,
+    retry_after_s=lambda: settings.concurrency_retry_after_s,
+)
+_slow_log: SlowRequestLog | None = None
+
+
+def get_slow_request_log() -> SlowRequestLog:
+    """The process-wide slow-request ring buffer, following the current settings."""
+    global _slow_log
+    if _slow_log is None or _slow_log.capacity != max(1, settings.slow_request_log_size):
+        _slow_log = SlowRequestLog(settings.slow_request_ms, settings.slow_request_log_size)
+    _slow_log.threshold_ms = settings.slow_request_ms
+    return _slow_log
+
+
+app.add_middleware(
+    RequestIdMiddleware,
+    header_name=settings.request_id_header,
+    slow_log=get_slow_request_log,
+)
 
 
 # --- Error handlers (Problem Details) ------------------------------------
@@ -102,6 +217,7 @@ async def http_exc_handler(request: Request, exc: HTTPException) -> Response:
         problem(exc.detail or "HTTP error", exc.status_code, rid),
         status_code=exc.status_code,
         media_type="application/problem+json",
+        headers=exc.headers,
     )
 
 
@@ -154,34 +270,444 @@ GIT_SHA = os.getenv("GIT_SHA", "dev")
 def health() -> dict[str, Any]:
     return {"ok": True, "version": APP_VERSION, "git_sha": GIT_SHA}
 
- codex/locate-and-fix-critical-bug-4f0qez
 
+def _local_search(
+    q: str,
+    backend: str,
+    k: int,
+    snippet: bool,
+    filters: list[str] | None = None,
+    budget_ms: float | None = None,
+    deadline: Deadline | None = None,
+    rerank: bool | None = None,
+    rerank_budget_ms: float | None = None,
+    global_stats: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    if backend not in BACKEND_NAMES:
+        raise HTTPException(status_code=400, detail="invalid backend")
+    reranker = get_reranker() if (settings.rerank_default if rerank is None else rerank) else None
+    if rerank and reranker is None:
+        raise HTTPException(status_code=400, detail="reranking is not configured")
+    if deadline is not None:
+        deadline.check("search")  # spent queued (e.g. waiting for a worker thread)
+    try:
+        with stage("search.filters"):
+            spec = parse_filters(filters or [])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="invalid filter") from exc
+    # Embeddings ignore phrases and operators, so only plain-word queries are cached
+    cache = get_semantic_cache() if not is_structured(q) and global_stats is None else None
+    if backend == "cascade" and budget_ms is None:
+        budget_ms = settings.cascade_budget_ms
+    scope = (
+        backend,
+        k,
+        tuple((f, tuple(v)) for f, v in sorted(spec.items())),
+        reranker is not None,
+        budget_ms if backend == "cascade" else None,
+    )
+    vec = None
+    current = get_registry().get(backend)
+    if cache is not None and current is not None:
+        with stage("search.cache"):
+            vec = cache.embed(q)
+            hit = cache.lookup(scope, current.generation, q, vec)
+        if hit is not None:
+            body = _render_hits(
+                q, backend, hit.results, snippet, current.source, current.generation
+            )
+            body["semantic_cache"] = {
+                "hit": True,
+                "query": hit.query,
+                "similarity": round(hit.similarity, 6),
+            }
+            return body
+    served = backend
+    warming = backend_status(backend) == "warming"
+    if backend in COMPOSED_BACKENDS and backend_status("embed") == "warming":
+        warming = True  # composing now would block on the embedding build
+    if warming:
+        if backend not in COMPOSED_BACKENDS:
+            raise HTTPException(
+                status_code=503,
+                detail="backend warming up",
+                headers={"Retry-After": str(settings.warmup_retry_after_s)},
+            )
+        served = "bm25"  # lexical half only until the embedding side is loaded
+    # Lease one generation so a concurrent hot-swap can't change the index mid-query
+    with ExitStack() as leased:
+        with stage("search.lease"):  # waits out a cold build
+            handle = leased.enter_context(
+                lease_backend(served, **_backend_options(), deadline=deadline)
+            )
+        corpus = handle.source
+        fetch = max(k, reranker.top_m) if reranker is not None else k
+        results = _search_backend(
+            handle.backend, corpus, q, fetch, spec, budget_ms, deadline, global_stats
+        )
+    complete = True
+    rerank_info = None
+    hits: list[tuple[str, float | None]] = list(results)
+    if reranker is not None:
+        with stage("search.rerank"):
+            outcome = reranker.rerank(
+                q,
+                results,
+                partial(_doc_text, get_doc_store(corpus), corpus),
+                budget_ms=rerank_budget_ms,
+                deadline=deadline,
+            )
+        hits = outcome.results[:k]
+        complete = not outcome.exhausted
+        rerank_info = {
+            "scorer": settings.rerank_scorer,
+            "candidates": outcome.candidates,
+            "scored": outcome.scored,
+            "exhausted": outcome.exhausted,
+            "elapsed_ms": round(outcome.elapsed_ms, 3),
+        }
+    with stage("search.hydrate"):
+        body = _render_hits(q, backend, hits, snippet, corpus, handle.generation)
+    if rerank_info is not None:
+        body["rerank"] = rerank_info
+    if served != backend:
+        body.update(degraded=True, served_by=served)
+    if deadline is not None and deadline.partial:
+        body.update(partial=True, abandoned=list(deadline.abandoned))
+    elif served == backend and complete and cache is not None:
+        with stage("search.cache"):
+            # Complete means every returned hit was scored, reranked or not
+            cache.store(
+                scope, handle.generation, q, [(d, s) for d, s in hits if s is not None], vec
+            )
+    return body
+
+
+_semantic_cache: SemanticCache | None = None
 
-codex/locate-and-fix-critical-bug-2qin69
-main
- main
-@app.get("/api/v1/search")
-def search(q: str, backend: str = "bm25", k: int = 5) -> dict[str, Any]:
+
+def get_semantic_cache() -> SemanticCache | None:
+    """The /search semantic result cache, or None unless enabled in settings."""
+    global _semantic_cache
+    if not settings.semantic_cache:
+        return None
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache(
+            get_embedding_model(
+                settings.semantic_cache_model, use_dummy=settings.use_dummy_embeddings
+            ),
+            threshold=settings.semantic_cache_threshold,
+            max_entries=settings.semantic_cache_entries,
+        )
+    return _semantic_cache
+
+
+_reranker: Reranker | None = None
+
+
+def get_reranker() -> Reranker | None:
+    """The /search second-stage re-ranker, or None unless a scorer is configured."""
+    global _reranker
+    if not settings.rerank_scorer:
+        return None
+    if _reranker is None:
+        _reranker = Reranker(
+            get_scorer(settings.rerank_scorer, use_dummy=settings.use_dummy_embeddings),
+            top_m=settings.rerank_candidates,
+            batch_size=settings.rerank_batch_size,
+            budget_ms=settings.rerank_budget_ms,
+        )
+    return _reranker
+
+
+def _backend_options() -> dict[str, Any]:
+    return {
+        "embedding_model": settings.embedding_model,
+        "hybrid_alpha": settings.hybrid_alpha,
+        "use_dummy_embeddings": settings.use_dummy_embeddings,
+        "shards": settings.bm25_shards,
+        "bm25_prune_keep": settings.bm25_prune_keep,
+        "bm25_prune_method": settings.bm25_prune_method,
+    }
+
+
+# Backends whose search() takes a deadline and may return partial results
+_DEADLINE_AWARE = (HybridBackend, CascadeBackend, ShardedBackend)
+
+
+def _search_backend(
+    backend: Any,
+    corpus: CorpusSnapshot,
+    q: str,
+    k: int,
+    spec: dict[str, list[str]],
+    budget_ms: float | None = None,
+    deadline: Deadline | None = None,
+    global_stats: dict[str, Any] | None = None,
+) -> list[tuple[str, float]]:
+    kwargs: dict[str, Any] = {}
+    if global_stats is not None:
+        if not isinstance(backend, BM25Backend):
+            raise HTTPException(status_code=400, detail="global_stats needs an unsharded index")
+        kwargs = {"idf": global_stats["idf"], "avgdl": global_stats["avgdl"]}
+    if isinstance(backend, CascadeBackend):
+        kwargs = {
+            "candidates": settings.cascade_candidates,
+            "budget_ms": budget_ms if budget_ms is not None else settings.cascade_budget_ms,
+        }
+    if deadline is not None:
+        if isinstance(backend, _DEADLINE_AWARE):
+            kwargs["deadline"] = deadline
+        else:
+            deadline.check("search")
     try:
-        retr = get_backend(
-            backend,
-            embedding_model=settings.embedding_model,
-            hybrid_alpha=settings.hybrid_alpha,
-            use_dummy_embeddings=settings.use_dummy_embeddings,
+        results: list[tuple[str, float]] = backend.search(
+            q, k, allowed=corpus.metadata_index.allowed(spec), **kwargs
         )
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid backend") from exc
-    results = retr.search(q, k)
+    except QuerySyntaxError as exc:
+        raise HTTPException(status_code=400, detail="invalid query") from exc
+    return results
+
+
+def _doc_text(docs: Mapping[str, str], corpus: CorpusSnapshot, doc_id: str) -> str:
+    # docs follows the newest corpus; a generation still serving the previous
+    # one can return ids replaced since, which only its own snapshot holds
+    return docs[doc_id] if doc_id in docs else corpus.text_by_id[doc_id]
+
+
+def _render_hits(
+    q: str,
+    backend: str,
+    results: Sequence[tuple[str, float | None]],
+    snippet: bool,
+    corpus: CorpusSnapshot,
+    generation: int,
+    docs: Mapping[str, str] | None = None,
+) -> dict[str, Any]:
+    if docs is None:
+        docs = get_doc_store(corpus)
+    if not snippet:
+        return {
+            "query": q,
+            "backend": backend,
+            "generation": generation,
+            "results": [
+                {"doc_id": doc_id, "score": score, "text": _doc_text(docs, corpus, doc_id)}
+                for doc_id, score in results
+            ],
+        }
+    # Snippet mode: split a fixed character budget across hits in rank order
+    snippets = corpus.snippet_index
+    budget = max(0, settings.snippet_max_total_chars)
+    hits: list[dict[str, Any]] = []
+    for n, (doc_id, score) in enumerate(results):
+        size = min(settings.snippet_chars, budget // (len(results) - n))
+        snip = snippets.snippet(doc_id, _doc_text(docs, corpus, doc_id), q, max_chars=size)
+        budget -= len(snip.text)
+        hits.append(
+            {
+                "doc_id": doc_id,
+                "score": score,
+                "snippet": {
+                    "text": snip.text,
+                    "start": snip.start,
+                    "end": snip.end,
+                    "highlights": [list(h) for h in snip.highlights],
+                },
+            }
+        )
+    return {"query": q, "backend": backend, "generation": generation, "results": hits}
+
+
+_coordinator: Coordinator | None = None
+# Backends whose node scores the coordinator can merge: BM25 with collection-wide idf
+COORDINATED_BACKENDS = ("bm25",)
+
+
+def get_coordinator() -> Coordinator:
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = Coordinator(
+            settings.coordinator_shards,
+            timeout_ms=settings.coordinator_timeout_ms,
+            hedge_ms=settings.coordinator_hedge_ms,
+            max_connections=settings.coordinator_max_connections,
+        )
+    return _coordinator
+
+
+def _request_deadline(request: Request, timeout_ms: float | None) -> Deadline | None:
+    """The search deadline: ``timeout_ms``, the timeout header or the server default.
+
+    It runs from when the request reached the middleware, so queueing counts.
+    """
+    if timeout_ms is None:
+        header = request.headers.get(settings.search_timeout_header)
+        try:
+            timeout_ms = float(header) if header else settings.search_timeout_ms
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="invalid timeout header") from exc
+    if not timeout_ms or timeout_ms <= 0:
+        return None
+    return Deadline(timeout_ms, start=getattr(request.state, "received_at", None))
+
+
+def _deadline_exceeded(exc: DeadlineExceededError) -> HTTPException:
+    return HTTPException(status_code=504, detail=str(exc))
+
+
+def _parse_global_stats(raw: str, backend: str) -> dict[str, Any]:
+    if backend != "bm25":
+        raise HTTPException(status_code=400, detail="global_stats only applies to bm25")
+    try:
+        stats = json.loads(raw)
+        idf = {str(t): float(v) for t, v in stats["idf"].items()}
+        avgdl = float(stats["avgdl"])
+    except (ValueError, TypeError, KeyError, AttributeError) as exc:
+        raise HTTPException(status_code=400, detail="invalid global_stats") from exc
+    return {"idf": idf, "avgdl": avgdl}
+
+
+@app.get("/api/v1/search/stats")
+def search_stats(q: str) -> dict[str, Any]:
+    """This node's BM25 document/token counts and the df of *q*'s terms, for a coordinator."""
+    with lease_backend("bm25", **_backend_options()) as handle:
+        if not isinstance(handle.backend, BM25Backend):
+            raise HTTPException(status_code=400, detail="term statistics need an unsharded index")
+        try:
+            docs, tokens, mean_idf, df = handle.backend.term_stats(q)
+        except QuerySyntaxError as exc:
+            raise HTTPException(status_code=400, detail="invalid query") from exc
+        generation = handle.generation
+    return {
+        "docs": docs,
+        "tokens": tokens,
+        "mean_idf": mean_idf,
+        "df": df,
+        "generation": generation,
+    }
+
+
+@app.get("/api/v1/search")
+async def search(
+    request: Request,
+    q: str,
+    backend: str = "bm25",
+    k: int = 5,
+    snippet: bool = False,
+    filters: Annotated[list[str] | None, Query(alias="filter")] = None,
+    budget_ms: Annotated[float | None, Query(gt=0)] = None,
+    timeout_ms: Annotated[float | None, Query(gt=0)] = None,
+    rerank: bool | None = None,
+    rerank_budget_ms: Annotated[float | None, Query(gt=0)] = None,
+    global_stats: str | None = None,
+) -> Response:
+    deadline = _request_deadline(request, timeout_ms)
+    stats = _parse_global_stats(global_stats, backend) if global_stats is not None else None
+    if backend == "cascade" and settings.bm25_shards > 1:
+        raise HTTPException(status_code=400, detail="cascade requires bm25_shards=1")
+    if settings.coordinator_shards:
+        if backend not in COORDINATED_BACKENDS:
+            raise HTTPException(status_code=400, detail="backend not supported by the coordinator")
+        if rerank or rerank_budget_ms is not None or budget_ms is not None:
+            raise HTTPException(
+                status_code=400, detail="rerank and budget_ms are not supported by the coordinator"
+            )
+    # The worker thread runs in a copy of this context, so backend stages reach the timer
+    with span("search"), timed() as timer:
+        if settings.coordinator_shards:
+            body = await get_coordinator().search(
+                q,
+                backend=backend,
+                k=k,
+                snippet=snippet,
+                filters=filters,
+                timeout_ms=deadline.remaining_ms() if deadline is not None else None,
+            )
+        else:
+            try:
+                body = await run_in_threadpool(
+                    _local_search,
+                    q,
+                    backend,
+                    k,
+                    snippet,
+                    filters,
+                    budget_ms,
+                    deadline,
+                    rerank,
+                    rerank_budget_ms,
+                    stats,
+                )
+            except DeadlineExceededError as exc:
+                raise _deadline_exceeded(exc) from exc
+        with stage("search.serialize"):
+            response = JSONResponse(body)
+    observe_stages(timer)
+    request.state.stages = timer.stages
+    response.headers["Server-Timing"] = timer.server_timing()
+    return response
+
+
+_catalog: CollectionCatalog | None = None
+
+
+def get_catalog() -> CollectionCatalog:
+    global _catalog
+    if not settings.collections_dir:
+        raise HTTPException(status_code=404, detail="collections not configured")
+    if _catalog is None:
+        _catalog = CollectionCatalog(
+            settings.collections_dir, memory_budget_bytes=settings.collections_memory_bytes
+        )
+    return _catalog
+
+
+@app.get("/api/v1/collections")
+def list_collections() -> dict[str, Any]:
+    catalog = get_catalog()
     return {
-        "query": q,
-        "backend": backend,
-        "results": [
-            {"doc_id": doc_id, "score": score, "text": DOCS_BY_ID[doc_id]}
-            for doc_id, score in results
-        ],
+        "collections": catalog.names(),
+        "memory_budget_bytes": catalog.memory_budget_bytes,
+        "resident_bytes": catalog.resident_bytes,
+        "loaded": catalog.stats(),
     }
 
 
+def _collection_search(
+    name: str, q: str, backend: str, k: int, snippet: bool, filters: list[str] | None
+) -> dict[str, Any]:
+    catalog = get_catalog()
+    if backend not in BACKEND_NAMES:
+        raise HTTPException(status_code=400, detail="invalid backend")
+    if backend == "cascade" and settings.bm25_shards > 1:
+        raise HTTPException(status_code=400, detail="cascade requires bm25_shards=1")
+    try:
+        spec = parse_filters(filters or [])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="invalid filter") from exc
+    try:
+        catalog.get(name)
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="collection not found") from exc
+    with catalog.lease(name, backend, _backend_options()) as (handle, corpus):
+        results = _search_backend(handle.backend, corpus, q, k, spec)
+    body = _render_hits(q, backend, results, snippet, corpus, handle.generation, corpus.text_by_id)
+    return {"collection": name, **body}
+
+
+@app.get("/api/v1/collections/{name}/search")
+async def collection_search(
+    name: str,
+    q: str,
+    backend: str = "bm25",
+    k: int = 5,
+    snippet: bool = False,
+    filters: Annotated[list[str] | None, Query(alias="filter")] = None,
+) -> dict[str, Any]:
+    return await run_in_threadpool(_collection_search, name, q, backend, k, snippet, filters)
+
+
 def _ready_probe() -> bool:
     """Lightweight readiness check placeholder."""
     return True
@@ -191,13 +717,9 @@ class ReadyResponse(BaseModel):
     ready: bool
     version: str
     git_sha: str
- codex/locate-and-fix-critical-bug-4f0qez
-
-codex/locate-and-fix-critical-bug-2qin69
-
-
-main
- main
+    generation: int = 0
+    indexes: dict[str, int] = {}
+    backends: dict[str, str] = {}  # ready | warming | failed | cold (built on first use)
 
 
 # Small extra router: a protected ping + a POST sink for body-limit tests
@@ -214,14 +736,126 @@ _phase2 = APIRouter()
             "description": "Service readiness",
             "content": {
                 "application/json": {
-                    "example": {"ready": True, "version": APP_VERSION, "git_sha": GIT_SHA}
+                    "example": {
+                        "ready": True,
+                        "version": APP_VERSION,
+                        "git_sha": GIT_SHA,
+                        "generation": 2,
+                        "indexes": {"bm25": 2},
+                    }
                 }
             },
         }
     },
 )
 def ready() -> ReadyResponse:
-    return ReadyResponse(ready=_ready_probe(), version=APP_VERSION, git_sha=GIT_SHA)
+    registry = get_registry()
+    return ReadyResponse(
+        ready=_ready_probe(),
+        version=APP_VERSION,
+        git_sha=GIT_SHA,
+        generation=registry.generation,
+        indexes=registry.generations(),
+        backends={name: backend_status(name) for name in BACKEND_NAMES},
+    )
+
+
+class RebuildRequest(BaseModel):
+    backends: list[str] | None = None
+
+
+@_phase2.post(
+    "/index/rebuild",
+    status_code=202,
+    dependencies=[Depends(require_auth)],
+    responses={
+        400: {"description": "Unknown backend"},
+        401: {"description": "Unauthorized"},
+        429: {"description": "Too Many Requests"},
+    },
+)
+def rebuild_index(body: RebuildRequest | None = None) -> dict[str, Any]:
+    """Rebuild backends over the current corpus in the background and hot-swap them."""
+    try:
+        scheduled = _rebuild(body.backends if body else None)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="invalid backend") from exc
+    return {"scheduled": sorted(scheduled), "generation": get_registry().generation}
+
+
+def _rebuild(names: list[str] | None = None) -> dict[str, Future[int]]:
+    return rebuild_backends(names, **_backend_options())
+
+
+_bulk_jobs = BulkJobs()
+
+
+@_phase2.post(
+    "/documents:bulk",
+    status_code=202,
+    dependencies=[Depends(require_auth)],
+    responses={
+        400: {"description": "Malformed gzip stream"},
+        401: {"description": "Unauthorized"},
+        413: {"description": "Upload or document line too large"},
+        429: {"description": "Too Many Requests"},
+    },
+)
+async def bulk_documents(request: Request) -> dict[str, Any]:
+    """Stream gzip'd (or plain) NDJSON ``{"id", "text", "metadata"?}`` lines into the corpus.
+
+    The body is decompressed and split as it arrives; documents are chunked and
+    applied in batches on a worker thread, and the live backends are rebuilt
+    and hot-swapped as batches land. Returns the job for polling.
+    """
+    job = BulkJob()
+    _bulk_jobs.add(job)
+    loader = BulkLoader(
+        job,
+        apply=add_documents,
+        refresh=_rebuild,
+        max_chars=settings.bulk_chunk_chars,
+        overlap=settings.bulk_chunk_overlap,
+        refresh_interval=settings.bulk_refresh_interval_s,
+        max_refreshes=settings.bulk_max_refreshes,
+    )
+    stream = NDJSONStream(
+        max_bytes=settings.bulk_max_bytes, max_line_bytes=settings.bulk_max_line_bytes
+    )
+    batch: list[bytes] = []
+    try:
+        async for data in request.stream():
+            job.bytes_received += len(data)
+            batch.extend(stream.feed(data))
+            job.bytes_decompressed = stream.decompressed
+            while len(batch) >= settings.bulk_batch_docs:
+                await run_in_threadpool(loader.put, batch[: settings.bulk_batch_docs])
+                del batch[: settings.bulk_batch_docs]
+        batch.extend(stream.close())
+        job.bytes_decompressed = stream.decompressed
+        if batch:
+            await run_in_threadpool(loader.put, batch)
+    except (BulkLimitError, zlib.error) as exc:
+        loader.abort(str(exc))
+        status = 413 if isinstance(exc, BulkLimitError) else 400
+        raise HTTPException(status_code=status, detail=str(exc)) from exc
+    except BaseException as exc:  # client disconnect, cancellation, ...
+        loader.abort(repr(exc))
+        raise
+    loader.finish()
+    return job.snapshot()
+
+
+@_phase2.get(
+    "/documents:bulk/{job_id}",
+    dependencies=[Depends(require_auth)],
+    responses={404: {"description": "Unknown job"}, 401: {"description": "Unauthorized"}},
+)
+def bulk_job_status(job_id: str) -> dict[str, Any]:
+    job = _bulk_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return job.snapshot()
 
 
 @_phase2.get(
@@ -237,6 +871,69 @@ def secure_ping() -> dict[str, Any]:
     return {"ok": True, "secure": True}
 
 
+def _require_debug_endpoints() -> None:
+    if not settings.debug_endpoints:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+_profile_lock = threading.Lock()
+
+
+@_phase2.get(
+    "/debug/profile",
+    dependencies=[Depends(require_auth), Depends(_require_debug_endpoints)],
+    response_model=None,
+    responses={
+        400: {"description": "Profile longer than DEBUG_PROFILE_MAX_SECONDS"},
+        401: {"description": "Unauthorized"},
+        404: {"description": "Debug endpoints disabled"},
+        409: {"description": "A profile is already running"},
+    },
+)
+async def debug_profile(
+    seconds: Annotated[float, Query(gt=0)] = 5.0,
+    interval_ms: Annotated[float, Query(ge=0.5)] = 5.0,
+    fmt: Annotated[Literal["collapsed", "speedscope"], Query(alias="format")] = "collapsed",
+    idle: bool = False,
+) -> Response:
+    """Sample every thread's stack for *seconds* and return collapsed stacks or speedscope JSON.
+
+    Threads parked on locks, queues or the event loop's selector are left out
+    unless *idle* is set.
+    """
+    if seconds > settings.debug_profile_max_seconds:
+        raise HTTPException(status_code=400, detail="profile too long")
+    if not _profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="a profile is already running")
+    try:
+        sampler = StackSampler(interval_s=interval_ms / 1000, include_idle=idle)
+        await run_in_threadpool(sampler.run, seconds)
+    finally:
+        _profile_lock.release()
+    if fmt == "speedscope":
+        return JSONResponse(sampler.speedscope(f"{settings.app_name} {seconds:g}s"))
+    return PlainTextResponse(sampler.collapsed())
+
+
+@_phase2.get(
+    "/debug/slow-requests",
+    dependencies=[Depends(require_auth), Depends(_require_debug_endpoints)],
+    responses={
+        401: {"description": "Unauthorized"},
+        404: {"description": "Debug endpoints disabled"},
+    },
+)
+def debug_slow_requests(limit: Annotated[int, Query(ge=1)] = 50) -> dict[str, Any]:
+    """The most recent requests slower than SLOW_REQUEST_MS, newest first."""
+    log = get_slow_request_log()
+    return {
+        "threshold_ms": log.threshold_ms,
+        "capacity": log.capacity,
+        "recorded": log.recorded,
+        "requests": log.entries(limit),
+    }
+
+
 @_phase2.post(
     "/sink",
     responses={
@@ -254,12 +951,59 @@ app.include_router(_phase2, prefix="/api/v1")
 
 
 # --- startup hook --------------------------------------------------------
+_loop_monitor: LoopMonitor | None = None
+
+
 @app.on_event("startup")
 def _startup() -> None:
+    global _loop_monitor
     configure_logging(settings)
+    if settings.metrics_enabled:
+        if settings.gc_pause_metrics:
+            install_gc_timing(observe_gc_pause)
+        if settings.loop_lag_interval_ms > 0:
+            # Startup handlers run on the event loop, which the probe task must be on
+            _loop_monitor = LoopMonitor(
+                settings.loop_lag_interval_ms / 1000, on_lag=EVENT_LOOP_LAG_SECONDS.observe
+            )
+            _loop_monitor.start()
+    use_gc_freeze(settings.gc_freeze_indexes)
+    if settings.corpus_partition:
+        index, count = settings.corpus_partition.split("/")
+        use_corpus_partition(int(index), int(count))
+    use_doc_store(
+        settings.docstore_path,
+        cache_bytes=settings.docstore_cache_bytes,
+        block_bytes=settings.docstore_block_bytes,
+        codec=settings.docstore_codec,
+    )
+    if settings.index_rebuild_processes:
+        use_rebuild_processes()
+    get_query_cache().resize(settings.query_embedding_cache_bytes)
+    if settings.warmup_backends and not settings.coordinator_shards:
+        for name, fut in warm_backends(settings.warmup_backends, **_backend_options()).items():
+            fut.add_done_callback(partial(_warmed, name))
     try:
         from fastapi_app.app.telemetry import init_otel  # local import to avoid E402
 
-        init_otel()
+        set_tracing(init_otel())
     except Exception:  # pragma: no cover - optional telemetry
         pass
+
+
+def _warmed(name: str, fut: Future[int]) -> None:
+    exc = fut.exception()
+    if exc is not None:
+        logger.error("backend_warmup_failed", backend=name, error=repr(exc))
+    else:
+        logger.info("backend_ready", backend=name, generation=fut.result())
+
+
+@app.on_event("shutdown")
+async def _shutdown() -> None:
+    global _coordinator
+    if _loop_monitor is not None:
+        await _loop_monitor.stop()
+    if _coordinator is not None:
+        await _coordinator.aclose()
+        _coordinator = None
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+
+from prometheus_client import Histogram
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    Metric,
+    SummaryMetricFamily,
+)
+from prometheus_client.registry import Collector
+
+from rag.catalog import CollectionCatalog
+from rag.executors import executor_stats
+from rag.models import QueryEmbeddingCache
+from rag.semantic_cache import SemanticCache
+from rag.timing import StageTimer
+
+from .limiter import ConcurrencyLimiter
+from .runtime import LoopMonitor
+
+# Registered by the app when metrics are enabled; stage names are a fixed set
+SEARCH_STAGE_SECONDS = Histogram(
+    "rag_search_stage_seconds",
+    "Wall time of each /search stage (tokenize, score, top-k, fusion, hydration, ...)",
+    ["stage"],
+    buckets=(
+        0.00005,
+        0.0001,
+        0.00025,
+        0.0005,
+        0.001,
+        0.0025,
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+    ),
+    registry=None,
+)
+
+
+def observe_stages(timer: StageTimer) -> None:
+    for name, seconds in timer.stages.items():
+        SEARCH_STAGE_SECONDS.labels(name).observe(seconds)
+
+
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "rag_event_loop_lag_seconds",
+    "How late a periodic timer on the event loop fires (time blocked behind other work)",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    registry=None,
+)
+# Collection counts per generation are this histogram's _count
+GC_PAUSE_SECONDS = Histogram(
+    "rag_gc_pause_seconds",
+    "Duration of each garbage collection, by generation",
+    ["generation"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+    registry=None,
+)
+_GC_PAUSES = [GC_PAUSE_SECONDS.labels(str(generation)) for generation in range(3)]
+
+
+def observe_gc_pause(generation: int, seconds: float) -> None:
+    _GC_PAUSES[generation].observe(seconds)
+
+
+class CollectionsCollector(Collector):
+    """Export per-collection residency, load latency and evictions at scrape time."""
+
+    def __init__(self, catalog: Callable[[], CollectionCatalog | None]) -> None:
+        self._catalog = catalog
+
+    def describe(self) -> list[Metric]:
+        # Metric names depend on the catalog; don't collect at registration time
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        catalog = self._catalog()
+        if catalog is None:
+            return
+        labels = ["collection"]
+        resident = GaugeMetricFamily(
+            "rag_collection_resident", "1 if the collection is loaded in memory", labels=labels
+        )
+        nbytes = GaugeMetricFamily(
+            "rag_collection_resident_bytes",
+            "Approximate memory of a loaded collection's corpus and indexes",
+            labels=labels,
+        )
+        loads = SummaryMetricFamily(
+            "rag_collection_load_seconds",
+            "Time spent loading collections and building their indexes on demand",
+            labels=labels,
+        )
+        evictions = CounterMetricFamily(
+            "rag_collection_evictions",
+            "Collections unloaded to stay within the memory budget",
+            labels=labels,
+        )
+        for name, s in catalog.stats().items():
+            resident.add_metric([name], 1.0 if s["resident"] else 0.0)
+            nbytes.add_metric([name], s["resident_bytes"])
+            loads.add_metric([name], count_value=s["loads"], sum_value=s["load_seconds"])
+            evictions.add_metric([name], s["evictions"])
+        budget = GaugeMetricFamily(
+            "rag_collections_memory_budget_bytes", "Memory budget shared by all collections"
+        )
+        budget.add_metric([], catalog.memory_budget_bytes)
+        yield from (resident, nbytes, loads, evictions, budget)
+
+
+class QueryCacheCollector(Collector):
+    """Export query-embedding cache hits, misses, evictions and size at scrape time."""
+
+    def __init__(self, cache: Callable[[], QueryEmbeddingCache]) -> None:
+        self._cache = cache
+
+    def describe(self) -> list[Metric]:
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        s = self._cache().stats()
+        for name, doc in (
+            ("hits", "Query embeddings served from the cache"),
+            ("misses", "Query embeddings that ran the model"),
+            ("evictions", "Query embeddings evicted to stay within the byte cap"),
+        ):
+            counter = CounterMetricFamily(f"rag_query_embedding_cache_{name}", doc)
+            counter.add_metric([], s[name])
+            yield counter
+        for name, doc in (
+            ("bytes", "Memory held by cached query embeddings"),
+            ("max_bytes", "Byte cap of the query-embedding cache"),
+            ("entries", "Cached query embeddings"),
+        ):
+            gauge = GaugeMetricFamily(f"rag_query_embedding_cache_{name}", doc)
+            gauge.add_metric([], s[name])
+            yield gauge
+
+
+class SemanticCacheCollector(Collector):
+    """Export semantic result cache hits, misses, evictions and invalidations."""
+
+    def __init__(self, cache: Callable[[], SemanticCache | None]) -> None:
+        self._cache = cache
+
+    def describe(self) -> list[Metric]:
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        cache = self._cache()
+        if cache is None:
+            return
+        s = cache.stats()
+        for name, doc in (
+            ("hits", "Searches answered with a similar cached query's results"),
+            ("misses", "Searches with no cached query above the similarity threshold"),
+            ("evictions", "Cached queries evicted least recently used first"),
+            ("invalidations", "Cached queries dropped because their index was replaced"),
+        ):
+            counter = CounterMetricFamily(f"rag_semantic_cache_{name}", doc)
+            counter.add_metric([], s[name])
+            yield counter
+        entries = GaugeMetricFamily("rag_semantic_cache_entries", "Cached queries")
+        entries.add_metric([], s["entries"])
+        yield entries
+
+
+class ConcurrencyLimiterCollector(Collector):
+    """Export the adaptive concurrency limit, its usage and admissions/sheds per class."""
+
+    def __init__(self, limiter: Callable[[], ConcurrencyLimiter | None]) -> None:
+        self._limiter = limiter
+
+    def describe(self) -> list[Metric]:
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        limiter = self._limiter()
+        if limiter is None:
+            return
+        s = limiter.stats()
+        for name, doc in (
+            ("limit", "Current adaptive concurrency limit"),
+            ("inflight", "Requests holding a concurrency slot"),
+            ("queued", "Requests waiting for a concurrency slot"),
+            ("baseline_ms", "No-load latency estimate the limit adapts against"),
+            ("smoothed_ms", "Smoothed search latency compared against the baseline"),
+        ):
+            gauge = GaugeMetricFamily(f"rag_concurrency_{name}", doc)
+            gauge.add_metric([], s[name])
+            yield gauge
+        for name, doc in (
+            ("admitted", "Requests admitted by the concurrency limiter"),
+            ("shed", "Requests shed with 503 by the concurrency limiter"),
+        ):
+            counter = CounterMetricFamily(f"rag_concurrency_{name}", doc, labels=["priority"])
+            for priority, value in s[name].items():
+                counter.add_metric([priority], value)
+            yield counter
+
+
+class LogPipelineCollector(Collector):
+    """Export the log queue's depth and records written, dropped and sampled out."""
+
+    def __init__(self, stats: Callable[[], dict[str, int] | None]) -> None:
+        self._stats = stats
+
+    def describe(self) -> list[Metric]:
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        s = self._stats()
+        if s is None:
+            return
+        queued = GaugeMetricFamily("rag_log_queue_depth", "Log records waiting to be written")
+        queued.add_metric([], s["queued"])
+        yield queued
+        for name, doc in (
+            ("written", "Log records written by the background writer"),
+            ("dropped", "Log records dropped because the log queue was full"),
+            ("sampled_out", "Successful access logs skipped by sampling"),
+        ):
+            counter = CounterMetricFamily(f"rag_log_records_{name}", doc)
+            counter.add_metric([], s[name])
+            yield counter
+
+
+class SaturationCollector(Collector):
+    """Export worker-threadpool use, the last event-loop lag and thread-pool utilization."""
+
+    def __init__(self, monitor: Callable[[], LoopMonitor | None]) -> None:
+        self._monitor = monitor
+
+    def describe(self) -> list[Metric]:
+        return []
+
+    def collect(self) -> Iterator[Metric]:
+        monitor = self._monitor()
+        if monitor is not None:
+            s = monitor.stats()
+            for name, key, doc in (
+                (
+                    "event_loop_lag_seconds_last",
+                    "lag_seconds",
+                    "Event-loop lag at the latest probe",
+                ),
+                ("event_loop_lag_seconds_max", "max_lag_seconds", "Largest event-loop lag seen"),
+                ("threadpool_size", "threadpool_size", "Worker threads for sync endpoints"),
+                ("threadpool_busy", "threadpool_busy", "Worker threads in use"),
+                ("threadpool_waiting", "threadpool_waiting", "Calls waiting for a worker thread"),
+            ):
+                gauge = GaugeMetricFamily(f"rag_{name}", doc)
+                gauge.add_metric([], s[key])
+                yield gauge
+        pools = executor_stats()
+        labels = ["executor"]
+        gauges = {
+            name: GaugeMetricFamily(f"rag_executor_{name}", doc, labels=labels)
+            for name, doc in (
+                ("workers", "Threads in the executor"),
+                ("busy", "Executor threads running a task"),
+                ("queued", "Tasks waiting for an executor thread"),
+                ("utilization", "Fraction of executor threads running a task"),
+            )
+        }
+        busy = CounterMetricFamily(
+            "rag_executor_busy_seconds", "Thread time spent running tasks", labels=labels
+        )
+        completed = CounterMetricFamily(
+            "rag_executor_completed", "Tasks the executor has finished", labels=labels
+        )
+        for pool, s in pools.items():
+            for name, gauge in gauges.items():
+                gauge.add_metric([pool], s[name])
+            busy.add_metric([pool], s["busy_seconds"])
+            completed.add_metric([pool], s["completed"])
+        yield from gauges.values()
+        yield busy
+        yield completed
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import ipaddress
 import time
 import uuid
 from collections.abc import Awaitable, Callable
 from collections.abc import Callable as TypingCallable
+from functools import lru_cache
 from typing import Any
 
 import structlog
@@ -13,6 +15,8 @@ from starlette.responses import JSONResponse, Response
 from starlette.types import ASGIApp
 
 from .config import settings
+from .debug import SlowRequestLog
+from .limiter import INTERACTIVE, ConcurrencyLimiter, is_sampled, priority_for
 from .problem import problem
 
 try:  # optional OTEL
@@ -40,12 +44,42 @@ class _InMemoryRateLimiter:
         return ok
 
 
+@lru_cache(maxsize=8)
+def _networks(
+    entries: tuple[str, ...],
+) -> tuple[ipaddress.IPv4Network | ipaddress.IPv6Network, ...]:
+    networks = []
+    for entry in entries:
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            pass  # a client name rather than an address, e.g. "testclient"
+    return tuple(networks)
+
+
+def _rate_limit_exempt(client_ip: str) -> bool:
+    entries = settings.rate_limit_exempt_clients
+    if not entries or client_ip in entries:
+        return bool(entries)
+    try:
+        addr = ipaddress.ip_address(client_ip)
+    except ValueError:
+        return False
+    return any(addr in net for net in _networks(tuple(entries)))
+
+
 class RequestIdMiddleware(BaseHTTPMiddleware):
     """Attach request IDs, enforce rate limits, and emit JSON access logs."""
 
-    def __init__(self, app: ASGIApp, header_name: str) -> None:
+    def __init__(
+        self,
+        app: ASGIApp,
+        header_name: str,
+        slow_log: Callable[[], SlowRequestLog | None] | None = None,
+    ) -> None:
         super().__init__(app)
         self.header_name = header_name
+        self._slow_log = slow_log
         self._limiter = _InMemoryRateLimiter(settings.rate_limit_qps)
         self.logger = structlog.get_logger("access")
 
@@ -54,12 +88,16 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
     ) -> Response:
         rid = request.headers.get(self.header_name) or str(uuid.uuid4())
         request.state.request_id = rid
+        request.state.received_at = time.monotonic()  # request deadlines start here
         start = time.perf_counter()
         client_ip = request.client.host if request.client else "-"
         path = request.url.path
 
         response: Response
-        if settings.rate_limit_qps > 0:
+        if settings.rate_limit_qps > 0 and not _rate_limit_exempt(client_ip):
+            if self._limiter.rate != settings.rate_limit_qps:
+                # Settings changed since startup (e.g. tuned at runtime or in tests)
+                self._limiter = _InMemoryRateLimiter(settings.rate_limit_qps)
             key = f"{client_ip}:{path}"
             if not self._limiter.allow(key):
                 response = JSONResponse(
@@ -83,6 +121,20 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
             "client_ip": client_ip,
             "user_agent": request.headers.get("user-agent", "-"),
         }
+        stages = getattr(request.state, "stages", None)
+        if stages:
+            log_fields["stages_ms"] = {name: round(s * 1000, 3) for name, s in stages.items()}
+        slow_log = self._slow_log() if self._slow_log is not None else None
+        if slow_log is not None:
+            slow_log.record(
+                request_id=rid,
+                method=request.method,
+                path=path,
+                status=response.status_code,
+                duration_ms=dur_ms,
+                params=request.query_params.multi_items(),
+                stages=stages,
+            )
         if get_current_span is not None:
             span = get_current_span()
             ctx = span.get_span_context()
@@ -91,3 +143,48 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
                 log_fields["span_id"] = format(ctx.span_id, "016x")
         self.logger.info("request", **log_fields)
         return response
+
+
+class ConcurrencyLimitMiddleware(BaseHTTPMiddleware):
+    """Admit requests through the adaptive concurrency limiter; shed the excess with 503.
+
+    *limiter* returns the current limiter, or None to admit everything.
+    Successful interactive searches feed their latency back into the limit.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Callable[[], ConcurrencyLimiter | None],
+        retry_after_s: Callable[[], int],
+    ) -> None:
+        super().__init__(app)
+        self._limiter = limiter
+        self._retry_after_s = retry_after_s
+
+    async def dispatch(
+        self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        limiter = self._limiter()
+        if limiter is None:
+            return await call_next(request)
+        priority = priority_for(request.url.path, request.headers)
+        if not await limiter.acquire(priority):
+            rid = getattr(request.state, "request_id", str(uuid.uuid4()))
+            return JSONResponse(
+                problem("Service Unavailable", 503, rid, "server overloaded, retry later"),
+                status_code=503,
+                media_type="application/problem+json",
+                headers={"Retry-After": str(self._retry_after_s())},
+            )
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        except BaseException:
+            limiter.release()
+            raise
+        sample = (
+            priority == INTERACTIVE and is_sampled(request.url.path) and response.status_code < 400
+        )
+        limiter.release(time.perf_counter() - start if sample else None)
+        return response
@@ -0,0 +1,107 @@
+"""Saturation probes for the serving process: event-loop lag, the worker
+threadpool and garbage-collector pauses.
+
+:class:`LoopMonitor` runs on the event loop and sleeps for a fixed interval;
+how late it wakes up is the loop's lag (time a ready callback waits behind
+blocking code). Each tick it also samples anyio's default thread limiter,
+which bounds the threads sync endpoints and ``run_in_threadpool`` use.
+
+:func:`install_gc_timing` times every collection through ``gc.callbacks``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import gc
+import time
+from collections.abc import Callable
+from typing import Any
+
+import anyio.to_thread
+
+
+class LoopMonitor:
+    """Measure event-loop lag every *interval_s* and sample the worker threadpool."""
+
+    def __init__(
+        self, interval_s: float = 0.1, on_lag: Callable[[float], None] | None = None
+    ) -> None:
+        if interval_s <= 0:
+            raise ValueError("interval_s must be positive")
+        self.interval_s = interval_s
+        self._on_lag = on_lag
+        self.lag_s = 0.0
+        self.max_lag_s = 0.0
+        self.ticks = 0
+        self.threads_total = 0
+        self.threads_busy = 0
+        self.threads_waiting = 0
+        self._task: asyncio.Task[None] | None = None
+
+    def tick(self, lag_s: float) -> None:
+        """Record one lag sample and the threadpool's current use (on the loop)."""
+        self.lag_s = lag_s
+        self.max_lag_s = max(self.max_lag_s, lag_s)
+        self.ticks += 1
+        if self._on_lag is not None:
+            self._on_lag(lag_s)
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        self.threads_total = int(limiter.total_tokens)
+        self.threads_busy = int(limiter.borrowed_tokens)
+        self.threads_waiting = limiter.statistics().tasks_waiting
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            self.tick(max(0.0, time.perf_counter() - start - self.interval_s))
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "lag_seconds": self.lag_s,
+            "max_lag_seconds": self.max_lag_s,
+            "threadpool_size": self.threads_total,
+            "threadpool_busy": self.threads_busy,
+            "threadpool_waiting": self.threads_waiting,
+        }
+
+
+_gc_callback: Callable[[str, dict[str, Any]], None] | None = None
+
+
+def install_gc_timing(on_pause: Callable[[int, float], None]) -> None:
+    """Call ``on_pause(generation, seconds)`` after every collection (replacing a previous hook)."""
+    global _gc_callback
+    uninstall_gc_timing()
+    started = 0.0
+
+    def _callback(phase: str, info: dict[str, Any]) -> None:
+        nonlocal started
+        # Collections can't overlap: they run with the GIL held and don't nest
+        if phase == "start":
+            started = time.perf_counter()
+        else:
+            on_pause(info["generation"], time.perf_counter() - started)
+
+    _gc_callback = _callback
+    gc.callbacks.append(_callback)
+
+
+def uninstall_gc_timing() -> None:
+    global _gc_callback
+    if _gc_callback is not None:
+        with contextlib.suppress(ValueError):
+            gc.callbacks.remove(_gc_callback)
+        _gc_callback = None
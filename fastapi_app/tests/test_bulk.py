@@ -0,0 +1,222 @@
+import gzip
+import json
+import threading
+import time
+import zlib
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+from fastapi_app.app import main
+from fastapi_app.app.bulk import BulkJob, BulkLimitError, BulkLoader, NDJSONStream
+from fastapi_app.app.config import settings
+from fastapi_app.app.main import app
+from rag import retriever
+
+
+def _ndjson(n: int, start: int = 0) -> bytes:
+    lines = [
+        json.dumps({"id": f"bulk{i}", "text": f"payload number {i} about walruses"})
+        for i in range(start, start + n)
+    ]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def test_stream_splits_gzip_across_arbitrary_chunk_boundaries() -> None:
+    raw = _ndjson(50)
+    body = gzip.compress(raw)
+    stream = NDJSONStream(max_bytes=1 << 20, max_line_bytes=1024)
+    lines: list[bytes] = []
+    for i in range(0, len(body), 7):
+        lines.extend(stream.feed(body[i : i + 7]))
+    lines.extend(stream.close())
+    assert lines == raw.splitlines()
+    assert stream.decompressed == len(raw)
+
+    plain = NDJSONStream(max_bytes=1 << 20, max_line_bytes=1024)
+    assert plain.feed(b'{"id": "a"}\n{"id"') == [b'{"id": "a"}']
+    assert plain.close() == [b'{"id"']
+
+
+def test_stream_rejects_truncated_gzip() -> None:
+    body = gzip.compress(_ndjson(50))
+    stream = NDJSONStream(max_bytes=1 << 20, max_line_bytes=1024)
+    stream.feed(body[: len(body) // 2])
+    with pytest.raises(zlib.error, match="truncated"):
+        stream.close()
+
+
+def test_stream_limits_bound_decompressed_size() -> None:
+    bomb = gzip.compress(b"\n" * 10_000_000)
+    stream = NDJSONStream(max_bytes=1_000_000, max_line_bytes=1024)
+    with pytest.raises(BulkLimitError):
+        stream.feed(bomb)
+    long_line = NDJSONStream(max_bytes=1 << 20, max_line_bytes=100)
+    with pytest.raises(BulkLimitError):
+        long_line.feed(b"x" * 200)
+
+
+def test_loader_chunks_batches_and_reports_errors() -> None:
+    applied: list[list[tuple[str, str]]] = []
+    job = BulkJob()
+    loader = BulkLoader(job, apply=lambda d, m, r: applied.append(d), refresh=dict, max_chars=40)
+    long_doc = {"id": "long", "text": "First sentence here. " * 6, "metadata": {"lang": "en"}}
+    loader.put([json.dumps(long_doc).encode(), b"not json", b'{"id": 3, "text": "x"}'])
+    loader.put(_ndjson(2).splitlines())
+    loader.finish()
+    loader.join(5)
+    stats = job.snapshot()
+    assert stats["status"] == "done"
+    assert stats["docs"] == 3 and stats["errors"] == 2 and stats["batches"] == 2
+    ids = [d for batch in applied for d, _ in batch]
+    assert ids[:2] == ["long#0", "long#1"] and ids[-2:] == ["bulk0", "bulk1"]
+    assert stats["chunks"] == len(ids)
+    assert stats["error_samples"][0].startswith("line 2:")
+
+
+def test_loader_caps_mid_upload_rebuilds() -> None:
+    refreshes: list[int] = []
+    job = BulkJob()
+    loader = BulkLoader(
+        job,
+        apply=lambda d, m, c: None,
+        refresh=lambda: refreshes.append(job.batches) or {},
+        refresh_interval=0.0,
+        max_refreshes=2,
+    )
+    for n in range(6):
+        loader.put(_ndjson(1, start=n).splitlines())
+    loader.finish()
+    loader.join(5)
+    assert refreshes == [1, 2, 6] and job.snapshot()["refreshes"] == 3
+
+
+def test_reupload_replaces_every_chunk_of_a_document() -> None:
+    original = list(retriever._CORPUS)
+    job = BulkJob()
+    loader = BulkLoader(job, apply=retriever.add_documents, refresh=dict, max_chars=40)
+    long_doc = {"id": "rechunked", "text": "First sentence here. " * 6}
+    loader.put([json.dumps(long_doc).encode()])
+    loader.put([json.dumps({"id": "rechunked", "text": "now short"}).encode()])
+    loader.put(
+        [json.dumps(long_doc).encode(), json.dumps({"id": "rechunked", "text": "x"}).encode()]
+    )
+    loader.finish()
+    loader.join(5)
+    try:
+        ids = [d for d, _ in retriever._CORPUS if d.startswith("rechunked")]
+        assert ids == ["rechunked"] and retriever.DOCS_BY_ID["rechunked"] == "x"
+        assert "rechunked#0" not in retriever.DOCS_BY_ID
+        assert job.snapshot()["status"] == "done"
+    finally:
+        retriever.set_corpus(original)
+
+
+def test_reupload_leaves_documents_that_only_look_like_chunks() -> None:
+    original = list(retriever._CORPUS)
+    retriever.add_documents([("plain#0", "a document of its own")])
+    job = BulkJob()
+    loader = BulkLoader(job, apply=retriever.add_documents, refresh=dict)
+    loader.put([json.dumps({"id": "plain", "text": "v1"}).encode()])
+    loader.put([json.dumps({"id": "plain", "text": "v2"}).encode()])
+    loader.finish()
+    loader.join(5)
+    try:
+        assert retriever.DOCS_BY_ID["plain"] == "v2"
+        assert retriever.DOCS_BY_ID["plain#0"] == "a document of its own"
+    finally:
+        retriever.set_corpus(original)
+
+
+def test_aborted_upload_keeps_applied_batches_and_drops_queued_ones() -> None:
+    applied: list[list[tuple[str, str]]] = []
+    refreshes: list[int] = []
+    gate = threading.Event()
+
+    def apply(docs, meta, chunks) -> None:
+        gate.wait(5)
+        applied.append(docs)
+
+    def refresh() -> dict:
+        refreshes.append(len(applied))
+        return {}
+
+    job = BulkJob()
+    loader = BulkLoader(job, apply=apply, refresh=refresh, queue_batches=4)
+    loader.put(_ndjson(2).splitlines())
+    for _ in range(500):
+        if loader._queue.empty():  # the worker holds the first batch
+            break
+        time.sleep(0.01)
+    loader.put(_ndjson(2, start=2).splitlines())
+    loader.abort("upload exceeds bulk_max_bytes")
+    gate.set()
+    loader.join(5)
+    stats = job.snapshot()
+    assert [d for d, _ in applied[0]] == ["bulk0", "bulk1"] and len(applied) == 1
+    # what was applied is still published, so the corpus and the index agree
+    assert refreshes == [1]
+    assert stats["status"] == "failed" and stats["docs"] == 2
+    assert stats["error_samples"] == ["upload exceeds bulk_max_bytes"]
+
+
+def test_bulk_upload_interrupted_midway_fails_the_job(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rate_limit_qps", 0.0)
+    feed = NDJSONStream.feed
+
+    def disconnect_after_first_chunk(self, data: bytes) -> list[bytes]:
+        if self.decompressed:
+            raise ClientDisconnect()
+        return feed(self, data)
+
+    monkeypatch.setattr(NDJSONStream, "feed", disconnect_after_first_chunk)
+    with pytest.raises(ClientDisconnect):
+        TestClient(app).post("/api/v1/documents:bulk", content=iter([b"{}\n", b"{}\n"]))
+    job = list(main._bulk_jobs._jobs.values())[-1]
+    for _ in range(500):
+        if job.finished is not None:
+            break
+        time.sleep(0.01)
+    assert job.status == "failed" and job.error_samples == ["ClientDisconnect()"]
+
+
+def test_bulk_endpoint_streams_into_live_index(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(settings, "bulk_batch_docs", 500)
+    original = list(retriever._CORPUS)
+    client = TestClient(app)
+    client.get("/api/v1/search", params={"q": "walruses", "k": 1})  # bm25 is live
+    raw = _ndjson(3000)
+    assert len(raw) > settings.request_body_max_bytes  # not subject to the body cap
+
+    def body():
+        data = gzip.compress(raw)
+        for i in range(0, len(data), 4096):
+            yield data[i : i + 4096]
+
+    try:
+        r = client.post("/api/v1/documents:bulk", content=body())
+        assert r.status_code == 202
+        job = r.json()
+        for _ in range(500):
+            job = client.get(f"/api/v1/documents:bulk/{job['job_id']}").json()
+            if job["status"] != "indexing":
+                break
+            time.sleep(0.01)
+        assert job["status"] == "done" and job["docs"] == 3000 and job["errors"] == 0
+        assert job["bytes_decompressed"] == len(raw) and job["docs_per_s"] > 0
+        hits = client.get("/api/v1/search", params={"q": "number 1234", "k": 1}).json()
+        assert hits["results"][0]["doc_id"] == "bulk1234"
+        # the job reports the newest generation it published across live backends
+        assert hits["generation"] == retriever.get_registry().generations()["bm25"]
+        assert hits["generation"] <= job["generation"]
+        assert client.get("/api/v1/documents:bulk/missing").status_code == 404
+        bad = client.post("/api/v1/documents:bulk", content=b"\x1f\x8bnot gzip")
+        assert bad.status_code == 400
+    finally:
+        retriever.set_corpus(original)
+        for fut in retriever.rebuild_backends(
+            embedding_model="", hybrid_alpha=0.5, use_dummy_embeddings=True
+        ).values():
+            fut.result()
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from fastapi_app.app import config, main, middleware
+from fastapi_app.app.coordinator import Coordinator
+from rag.backends.bm25 import BM25Backend
+
+# What each node process starts with (rag.retriever's demo corpus)
+DEMO_CORPUS = [
+    ("doc1", "the cat sat on the mat"),
+    ("doc2", "dogs are great pets"),
+    ("doc3", "I love pizza"),
+    ("doc4", "the quick brown fox"),
+    ("doc5", "fastapi makes apis fast"),
+]
+
+
+def _stats(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"docs": 2, "tokens": 6, "mean_idf": 0.5, "df": {"q": 1}})
+
+
+def _transport(delays: dict[str, float]) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        await asyncio.sleep(delays.get(host, 0.0))
+        if host.startswith("down"):
+            return httpx.Response(503)
+        if request.url.path.endswith("/stats"):
+            return _stats(request)
+        hits = [{"doc_id": f"{host}-{i}", "score": float(len(host) - i)} for i in range(2)]
+        return httpx.Response(200, json={"results": hits})
+
+    return httpx.MockTransport(handler)
+
+
+def test_coordinator_merges_hedges_and_degrades() -> None:
+    async def run() -> tuple[dict, dict]:
+        coord = Coordinator(
+            ["http://aa", "http://slow|http://bbbb", "http://never", "http://down"],
+            timeout_ms=300,
+            hedge_ms=50,
+            transport=_transport({"slow": 5.0, "never": 5.0}),
+        )
+        try:
+            out = await coord.search("q", backend="bm25", k=3)
+            healthy = await coord.search("q", backend="bm25", k=3)
+        finally:
+            await coord.aclose()
+        return out, healthy
+
+    out, _ = asyncio.run(run())
+    assert out["degraded"] is True
+    status = {s["shard"]: (s["status"], s["hedged"]) for s in out["shards"]}
+    assert status["http://bbbb"] == ("ok", True)  # answered by the hedged replica
+    assert "http://slow" not in status
+    assert status["http://never"][0] == "timeout"
+    assert status["http://down"][0] == "error"
+    assert [h["doc_id"] for h in out["results"]] == ["bbbb-0", "bbbb-1", "aa-0"]
+    assert out["duration_ms"] < 1000
+
+
+def test_coordinator_caps_and_forwards_the_caller_deadline() -> None:
+    seen: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/stats"):
+            return _stats(request)
+        seen.append(request.url.params["timeout_ms"])
+        await asyncio.sleep(0.2 if request.url.host == "slow" else 0.0)
+        return httpx.Response(200, json={"results": [], "partial": request.url.host == "part"})
+
+    async def run() -> dict:
+        coord = Coordinator(
+            ["http://part", "http://slow"],
+            timeout_ms=1000,
+            hedge_ms=0,
+            transport=httpx.MockTransport(handler),
+        )
+        try:
+            return await coord.search("q", backend="bm25", k=3, timeout_ms=50)
+        finally:
+            await coord.aclose()
+
+    out = asyncio.run(run())
+    assert len(seen) == 2 and all(40 < float(t) <= 50 for t in seen)
+    status = {s["shard"]: s["status"] for s in out["shards"]}
+    assert status == {"http://part": "ok", "http://slow": "timeout"}
+    assert out["partial"] is True and out["duration_ms"] < 150
+
+
+def test_coordinator_scores_every_node_with_collection_wide_stats() -> None:
+    sent: list[dict] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if request.url.path.endswith("/stats"):
+            docs = 10 if host == "big" else 2
+            df = {"fox": 1 if host == "big" else 2, "dog": 3 if host == "big" else 0}
+            body = {"docs": docs, "tokens": 10 * docs, "mean_idf": 1.0, "df": df}
+            return httpx.Response(200, json=body)
+        if host == "lost":
+            return httpx.Response(503)
+        sent.append(json.loads(request.url.params["global_stats"]))
+        assert request.url.params["rerank"] == "false"
+        return httpx.Response(200, json={"results": []})
+
+    async def run() -> dict:
+        coord = Coordinator(
+            ["http://big", "http://small"], hedge_ms=0, transport=httpx.MockTransport(handler)
+        )
+        try:
+            return await coord.search("fox dog", backend="bm25", k=3)
+        finally:
+            await coord.aclose()
+
+    out = asyncio.run(run())
+    assert out["degraded"] is False and len(sent) == 2 and sent[0] == sent[1]
+    stats = sent[0]
+    assert stats["avgdl"] == 10.0
+    assert stats["idf"]["fox"] == pytest.approx(math.log(12 - 3 + 0.5) - math.log(3 + 0.5))
+    assert stats["idf"]["dog"] == pytest.approx(math.log(12 - 3 + 0.5) - math.log(3 + 0.5))
+    with pytest.raises(ValueError):
+        asyncio.run(Coordinator(["http://big"]).search("fox", backend="hybrid", k=3))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+@pytest.fixture()
+def nodes():
+    procs, urls = [], []
+    for i in range(2):
+        port = _free_port()
+        env = {**os.environ, "CORPUS_PARTITION": f"{i}/2", "USE_DUMMY_EMBEDDINGS": "true"}
+        procs.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "fastapi_app.app.main:app", "--port", str(port)],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        )
+        urls.append(f"http://127.0.0.1:{port}")
+    deadline = time.monotonic() + 30
+    for url in urls:
+        while True:
+            try:
+                httpx.get(f"{url}/api/v1/health", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+    yield procs, urls
+    for p in procs:
+        p.terminate()
+        p.wait(timeout=10)
+
+
+def test_coordinator_against_local_uvicorn_nodes(nodes) -> None:
+    procs, urls = nodes
+
+    async def run() -> tuple[dict, dict]:
+        coord = Coordinator(urls, timeout_ms=2000, hedge_ms=0)
+        try:
+            full = await coord.search("the", backend="bm25", k=5)
+            procs[1].terminate()
+            procs[1].wait(timeout=10)
+            partial = await coord.search("the", backend="bm25", k=5)
+        finally:
+            await coord.aclose()
+        return full, partial
+
+    full, partial = asyncio.run(run())
+    assert full["degraded"] is False
+    assert sorted(h["doc_id"] for h in full["results"]) == [f"doc{i}" for i in range(1, 6)]
+    # The same scores as one index over the whole corpus ("the" is in 2 of 5
+    # documents, so its idf is above the estimated floor)
+    single = BM25Backend()
+    single.build([text for _, text in DEMO_CORPUS], [doc_id for doc_id, _ in DEMO_CORPUS])
+    expected = dict(single.search("the", k=5))
+    for hit in full["results"]:
+        assert hit["score"] == pytest.approx(expected[hit["doc_id"]])
+    assert partial["degraded"] is True
+    assert 0 < len(partial["results"]) < 5
+
+
+def test_node_serves_term_stats_and_scores_with_given_stats(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    client = TestClient(main.app)
+    stats = client.get("/api/v1/search/stats", params={"q": "quick fox"}).json()
+    assert stats["docs"] >= len(DEMO_CORPUS) and set(stats["df"]) == {"quick", "fox"}
+    own = client.get("/api/v1/search", params={"q": "quick fox", "k": 3}).json()["results"]
+    given = {"idf": {"quick": 2.0, "fox": 2.0}, "avgdl": stats["tokens"] / stats["docs"]}
+    scaled = client.get(
+        "/api/v1/search", params={"q": "quick fox", "k": 3, "global_stats": json.dumps(given)}
+    ).json()["results"]
+    assert scaled and {h["score"] for h in scaled} != {h["score"] for h in own}
+    bad = client.get("/api/v1/search", params={"q": "fox", "global_stats": "{"})
+    assert bad.status_code == 400
+    hybrid = {"q": "fox", "backend": "hybrid", "global_stats": json.dumps(given)}
+    assert client.get("/api/v1/search", params=hybrid).status_code == 400
+
+
+def test_coordinator_rejects_what_it_cannot_merge(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(config.settings, "coordinator_shards", ["http://node"])
+    client = TestClient(main.app)
+    for params in ({"backend": "hybrid"}, {"rerank": True}, {"budget_ms": 10}):
+        r = client.get("/api/v1/search", params={"q": "fox", **params})
+        assert r.status_code == 400, params
+
+
+def test_rate_limit_exempts_listed_clients(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 1.0)
+    client = TestClient(main.app)
+    path = "/api/v1/search/stats"
+    assert 429 in {client.get(path, params={"q": "fox"}).status_code for _ in range(3)}
+    monkeypatch.setattr(config.settings, "rate_limit_exempt_clients", ["10.0.0.0/8", "testclient"])
+    assert {client.get(path, params={"q": "fox"}).status_code for _ in range(5)} == {200}
+    assert middleware._rate_limit_exempt("10.1.2.3")
+    assert not middleware._rate_limit_exempt("192.168.0.1")
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from fastapi_app.app import config, main
+from fastapi_app.app.debug import SlowRequestLog, StackSampler
+
+
+def _spin(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_reports_busy_threads_as_collapsed_and_speedscope() -> None:
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        sampler = StackSampler(interval_s=0.002).run(0.1)
+    finally:
+        stop.set()
+        worker.join()
+    assert sampler.ticks > 5
+    lines = sampler.collapsed().splitlines()
+    spinning = [line for line in lines if line.startswith("spinner;") and "_spin (" in line]
+    assert spinning and all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
+
+    profile = sampler.speedscope("test")
+    assert profile["$schema"].startswith("https://www.speedscope.app/")
+    by_name = {p["name"]: p for p in profile["profiles"]}
+    frames = profile["shared"]["frames"]
+    spinner = by_name["spinner"]
+    assert spinner["type"] == "sampled" and len(spinner["samples"]) == len(spinner["weights"])
+    assert any(frames[ids[-1]]["name"] == "_spin" for ids in spinner["samples"])
+
+
+def test_slow_request_log_is_a_bounded_ring() -> None:
+    log = SlowRequestLog(threshold_ms=10, capacity=2)
+    base = {"method": "GET", "path": "/p", "status": 200}
+    assert not log.record(request_id="fast", duration_ms=5, params=[], **base)
+    for n in range(3):
+        log.record(request_id=f"r{n}", duration_ms=20, params=[("q", "x" * 500)], **base)
+    log.record(
+        request_id="r3",
+        duration_ms=30,
+        params=[("filter", "a:1"), ("filter", "b:2")],
+        stages={"bm25.score": 0.012},
+        **base,
+    )
+    newest, older = log.entries()
+    assert [newest["request_id"], older["request_id"]] == ["r3", "r2"]
+    assert newest["params"] == {"filter": ["a:1", "b:2"]}
+    assert newest["stages_ms"] == {"bm25.score": 12.0}
+    assert len(older["params"]["q"]) == 200 and log.recorded == 4
+    assert not SlowRequestLog(threshold_ms=0).record(
+        request_id="x", duration_ms=1e9, params=[], **base
+    )
+
+
+def test_debug_endpoints_need_enabling_and_auth(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    client = TestClient(main.app)
+    assert client.get("/api/v1/debug/slow-requests").status_code == 404
+
+    monkeypatch.setattr(config.settings, "debug_endpoints", True)
+    monkeypatch.setattr(config.settings, "api_key", "secret")
+    assert client.get("/api/v1/debug/profile", params={"seconds": 0.05}).status_code == 401
+    auth = {"X-API-KEY": "secret"}
+    r = client.get("/api/v1/debug/profile", params={"seconds": 0.05}, headers=auth)
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    r = client.get(
+        "/api/v1/debug/profile",
+        params={"seconds": 0.05, "format": "speedscope", "idle": True},
+        headers=auth,
+    )
+    assert r.status_code == 200 and r.json()["profiles"]
+    too_long = {"seconds": config.settings.debug_profile_max_seconds + 1}
+    assert client.get("/api/v1/debug/profile", params=too_long, headers=auth).status_code == 400
+
+
+def test_slow_requests_are_captured_with_stage_timings(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(config.settings, "debug_endpoints", True)
+    monkeypatch.setattr(config.settings, "slow_request_ms", 1e-6)
+    monkeypatch.setattr(main, "_slow_log", None)
+    client = TestClient(main.app)
+    r = client.get("/api/v1/search", params={"q": "fox", "k": 1, "filter": "lang:en"})
+    assert r.status_code == 200
+    time.sleep(0.01)
+    body = client.get("/api/v1/debug/slow-requests", params={"limit": 5}).json()
+    entry = next(e for e in body["requests"] if e["path"] == "/api/v1/search")
+    assert entry["params"] == {"q": "fox", "k": "1", "filter": "lang:en"}
+    assert entry["request_id"] == r.headers["X-Request-ID"]
+    assert "search.hydrate" in entry["stages_ms"] and entry["duration_ms"] > 0
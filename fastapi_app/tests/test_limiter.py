@@ -0,0 +1,132 @@
+import asyncio
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fastapi_app.app import config, main
+from fastapi_app.app.limiter import (
+    BATCH,
+    CRITICAL,
+    INTERACTIVE,
+    ConcurrencyLimiter,
+    is_sampled,
+    priority_for,
+)
+
+
+def _single_slot(**kwargs) -> ConcurrencyLimiter:
+    return ConcurrencyLimiter(initial=1, min_limit=1, max_limit=4, **kwargs)
+
+
+def test_waiters_are_served_by_class_then_arrival() -> None:
+    limiter = _single_slot()
+    order: list[str] = []
+
+    async def request(name: str, priority: int) -> None:
+        assert await limiter.acquire(priority)
+        order.append(name)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    async def run() -> None:
+        assert await limiter.acquire(INTERACTIVE)
+        tasks = [
+            asyncio.create_task(request("batch", BATCH)),
+            asyncio.create_task(request("search-1", INTERACTIVE)),
+            asyncio.create_task(request("search-2", INTERACTIVE)),
+        ]
+        await asyncio.sleep(0.01)
+        assert limiter.queued == 3
+        assert await limiter.acquire(CRITICAL)  # probes bypass the limit
+        limiter.release()
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["search-1", "search-2", "batch"]
+    assert limiter.inflight == 0
+
+
+def test_full_queue_displaces_lower_class_then_sheds() -> None:
+    limiter = _single_slot(queue_size=1)
+
+    async def run() -> list[bool]:
+        assert await limiter.acquire(INTERACTIVE)
+        batch = asyncio.create_task(limiter.acquire(BATCH))
+        await asyncio.sleep(0.01)
+        search = asyncio.create_task(limiter.acquire(INTERACTIVE))
+        await asyncio.sleep(0.01)
+        late = await limiter.acquire(INTERACTIVE)  # queue holds a same-class waiter
+        limiter.release()
+        return [await batch, await search, late]
+
+    assert asyncio.run(run()) == [False, True, False]
+    assert limiter.stats()["shed"] == {"critical": 0, "interactive": 1, "batch": 1}
+
+
+def test_waiters_are_shed_after_queue_timeout() -> None:
+    limiter = _single_slot(queue_timeout_s=0.02)
+
+    async def run() -> bool:
+        assert await limiter.acquire(INTERACTIVE)
+        return await limiter.acquire(INTERACTIVE)
+
+    assert asyncio.run(run()) is False
+    assert limiter.queued == 0
+
+
+def _replay(limiter: ConcurrencyLimiter, latencies, rps: float = 2000.0, start: float = 0.0):
+    now = start
+    for latency in latencies:
+        now += 1 / rps
+        limiter._observe(latency, int(limiter.limit), now)
+    return now
+
+
+def test_mixed_cost_traffic_does_not_collapse_the_limit() -> None:
+    rng = random.Random(7)
+    limiter = ConcurrencyLimiter(initial=32, min_limit=4, max_limit=256)
+    # 5% cheap requests (cache hits, empty results) among 8-12 ms searches
+    latencies = [0.001 if rng.random() < 0.05 else rng.uniform(0.008, 0.012) for _ in range(20000)]
+    _replay(limiter, latencies)
+    assert limiter.limit > 32
+    assert 0.005 < limiter.baseline_s < 0.010  # a window minimum of the smoothed latency
+
+
+def test_limit_backs_off_when_latency_rises_and_grows_when_used() -> None:
+    limiter = ConcurrencyLimiter(initial=32, min_limit=4, max_limit=256)
+    now = _replay(limiter, [0.010] * 1000)
+    grown = limiter.limit
+    assert grown > 32 and limiter.baseline_s == pytest.approx(0.010)
+    _replay(limiter, [0.050] * 10, start=now)  # smoothed latency passes 2x within a few samples
+    assert grown * 0.9**2 <= limiter.limit < grown  # at most one cut per 1/smoothing samples
+    _replay(limiter, [0.050] * 200, start=now + 1)
+    assert limiter.limit < 16
+
+
+def test_priority_classes() -> None:
+    assert priority_for("/api/v1/health", {}) == CRITICAL
+    assert priority_for("/api/v1/search", {}) == INTERACTIVE
+    assert priority_for("/api/v1/search", {"X-Priority": "batch"}) == BATCH
+    assert priority_for("/api/v1/documents:bulk", {}) == BATCH
+    assert is_sampled("/api/v1/search") and is_sampled("/api/v1/collections/news/search")
+    assert not is_sampled("/openapi.json") and not is_sampled("/api/v1/documents/doc1")
+
+
+def test_api_sheds_with_retry_after_when_saturated(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    limiter = ConcurrencyLimiter(initial=4, min_limit=1, max_limit=4, queue_size=0)
+    monkeypatch.setattr(main, "_limiter", limiter)
+    client = TestClient(main.app)
+    assert client.get("/api/v1/search", params={"q": "fox"}).status_code == 200
+    assert limiter.inflight == 0 and limiter.baseline_s is not None
+
+    limiter._inflight = 4  # every slot busy, no queue
+    r = client.get("/api/v1/search", params={"q": "fox"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(config.settings.concurrency_retry_after_s)
+    assert r.headers["content-type"].startswith("application/problem+json")
+    assert r.json()["status"] == 503 and "X-Request-ID" in r.headers
+    assert client.get("/api/v1/health").status_code == 200
+    assert 'rag_concurrency_shed_total{priority="interactive"} 1.0' in client.get("/metrics").text
@@ -0,0 +1,95 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+import structlog
+
+from fastapi_app.app import config
+from fastapi_app.app import logging as app_logging
+from fastapi_app.app.logging import AccessLogSampler, QueueLogHandler, configure_logging
+
+
+def _access(status: int = 200, duration_ms: float = 1.0) -> dict:
+    return {"event": "request", "logger": "access", "status": status, "duration_ms": duration_ms}
+
+
+def test_sampler_keeps_errors_and_slow_requests() -> None:
+    sampler = AccessLogSampler(0.0, slow_ms=100.0)
+    with pytest.raises(structlog.DropEvent):
+        sampler(None, "info", _access())
+    assert sampler(None, "info", _access(status=503))["status"] == 503
+    assert sampler(None, "info", _access(duration_ms=250.0))["duration_ms"] == 250.0
+    assert sampler(None, "info", {"event": "backend_ready", "logger": "app"})
+    assert sampler.sampled_out == 1
+
+    kept = AccessLogSampler(0.25, rng=lambda: 0.1)(None, "info", _access())
+    assert kept["sample_rate"] == 0.25
+    assert "sample_rate" not in AccessLogSampler(1.0)(None, "info", _access())
+
+
+class _BlockingStream(io.StringIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = threading.Event()
+        self.writing = threading.Event()
+
+    def write(self, s: str) -> int:
+        self.writing.set()
+        self.release.wait(5)
+        return super().write(s)
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking() -> None:
+    stream = _BlockingStream()
+    handler = QueueLogHandler(stream, queue_size=1)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "m%d", (0,), None)
+    handler.handle(record)
+    assert stream.writing.wait(5)  # the writer holds record 0
+    for n in range(1, 4):
+        handler.handle(logging.LogRecord("t", logging.INFO, __file__, 1, "m%d", (n,), None))
+    assert handler.dropped == 2
+    stream.release.set()
+    handler.close()
+    assert stream.getvalue() == "m0\nm1\n"
+    assert handler.stats() == {"queued": 0, "dropped": 2, "written": 2}
+
+
+def test_records_are_rendered_when_logged() -> None:
+    stream = _BlockingStream()
+    handler = QueueLogHandler(stream)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    args = [1]
+    handler.handle(logging.LogRecord("t", logging.INFO, __file__, 1, "m%s", (args,), None))
+    args.append(2)  # after the call, before the writer gets to it
+    stream.release.set()
+    handler.close()
+    assert stream.getvalue() == "m[1]\n"
+
+
+def test_configured_pipeline_renders_json(capsys, monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "log_access_sample_rate", 0.0)
+    configure_logging(config.settings)
+    try:
+        access = structlog.get_logger("access")
+        for _ in range(3):
+            access.info("request", status=200, duration_ms=1.0)
+        access.info("request", status=500, duration_ms=1.0)
+        structlog.get_logger("app").debug("below_level")
+        assert logging.logThreads and logging._srcfile is not None  # process-wide, untouched
+        logging.getLogger("uvicorn.error").warning("plain %s", "stdlib")
+        stats = app_logging.log_pipeline_stats()
+        assert stats is not None and stats["sampled_out"] == 3
+        assert app_logging._handler is not None
+        app_logging._handler.close()
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    finally:
+        monkeypatch.undo()
+        configure_logging(config.settings)
+    assert [(e["logger"], e["event"], e["level"]) for e in lines] == [
+        ("access", "request", "info"),
+        ("uvicorn.error", "plain stdlib", "warning"),
+    ]
+    assert lines[0]["status"] == 500 and "ts" in lines[0]
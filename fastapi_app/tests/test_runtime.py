@@ -0,0 +1,66 @@
+import asyncio
+import gc
+import threading
+import time
+
+import anyio.to_thread
+from fastapi.testclient import TestClient
+
+from fastapi_app.app import config, main
+from fastapi_app.app.runtime import LoopMonitor, install_gc_timing, uninstall_gc_timing
+
+
+def test_loop_monitor_sees_blocking_code_and_busy_threads() -> None:
+    lags: list[float] = []
+    monitor = LoopMonitor(0.005, on_lag=lags.append)
+    release = threading.Event()
+
+    async def run() -> None:
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.05)  # blocks the loop
+        await asyncio.sleep(0.02)
+        worker = asyncio.ensure_future(anyio.to_thread.run_sync(release.wait, 5))
+        await asyncio.sleep(0.02)
+        busy = monitor.threads_busy
+        release.set()
+        await worker
+        await monitor.stop()
+        assert busy == 1
+
+    asyncio.run(run())
+    assert monitor.max_lag_s >= 0.04 and max(lags) == monitor.max_lag_s
+    assert monitor.threads_total > 0 and monitor.ticks == len(lags)
+
+
+def test_gc_timing_reports_each_generation() -> None:
+    pauses: list[tuple[int, float]] = []
+    install_gc_timing(lambda generation, seconds: pauses.append((generation, seconds)))
+    try:
+        gc.collect(0)
+        gc.collect(2)
+    finally:
+        uninstall_gc_timing()
+    assert [g for g, _ in pauses][-2:] == [0, 2]
+    assert all(seconds >= 0 for _, seconds in pauses)
+
+
+def test_saturation_metrics_are_exported(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(config.settings, "loop_lag_interval_ms", 5.0)
+    with TestClient(main.app) as client:
+        client.get("/api/v1/search", params={"q": "fox", "backend": "hybrid", "timeout_ms": 5000})
+        time.sleep(0.05)
+        gc.collect()
+        text = client.get("/metrics").text
+    assert main._loop_monitor is not None and main._loop_monitor.ticks > 0
+    for name in (
+        "rag_event_loop_lag_seconds_bucket",
+        "rag_event_loop_lag_seconds_last",
+        "rag_threadpool_size",
+        "rag_threadpool_busy",
+        'rag_executor_utilization{executor="hybrid-leg"}',
+        'rag_executor_completed_total{executor="hybrid-leg"}',
+        'rag_gc_pause_seconds_count{generation="2"}',
+    ):
+        assert name in text, name
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 from typing import Protocol, runtime_checkable
 
+import numpy as np
+
 
 @runtime_checkable
 class RetrievalBackend(Protocol):
@@ -24,5 +27,30 @@ class RetrievalBackend(Protocol):
             seed: Optional deterministic seed.
         """
 
-    def search(self, query: str, k: int = 5) -> list[tuple[str, float]]:
-        """Return the top-k (doc_id, score) pairs for *query*."""
+    def search(
+        self, query: str, k: int = 5, *, allowed: Sequence[int] | np.ndarray | None = None
+    ) -> list[tuple[str, float]]:
+        """Return the top-k (doc_id, score) pairs for *query*.
+
+        Args:
+            allowed: Optional sorted document positions (build order) to restrict
+                scoring to, e.g. from :meth:`rag.filters.MetadataIndex.allowed`.
+        """
+
+
+def top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> np.ndarray:
+    """Indices into *scores* of the *k* best, by score then lowest row in *rows*.
+
+    *scores* holds the score of each of *rows*. Selection is a partial sort, so
+    large candidate sets cost O(n) plus the sort of the top k (and ties with it).
+    """
+    k = min(k, len(rows))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(rows):
+        # Keep every tie with the k-th score so ties resolve by position
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        top = np.flatnonzero(scores >= kth)
+    else:
+        top = np.arange(len(rows))
+    return top[np.lexsort((rows[top], -scores[top]))][:k]
@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import math
 import re
+import sys
+from collections.abc import Mapping, Sequence
 
+import numpy as np
 from rank_bm25 import BM25Okapi
 
-from .base import RetrievalBackend
+from ..query import Node, PositionalIndex, is_structured, parse_query, scoring_terms
+from ..timing import stage
+from .base import RetrievalBackend, top_k
 
 _WORD_RE = re.compile(r"[A-Za-z0-9_']+")
 
@@ -13,26 +19,312 @@ def _tokenize(text: str) -> list[str]:
     return [w.lower() for w in _WORD_RE.findall(text)]
 
 
+def okapi_idf(df: dict[str, int], n_docs: int, epsilon: float = 0.25) -> dict[str, float]:
+    """Okapi idf exactly as ``rank_bm25.BM25Okapi`` computes it.
+
+    ``df`` must list terms in corpus first-occurrence order: the epsilon floor
+    uses the average idf, and float summation order changes the last bits.
+    """
+    idf: dict[str, float] = {}
+    idf_sum = 0.0
+    negative: list[str] = []
+    for t, f in df.items():
+        v = math.log(n_docs - f + 0.5) - math.log(f + 0.5)
+        idf[t] = v
+        idf_sum += v
+        if v < 0:
+            negative.append(t)
+    if idf:
+        eps = epsilon * (idf_sum / len(idf))
+        for t in negative:
+            idf[t] = eps
+    return idf
+
+
+def global_idf(
+    df: Mapping[str, int], n_docs: int, mean_idf: float, epsilon: float = 0.25
+) -> dict[str, float]:
+    """Okapi idf of some terms given collection-wide *df* and document count.
+
+    Unlike :func:`okapi_idf` the vocabulary isn't all there, so the floor for
+    negative idf uses *mean_idf*, an estimate of the average idf of the whole
+    vocabulary (e.g. the nodes' :meth:`BM25Backend.term_stats` means weighted
+    by document count). Terms above half the collection are therefore only
+    approximately scored as one index would; all others are exact.
+    """
+    idf = {}
+    for t, f in df.items():
+        v = math.log(n_docs - f + 0.5) - math.log(f + 0.5)
+        idf[t] = v if v >= 0 else epsilon * mean_idf
+    return idf
+
+
+PRUNE_METHODS = ("term", "doc")
+
+
 class BM25Backend(RetrievalBackend):
-    """Simple BM25 implementation over in-memory documents."""
+    """Simple BM25 implementation over in-memory documents.
 
-    def __init__(self) -> None:
-        self._docs: list[str] = []
+    With ``prune_keep < 1`` the postings are statically pruned after each build
+    (see :meth:`prune`).
+    """
+
+    def __init__(self, *, prune_keep: float = 1.0, prune_method: str = "term") -> None:
+        if not 0 < prune_keep <= 1:
+            raise ValueError("prune_keep must be in (0, 1]")
+        if prune_method not in PRUNE_METHODS:
+            raise ValueError(f"unknown prune method: {prune_method}")
+        self.prune_keep = prune_keep
+        self.prune_method = prune_method
+        self._n_docs = 0  # texts aren't kept: the caller's corpus already holds them
         self._ids: list[str] = []
         self._bm25: BM25Okapi | None = None
+        self._positions = PositionalIndex()
+        self._unpruned_stats: tuple[dict[str, tuple[int, int, int]], int] | None = None
+        self._df: tuple[dict[str, int], int, float] | None = None  # see term_stats
 
     def build(
         self, docs: list[str], ids: list[str] | None = None, *, seed: int | None = None
     ) -> None:
-        self._docs = list(docs)
+        self._n_docs = len(docs)
         self._ids = ids or [str(i) for i in range(len(docs))]
-        tok_corpus = [_tokenize(d) for d in self._docs]
+        # Interned, every posting of a term shares one string (and nbytes counts it once)
+        tok_corpus = [[sys.intern(t) for t in _tokenize(d)] for d in docs]
         self._bm25 = BM25Okapi(tok_corpus if tok_corpus else [[""]])
+        self._positions.build(tok_corpus)
+        self._unpruned_stats = None
+        self._df = None
+        if self.prune_keep < 1:
+            self.prune(self.prune_keep, method=self.prune_method)
+
+    def prune(self, keep: float, *, method: str = "term") -> int:
+        """Drop the lowest-impact postings, keeping about a *keep* fraction of them.
+
+        Impact is a posting's BM25 contribution. ``"term"`` keeps the top
+        ``ceil(keep * df)`` documents of every term, so each term's best matches
+        survive; ``"doc"`` keeps the top ``ceil(keep * |terms|)`` terms of every
+        document. idf, document lengths and the positional index are left
+        intact, so surviving postings score exactly as before. Returns the
+        number of postings removed.
+        """
+        if self._bm25 is None:
+            raise RuntimeError("Index not built. Call build() first.")
+        if not 0 < keep <= 1:
+            raise ValueError("keep must be in (0, 1]")
+        if method not in PRUNE_METHODS:
+            raise ValueError(f"unknown prune method: {method}")
+        if self._unpruned_stats is None:
+            # Shards merge df/first-occurrence stats; they must describe the full corpus
+            self._unpruned_stats = self.corpus_stats()
+        bm25 = self._bm25
+        freqs = bm25.doc_freqs[: self._n_docs]
+        avgdl = bm25.avgdl or 1.0
+
+        def impact(t: str, tf: int, n: int) -> float:
+            norm = bm25.k1 * (1 - bm25.b + bm25.b * bm25.doc_len[n] / avgdl)
+            return float(bm25.idf.get(t, 0.0) * tf * (bm25.k1 + 1) / (tf + norm))
+
+        keep_terms: list[set[str]] = []
+        if method == "doc":
+            for n, doc in enumerate(freqs):
+                ranked = sorted((-impact(t, tf, n), t) for t, tf in doc.items())
+                keep_terms.append({t for _, t in ranked[: math.ceil(keep * len(doc))]})
+        else:
+            postings: dict[str, list[tuple[float, int]]] = {}
+            for n, doc in enumerate(freqs):
+                for t, tf in doc.items():
+                    postings.setdefault(t, []).append((-impact(t, tf, n), n))
+            keep_terms = [set() for _ in freqs]
+            for t, plist in postings.items():
+                plist.sort()
+                for _, n in plist[: math.ceil(keep * len(plist))]:
+                    keep_terms[n].add(t)
+        removed = 0
+        for n, doc in enumerate(freqs):
+            # Rebuild rather than delete: dicts never shrink their tables
+            kept = {t: tf for t, tf in doc.items() if t in keep_terms[n]}
+            removed += len(doc) - len(kept)
+            bm25.doc_freqs[n] = kept
+        return removed
+
+    def index_size(self) -> dict[str, int]:
+        """Postings and the bytes of the structures holding them.
+
+        ``bytes`` covers both the scoring postings and the positional index
+        boolean and phrase queries match against; pruning only shrinks the
+        former (``scoring_bytes``), so that is what it trades against recall.
+        """
+        if self._bm25 is None:
+            raise RuntimeError("Index not built. Call build() first.")
+        freqs = self._bm25.doc_freqs
+        scoring = sum(sys.getsizeof(d) for d in freqs)
+        positional = self._positions.nbytes
+        return {
+            "postings": sum(len(d) for d in freqs),
+            "positional_postings": self._positions.postings,
+            "scoring_bytes": scoring,
+            "positional_bytes": positional,
+            "bytes": scoring + positional,
+        }
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory of the whole index (0 before build).
+
+        The postings of :meth:`index_size` plus rank_bm25's idf table and
+        document lengths, the term strings and the id list.
+        """
+        if self._bm25 is None:
+            return 0
+        bm25 = self._bm25
+        size = self.index_size()["bytes"] + sys.getsizeof(bm25.doc_freqs)
+        size += sys.getsizeof(bm25.idf) + sys.getsizeof(bm25.doc_len)
+        size += sum(sys.getsizeof(v) for v in bm25.doc_len)
+        size += sys.getsizeof(self._ids) + sum(sys.getsizeof(i) for i in self._ids)
+        return size + sum(sys.getsizeof(t) for t in bm25.idf)
+
+    def doc_id(self, pos: int) -> str:
+        return self._ids[pos]
+
+    def corpus_stats(self) -> tuple[dict[str, tuple[int, int, int]], int]:
+        """Return per-term ``(df, first doc, rank in that doc)`` and the total token count.
+
+        The first-occurrence keys let a caller merging several indexes rebuild the
+        term order a single index over the concatenated corpus would have seen.
+        Pruning doesn't change them.
+        """
+        if self._bm25 is None:
+            raise RuntimeError("Index not built. Call build() first.")
+        if self._unpruned_stats is not None:
+            return self._unpruned_stats
+        terms: dict[str, tuple[int, int, int]] = {}
+        for n, freqs in enumerate(self._bm25.doc_freqs[: self._n_docs]):
+            for rank, t in enumerate(freqs):
+                seen = terms.get(t)
+                terms[t] = (seen[0] + 1, seen[1], seen[2]) if seen else (1, n, rank)
+        return terms, sum(self._bm25.doc_len[: self._n_docs])
+
+    def term_stats(self, query: str) -> tuple[int, int, float, dict[str, int]]:
+        """Document count, token count, mean raw idf and the df of *query*'s terms.
+
+        Summed over several independent indexes (e.g. the nodes behind a
+        coordinator) they give the collection-wide ``idf`` and ``avgdl`` for
+        :meth:`search`, so scores from every index are comparable.
+        """
+        if self._bm25 is None:
+            raise RuntimeError("Index not built. Call build() first.")
+        if self._df is None:
+            terms, n_tokens = self.corpus_stats()
+            n = self._n_docs
+            df = {t: v[0] for t, v in terms.items()}
+            raw = [math.log(n - f + 0.5) - math.log(f + 0.5) for f in df.values()]
+            self._df = (df, n_tokens, sum(raw) / len(raw) if raw else 0.0)
+        df, n_tokens, mean_idf = self._df
+        toks = self._query_terms(query)
+        return self._n_docs, n_tokens, mean_idf, {t: df.get(t, 0) for t in toks}
+
+    def set_corpus_stats(self, idf: dict[str, float], avgdl: float) -> None:
+        """Score with collection-wide idf/avgdl, e.g. when this index is one shard."""
+        if self._bm25 is None:
+            raise RuntimeError("Index not built. Call build() first.")
+        self._bm25.idf = {t: idf[t] for t in self._bm25.idf if t in idf}
+        self._bm25.avgdl = avgdl
+
+    def match(
+        self, query: str, allowed: Sequence[int] | np.ndarray | None = None
+    ) -> np.ndarray | None:
+        """Positions of docs satisfying a boolean/phrase *query*, within *allowed*.
+
+        Plain bag-of-words queries don't restrict anything and return *allowed*
+        unchanged (None meaning every document).
+        """
+        if not is_structured(query):
+            return None if allowed is None else np.asarray(allowed, dtype=np.int64)
+        return self._match(parse_query(query, _tokenize), allowed)
+
+    def _match(self, node: Node | None, allowed: Sequence[int] | np.ndarray | None) -> np.ndarray:
+        rows = np.asarray(self._positions.match(node) if node else [], dtype=np.int64)
+        if allowed is not None:
+            rows = np.intersect1d(rows, np.asarray(allowed, dtype=np.int64), assume_unique=True)
+        return rows
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        *,
+        allowed: Sequence[int] | np.ndarray | None = None,
+        idf: Mapping[str, float] | None = None,
+        avgdl: float | None = None,
+    ) -> list[tuple[str, float]]:
+        """Top-k by BM25; *idf* and *avgdl* replace this index's own statistics."""
+        rows = self.top_rows(query, k, allowed=allowed, idf=idf, avgdl=avgdl)
+        return [(self._ids[i], score) for i, score in rows]
+
+    def _query_terms(self, query: str) -> list[str]:
+        if is_structured(query):
+            return scoring_terms(parse_query(query, _tokenize))
+        return _tokenize(query)
+
+    def _scores(
+        self, toks: list[str], idf: Mapping[str, float], avgdl: float, rows: np.ndarray | None
+    ) -> np.ndarray:
+        # rank_bm25's get_scores, with the given statistics
+        bm25 = self._bm25
+        assert bm25 is not None
+        n = self._n_docs
+        freqs = bm25.doc_freqs[:n] if rows is None else [bm25.doc_freqs[i] for i in rows]
+        doc_len = np.asarray(bm25.doc_len[:n], dtype=np.float64)
+        if rows is not None:
+            doc_len = doc_len[rows]
+        norm = bm25.k1 * (1 - bm25.b + bm25.b * doc_len / (avgdl or 1.0))
+        scores = np.zeros(len(freqs))
+        for t in toks:
+            tf = np.fromiter((d.get(t, 0) for d in freqs), dtype=np.float64, count=len(freqs))
+            scores += idf.get(t, 0.0) * tf * (bm25.k1 + 1) / (tf + norm)
+        return scores
 
-    def search(self, query: str, k: int = 5) -> list[tuple[str, float]]:
+    def top_rows(
+        self,
+        query: str,
+        k: int = 5,
+        *,
+        allowed: Sequence[int] | np.ndarray | None = None,
+        idf: Mapping[str, float] | None = None,
+        avgdl: float | None = None,
+    ) -> list[tuple[int, float]]:
+        """Like :meth:`search`, but return (doc position, score) pairs."""
         if self._bm25 is None:
             raise RuntimeError("Index not built. Call build() first.")
-        toks = _tokenize(query)
-        scores = self._bm25.get_scores(toks)
-        order = sorted(range(len(scores)), key=lambda i: (scores[i], -i), reverse=True)[:k]
-        return [(self._ids[i], float(scores[i])) for i in order]
+        if idf is not None and avgdl is None:
+            raise ValueError("idf needs avgdl")
+        with stage("bm25.tokenize"):
+            if is_structured(query):
+                node = parse_query(query, _tokenize)
+                toks = scoring_terms(node)
+                allowed = self._match(node, allowed)
+            else:
+                toks = _tokenize(query)
+        if allowed is None:
+            with stage("bm25.score"):
+                if idf is not None and avgdl is not None:
+                    scores = self._scores(toks, idf, avgdl, None)
+                else:
+                    scores = np.asarray(self._bm25.get_scores(toks))
+            with stage("bm25.topk"):
+                order = top_k(scores, np.arange(len(scores)), k)
+                return [(int(i), float(scores[i])) for i in order]
+        rows = np.asarray(allowed, dtype=np.int64)
+        if not len(rows) or not self._n_docs:
+            return []
+        # Selective filters/boolean matches only accumulate scores for surviving
+        # docs; broad ones are cheaper to score in full and gather afterwards.
+        with stage("bm25.score"):
+            if idf is not None and avgdl is not None:
+                sub = self._scores(toks, idf, avgdl, rows)
+            elif len(rows) * 2 < self._n_docs:
+                sub = np.asarray(self._bm25.get_batch_scores(toks, rows.tolist()))
+            else:
+                sub = self._bm25.get_scores(toks)[rows]
+        with stage("bm25.topk"):
+            return [(int(rows[j]), float(sub[j])) for j in top_k(sub, rows, k)]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from ..deadline import Deadline
+from ..timing import stage
+from .base import RetrievalBackend
+from .bm25 import BM25Backend
+from .embed import EmbeddingBackend
+from .hybrid import _minmax
+
+
+class CascadeBackend(RetrievalBackend):
+    """BM25 prefilter, then exact embedding rescoring of the top candidates only.
+
+    The top ``candidates`` BM25 rows are gathered from the document vectors
+    and scored against the query, so vector work is O(N) instead of
+    O(corpus); BM25 and cosine scores are fused over the candidates as in
+    :class:`HybridBackend`. With a latency budget, N shrinks (never below k)
+    to what the remaining budget affords at the measured per-row rescoring
+    cost.
+    """
+
+    def __init__(
+        self,
+        bm25: BM25Backend,
+        embed: EmbeddingBackend,
+        alpha: float = 0.5,
+        *,
+        candidates: int = 200,
+        budget_ms: float | None = None,
+    ) -> None:
+        if candidates <= 0:
+            raise ValueError("candidates must be positive")
+        self.bm25 = bm25
+        self.embed = embed
+        self.alpha = alpha
+        self.candidates = candidates
+        self.budget_ms = budget_ms  # default per-query budget
+        self._row_cost_s = 1e-6  # EWMA of rescoring time per candidate
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self.bm25.nbytes + self.embed.nbytes
+
+    def build(
+        self, docs: list[str], ids: list[str] | None = None, *, seed: int | None = None
+    ) -> None:
+        self.bm25.build(docs, ids, seed=seed)
+        self.embed.build(docs, ids, seed=seed)
+
+    def budgeted_candidates(self, k: int, remaining_ms: float, limit: int) -> int:
+        """How many candidates the rescoring step can afford in *remaining_ms*."""
+        affordable = int(max(0.0, remaining_ms) / 1000 / self._row_cost_s)
+        return max(k, min(limit, affordable))
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        *,
+        allowed: Sequence[int] | np.ndarray | None = None,
+        candidates: int | None = None,
+        budget_ms: float | None = None,
+        deadline: Deadline | None = None,
+    ) -> list[tuple[str, float]]:
+        """Return the fused top-k of the rescored candidates.
+
+        *budget_ms* defaults to the constructor's, capped by what is left of
+        *deadline*. If the deadline expires before rescoring, the BM25 ranking
+        is returned alone.
+        """
+        start = time.perf_counter()
+        limit = max(k, candidates or self.candidates)
+        if budget_ms is None:
+            budget_ms = self.budget_ms
+        if deadline is not None:
+            deadline.check("cascade search")
+            left = deadline.remaining_ms()
+            budget_ms = left if budget_ms is None else min(budget_ms, left)
+        # BM25 ranks every matching document anyway; the budget only trims the tail
+        ranked = self.bm25.top_rows(query, limit, allowed=allowed)
+        if not ranked:
+            return []
+        if deadline is not None and deadline.expired:
+            deadline.abandon("embed")
+            return [(self.bm25.doc_id(r), score) for r, score in ranked[:k]]
+        q = self.embed.encode_query(query)
+        n = len(ranked)
+        if budget_ms is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            n = min(n, self.budgeted_candidates(k, budget_ms - elapsed_ms, limit))
+        rows = np.fromiter((r for r, _ in ranked[:n]), dtype=np.int64, count=n)
+        rescore_start = time.perf_counter()
+        with stage("cascade.rescore"):
+            dense = self.embed.score_rows(q, rows)
+        per_row = (time.perf_counter() - rescore_start) / n
+        with self._lock:
+            self._row_cost_s = max(1e-9, 0.8 * self._row_cost_s + 0.2 * per_row)
+        with stage("cascade.fusion"):
+            bm_norm = _minmax([score for _, score in ranked[:n]])
+            em_norm = _minmax([float(s) for s in dense])
+            fused = [
+                (
+                    self.bm25.doc_id(int(rows[i])),
+                    (1 - self.alpha) * bm_norm[i] + self.alpha * em_norm[i],
+                    ranked[i][1],
+                )
+                for i in range(n)
+            ]
+            fused.sort(key=lambda x: (-x[1], -x[2], x[0]))
+            return [(doc_id, score) for doc_id, score, _ in fused[:k]]
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import copy
 import hashlib
 import logging
+from collections.abc import Sequence
 from typing import Any, Protocol
 
 import numpy as np
 
+from ..deadline import Deadline
+from ..timing import stage
 from .base import RetrievalBackend
 
 logger = logging.getLogger(__name__)
@@ -31,6 +35,197 @@ class DummyEmbeddingModel:
         return _normalize(arr)
 
 
+_U64 = np.uint64
+_P = 0x100000001B3  # FNV prime; odd, so invertible mod 2**64
+_P_INV = pow(_P, -1, 2**64)
+_BIGRAM_MUL = _U64(0x9E3779B97F4A7C15)
+_MASK64 = 2**64 - 1
+
+
+def _mix(z: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: decorrelate polynomial hashes before bucketing."""
+    z = (z ^ (z >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> _U64(27))) * _U64(0x94D049BB133111EB)
+    return z ^ (z >> _U64(31))
+
+
+class _SubstringHasher:
+    """Position-independent polynomial hashes of many substrings of one byte array.
+
+    Keeps prefix sums of ``data[i] * P**i`` (wrapping mod 2**64); rescaling a
+    difference by ``P**-start`` makes equal substrings hash equally wherever
+    they occur, so all of them are hashed at once without a Python loop.
+    """
+
+    def __init__(self, data: np.ndarray) -> None:
+        pows = np.full(len(data), _P, dtype=np.uint64)
+        inv = np.full(len(data), _P_INV, dtype=np.uint64)
+        if len(data):
+            pows[0] = inv[0] = 1
+        self._inv = np.cumprod(inv)
+        self._prefix = np.concatenate(
+            ([_U64(0)], np.cumsum(data.astype(np.uint64) * np.cumprod(pows)))
+        )
+
+    def __call__(self, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        return (self._prefix[starts + lengths] - self._prefix[starts]) * self._inv[starts]
+
+
+class HashingEmbeddingModel:
+    """Download-free embeddings from hashed word and character n-gram features.
+
+    Each text is lower-cased and split into words (``[a-z0-9_']`` and non-ASCII
+    bytes); word n-grams and character n-grams of the space-normalized text are
+    feature-hashed into ``n_features`` buckets, weighted by sublinear tf (times
+    idf once :meth:`fit`), and mapped to ``dim`` dimensions by a sparse random
+    projection: each bucket adds ``±w/sqrt(nnz)`` to ``nnz`` (at most 4) hashed
+    dimensions.
+    Vectors are L2-normalized. Batches are encoded with array operations only.
+    """
+
+    def __init__(
+        self,
+        dim: int = 384,
+        *,
+        n_features: int = 2**20,
+        word_ngrams: tuple[int, int] = (1, 2),
+        char_ngrams: tuple[int, int] = (3, 5),
+        projection_nnz: int = 4,
+        seed: int = 0,
+        batch_bytes: int = 1 << 20,
+    ) -> None:
+        if dim <= 0 or n_features <= 0:
+            raise ValueError("dim and n_features must be positive")
+        if not 1 <= projection_nnz <= 4:
+            raise ValueError("projection_nnz must be between 1 and 4")
+        if word_ngrams[0] > word_ngrams[1] or char_ngrams[0] > char_ngrams[1]:
+            raise ValueError("n-gram ranges must be (min, max)")
+        if word_ngrams[1] > 2:
+            raise ValueError("word n-grams are limited to unigrams and bigrams")
+        self.dim = dim
+        self.n_features = n_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+        self.projection_nnz = projection_nnz
+        self.seed = seed
+        self.batch_bytes = batch_bytes
+        self.idf: np.ndarray | None = None
+        # Identifies the vectors this instance produces (parameters, plus idf once fitted)
+        self.fingerprint = hashlib.blake2b(
+            repr((dim, n_features, word_ngrams, char_ngrams, projection_nnz, seed)).encode(),
+            digest_size=8,
+        ).hexdigest()
+
+    def _features(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """Return (text index, feature bucket) for every n-gram occurrence."""
+        encoded = [t.encode("utf-8") for t in texts]
+        buf = np.frombuffer(b"\0".join(encoded) + b"\0", dtype=np.uint8)
+        lens = np.fromiter((len(e) + 1 for e in encoded), dtype=np.int64, count=len(encoded))
+        doc_of = np.repeat(np.arange(len(texts)), lens)
+        upper = (buf >= 65) & (buf <= 90)
+        buf = buf + (upper * 32).astype(np.uint8)
+        word = (
+            ((buf >= 97) & (buf <= 122))
+            | ((buf >= 48) & (buf <= 57))
+            | (buf == 95)
+            | (buf == 39)
+            | (buf >= 128)
+        )
+        prev_word = np.concatenate(([False], word[:-1]))
+        next_word = np.concatenate((word[1:], [False]))
+        docs: list[np.ndarray] = []
+        hashes: list[np.ndarray] = []
+
+        def emit(kind: int, doc: np.ndarray, h: np.ndarray) -> None:
+            docs.append(doc)
+            hashes.append(_mix(h ^ _U64((((kind + 1) << 56) ^ self.seed) & _MASK64)))
+
+        # Word unigrams and bigrams
+        starts = np.flatnonzero(word & ~prev_word)
+        ends = np.flatnonzero(word & ~next_word) + 1
+        if len(starts):
+            tok = _SubstringHasher(buf)(starts, ends - starts)
+            tok_doc = doc_of[starts]
+            lo, hi = self.word_ngrams
+            if lo <= 1 <= hi:
+                emit(1, tok_doc, tok)
+            if lo <= 2 <= hi and len(tok) > 1:
+                same = tok_doc[1:] == tok_doc[:-1]
+                emit(2, tok_doc[1:][same], (_mix(tok[:-1]) * _BIGRAM_MUL + tok[1:])[same])
+
+        # Character n-grams over words joined by single spaces
+        keep = word | prev_word
+        chars = np.where(word[keep], buf[keep], np.uint8(32))
+        char_doc = doc_of[keep]
+        char_hash = _SubstringHasher(chars)
+        for n in range(self.char_ngrams[0], self.char_ngrams[1] + 1):
+            if len(chars) < n:
+                break
+            pos = np.arange(len(chars) - n + 1)
+            ok = char_doc[pos] == char_doc[pos + n - 1]
+            pos = pos[ok]
+            emit(10 + n, char_doc[pos], char_hash(pos, np.full(len(pos), n)))
+
+        if not docs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        doc = np.concatenate(docs)
+        feat = (np.concatenate(hashes) % _U64(self.n_features)).astype(np.int64)
+        return doc, feat
+
+    def _batches(self, texts: list[str]) -> list[list[str]]:
+        batches: list[list[str]] = [[]]
+        size = 0
+        for t in texts:
+            if size > self.batch_bytes and batches[-1]:
+                batches.append([])
+                size = 0
+            batches[-1].append(t)
+            size += len(t)
+        return batches
+
+    def fit(self, texts: list[str]) -> HashingEmbeddingModel:
+        """Return a copy weighting features by smoothed idf over *texts*."""
+        df = np.zeros(self.n_features, dtype=np.int64)
+        for batch in self._batches(texts):
+            doc, feat = self._features(batch)
+            uniq = np.unique(doc * self.n_features + feat) % self.n_features
+            df += np.bincount(uniq, minlength=self.n_features)
+        fitted = copy.copy(self)
+        fitted.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        digest = hashlib.blake2b(self.fingerprint.encode(), digest_size=8)
+        digest.update(fitted.idf.tobytes())
+        fitted.fingerprint = digest.hexdigest()
+        return fitted
+
+    def encode_texts(self, texts: list[str]) -> np.ndarray:
+        out = [self._encode_batch(b) for b in self._batches(texts) if b]
+        if not out:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.vstack(out)
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        n = len(texts)
+        doc, feat = self._features(texts)
+        keys, tf = np.unique(doc * self.n_features + feat, return_counts=True)
+        doc, feat = keys // self.n_features, keys % self.n_features
+        weight = 1 + np.log(tf)
+        if self.idf is not None:
+            weight = weight * self.idf[feat]
+        weight = weight / np.sqrt(self.projection_nnz)
+        # One 64-bit hash per bucket gives up to four 16-bit (sign, column) slices
+        h = _mix(feat.astype(np.uint64) ^ _U64((0x5851F42D4C957F2D ^ self.seed) & _MASK64))
+        cells: list[np.ndarray] = []
+        signed: list[np.ndarray] = []
+        for j in range(self.projection_nnz):
+            part = ((h >> _U64(16 * j)) & _U64(0xFFFF)).astype(np.int64)
+            cells.append(doc * self.dim + ((part & 0x7FFF) * self.dim >> 15))
+            signed.append(np.where(part >> 15, -weight, weight))
+        flat = np.bincount(
+            np.concatenate(cells), weights=np.concatenate(signed), minlength=n * self.dim
+        )
+        return _normalize(flat.reshape(n, self.dim).astype(np.float32))
+
+
 try:  # pragma: no cover - exercised in tests
     import faiss
 except Exception:  # pragma: no cover - module may be absent
@@ -38,6 +233,13 @@ except Exception:  # pragma: no cover - module may be absent
     logger.warning("faiss not available; using numpy cosine search")
 
 
+def _expired(deadline: Deadline | None) -> bool:
+    if deadline is None or not deadline.expired:
+        return False
+    deadline.abandon("embed")
+    return True
+
+
 def _normalize(x: np.ndarray) -> np.ndarray:
     norms = np.linalg.norm(x, axis=1, keepdims=True)
     norms[norms == 0] = 1.0
@@ -55,24 +257,87 @@ class EmbeddingBackend(RetrievalBackend):
         self, docs: list[str], ids: list[str] | None = None, *, seed: int | None = None
     ) -> None:
         self._ids = ids or [str(i) for i in range(len(docs))]
-        vecs = self.model.encode_texts(docs)
-        vecs = _normalize(vecs.astype(np.float32))
+        fit = getattr(self.model, "fit", None)
+        if callable(fit):
+            # Corpus statistics (e.g. idf) go on a private copy of a shared model
+            self.model = fit(docs)
+        # Models with a query cache (rag.models) encode documents around it
+        encode = getattr(self.model, "encode_documents", self.model.encode_texts)
+        vecs = _normalize(encode(docs).astype(np.float32))
         if faiss is not None:
             self._index = faiss.IndexFlatIP(vecs.shape[1])
             self._index.add(vecs)
         else:
             self._vecs = vecs
 
-    def search(self, query: str, k: int = 5) -> list[tuple[str, float]]:
-        q = self.model.encode_texts([query])[0]
-        q = _normalize(q.reshape(1, -1)).astype(np.float32)
+    @property
+    def nbytes(self) -> int:
+        """Memory of the stored document vectors (0 before build)."""
+        if self._index is not None:
+            return int(self._index.ntotal * self._index.d * 4)
+        return int(self._vecs.nbytes) if self._vecs is not None else 0
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """The normalized (1, d) query vector searched against the documents."""
+        with stage("embed.encode"):
+            q = self.model.encode_texts([query])[0]
+            return _normalize(q.reshape(1, -1)).astype(np.float32)
+
+    def score_rows(self, q: np.ndarray, rows: Sequence[int] | np.ndarray) -> np.ndarray:
+        """Exact cosine similarity of query vector *q* to the documents at *rows* only."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._index is not None:
+            vecs = self._index.reconstruct_batch(rows) if len(rows) else np.zeros((0, q.shape[1]))
+        elif self._vecs is not None:
+            vecs = self._vecs[rows]
+        else:
+            raise RuntimeError("Index not built. Call build() first.")
+        return np.asarray(vecs @ q.ravel(), dtype=np.float32)
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        *,
+        allowed: Sequence[int] | np.ndarray | None = None,
+        deadline: Deadline | None = None,
+    ) -> list[tuple[str, float]]:
+        """Return the top-k by cosine similarity.
+
+        With a *deadline*, encoding and scoring are skipped once it has
+        expired: the search is abandoned (recorded as ``"embed"``) and
+        returns nothing, so a leg its caller gave up on stops early.
+        """
+        if _expired(deadline):
+            return []
+        q = self.encode_query(query)
+        rows = None if allowed is None else np.asarray(allowed, dtype=np.int64)
+        if (rows is not None and not len(rows)) or _expired(deadline):
+            return []
         if self._index is not None:
-            scores, idxs = self._index.search(q, k)
-            scores = scores[0]
-            idxs = idxs[0]
+            params = None
+            if rows is not None:
+                params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows))
+                k = min(k, len(rows))
+            with stage("embed.score"):
+                scores, idxs = self._index.search(q, k, params=params)
+            keep = idxs[0] >= 0
+            scores = scores[0][keep]
+            idxs = idxs[0][keep]
         elif self._vecs is not None:
-            scores = (self._vecs @ q.T).ravel()
-            idxs = np.argsort(-scores)[:k]
+            if rows is None:
+                with stage("embed.score"):
+                    all_scores = (self._vecs @ q.T).ravel()
+                with stage("embed.topk"):
+                    idxs = np.argsort(-all_scores)[:k]
+                    scores = all_scores[idxs]
+            else:
+                # Only the allowed rows are scored
+                with stage("embed.score"):
+                    sub = (self._vecs[rows] @ q.T).ravel()
+                with stage("embed.topk"):
+                    top = np.argsort(-sub, kind="stable")[:k]
+                    scores, idxs = sub[top], rows[top]
         else:
             raise RuntimeError("Index not built. Call build() first.")
         return [(self._ids[int(i)], float(scores[int(n)])) for n, i in enumerate(idxs)]
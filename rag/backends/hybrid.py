@@ -1,9 +1,27 @@
 from __future__ import annotations
 
+import contextvars
+import time
+from collections.abc import Sequence
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from ..deadline import Deadline
+from ..executors import TrackedThreadPool
+from ..timing import stage
 from .base import RetrievalBackend
 from .bm25 import BM25Backend
 from .embed import EmbeddingBackend
 
+# Runs the embedding leg beside BM25 when a deadline may cut it off. Legs with
+# time to spare run inline instead, so the pool only bounds tightly-timed ones
+_LEGS = TrackedThreadPool(8, "hybrid-leg")
+# Inline once the deadline is at least this far off and leaves this many times
+# the leg's smoothed duration, so only a leg stalling far past its norm overruns
+_INLINE_MIN_MS = 1000.0
+_INLINE_HEADROOM = 10.0
+
 
 def _minmax(scores: list[float]) -> list[float]:
     if not scores:
@@ -21,6 +39,11 @@ class HybridBackend(RetrievalBackend):
         self.bm25 = bm25
         self.embed = embed
         self.alpha = alpha
+        self._leg_ms: float | None = None  # smoothed embedding-leg time; None until measured
+
+    @property
+    def nbytes(self) -> int:
+        return self.bm25.nbytes + self.embed.nbytes
 
     def build(
         self, docs: list[str], ids: list[str] | None = None, *, seed: int | None = None
@@ -28,9 +51,68 @@ class HybridBackend(RetrievalBackend):
         self.bm25.build(docs, ids, seed=seed)
         self.embed.build(docs, ids, seed=seed)
 
-    def search(self, query: str, k: int = 5) -> list[tuple[str, float]]:
-        bm = self.bm25.search(query, k)
-        em = self.embed.search(query, k)
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        *,
+        allowed: Sequence[int] | np.ndarray | None = None,
+        deadline: Deadline | None = None,
+    ) -> list[tuple[str, float]]:
+        """Return the fused top-k.
+
+        With a *deadline* the embedding leg runs after BM25 when the deadline
+        is far off, and otherwise beside it on a pool thread; if it is still
+        running when the deadline expires it is abandoned and the BM25 ranking
+        is returned alone. An abandoned leg stops at its next deadline check.
+        """
+        # Boolean/phrase constraints apply to the dense side through the BM25 match
+        matched = self.bm25.match(query, allowed)
+        if deadline is None:
+            bm = self.bm25.search(query, k, allowed=allowed)
+            em = self.embed.search(query, k, allowed=matched)
+        elif self._far_off(deadline):
+            bm = self.bm25.search(query, k, allowed=allowed)
+            em = self._embed_leg(query, k, matched, deadline)
+        else:
+            # In a copy of this context, so the leg's stages reach the request's timer
+            leg = _LEGS.submit(
+                contextvars.copy_context().run, self._embed_leg, query, k, matched, deadline
+            )
+            bm = self.bm25.search(query, k, allowed=allowed)
+            try:
+                em = leg.result(timeout=deadline.remaining_s())
+            except FutureTimeout:
+                leg.cancel()  # a running leg stops at its next deadline check instead
+                deadline.abandon("embed")
+                em = []
+        with stage("hybrid.fusion"):
+            return self._fuse(bm, em, k)
+
+    def _far_off(self, deadline: Deadline) -> bool:
+        """Check *deadline*, then whether it leaves ample time for the leg inline."""
+        deadline.check("hybrid search")
+        leg_ms = self._leg_ms
+        if leg_ms is None:
+            return False
+        return deadline.remaining_ms() > max(_INLINE_MIN_MS, _INLINE_HEADROOM * leg_ms)
+
+    def _embed_leg(
+        self, query: str, k: int, allowed: np.ndarray | None, deadline: Deadline
+    ) -> list[tuple[str, float]]:
+        if deadline.expired:  # queued past it: skipped, not timed
+            deadline.abandon("embed")
+            return []
+        start = time.perf_counter()
+        em = self.embed.search(query, k, allowed=allowed, deadline=deadline)
+        ms = (time.perf_counter() - start) * 1000
+        # A racy update between concurrent legs only loses one sample
+        self._leg_ms = ms if self._leg_ms is None else 0.8 * self._leg_ms + 0.2 * ms
+        return em
+
+    def _fuse(
+        self, bm: list[tuple[str, float]], em: list[tuple[str, float]], k: int
+    ) -> list[tuple[str, float]]:
         ids = sorted({doc_id for doc_id, _ in bm} | {doc_id for doc_id, _ in em})
         bm_scores = {doc_id: score for doc_id, score in bm}
         em_scores = {doc_id: score for doc_id, score in em}
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import multiprocessing
+import zlib
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import Any
+
+import numpy as np
+
+from ..deadline import Deadline
+from ..timing import stage
+from .base import RetrievalBackend
+from .bm25 import okapi_idf
+
+# State of a shard worker process: each worker owns exactly one shard index.
+_WORKER_SHARD: RetrievalBackend | None = None
+
+
+def _worker_init(factory: Callable[[], RetrievalBackend]) -> None:
+    global _WORKER_SHARD
+    _WORKER_SHARD = factory()
+
+
+def _worker_call(method: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+    return getattr(_WORKER_SHARD, method)(*args, **kwargs)
+
+
+def _worker_supports(methods: tuple[str, ...]) -> bool:
+    return all(hasattr(_WORKER_SHARD, m) for m in methods)
+
+
+def partition(ids: list[str], n: int, how: str = "hash") -> list[list[int]]:
+    """Split document positions into ``n`` groups by id hash or contiguous range."""
+    if how == "hash":
+        parts: list[list[int]] = [[] for _ in range(n)]
+        for pos, doc_id in enumerate(ids):
+            parts[zlib.crc32(doc_id.encode("utf-8")) % n].append(pos)
+        return parts
+    if how == "range":
+        size = -(-len(ids) // n) if ids else 0
+        return [list(range(i * size, min(len(ids), (i + 1) * size))) for i in range(n)]
+    raise ValueError(f"unknown partitioning: {how}")
+
+
+class ShardedBackend(RetrievalBackend):
+    """Partition a corpus over ``shards`` indexes and search them in parallel.
+
+    Each shard lives in its own worker process (``processes=True``) so
+    pure-Python scoring such as BM25 runs on separate cores; the shard index is
+    built inside the worker and stays loaded there. Shards that expose
+    ``corpus_stats``/``set_corpus_stats`` (BM25) are switched to collection-wide
+    statistics after building, so scores and the merged top-k match a single
+    unsharded index exactly, ties included.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], RetrievalBackend],
+        shards: int,
+        *,
+        partition: str = "hash",
+        processes: bool = True,
+    ) -> None:
+        if shards <= 0:
+            raise ValueError("shards must be > 0")
+        self.factory = factory
+        self.shards = shards
+        self.partition = partition
+        self.processes = processes
+        self._local: list[RetrievalBackend] = []
+        self._pools: list[ProcessPoolExecutor] = []
+        self._pos: dict[str, int] = {}
+        self._shard_of = np.array([], dtype=np.int64)
+        self._local_pos = np.array([], dtype=np.int64)
+
+    def _call(
+        self,
+        method: str,
+        per_shard: list[tuple[Any, ...]],
+        per_shard_kwargs: list[dict[str, Any]] | None = None,
+        *,
+        deadline: Deadline | None = None,
+        **kwargs: Any,
+    ) -> list[Any]:
+        """Call *method* on every shard and return the per-shard results.
+
+        With a *deadline*, shards that haven't answered by then are abandoned
+        and yield None.
+        """
+        kws = [{**kwargs, **kw} for kw in per_shard_kwargs or [{}] * len(per_shard)]
+        if self._pools:
+            futures: list[Future[Any]] = [
+                pool.submit(_worker_call, method, args, kw)
+                for pool, args, kw in zip(self._pools, per_shard, kws, strict=True)
+            ]
+            if deadline is None:
+                return [f.result() for f in futures]
+            wait(futures, timeout=deadline.remaining_s())
+            out: list[Any] = []
+            for s, f in enumerate(futures):
+                if f.done():
+                    out.append(f.result())
+                else:
+                    f.cancel()
+                    deadline.abandon(f"shard {s}")
+                    out.append(None)
+            return out
+        results: list[Any] = []
+        for s, (shard, args, kw) in enumerate(zip(self._local, per_shard, kws, strict=True)):
+            if deadline is not None and deadline.expired:
+                deadline.abandon(f"shard {s}")
+                results.append(None)
+            else:
+                results.append(getattr(shard, method)(*args, **kw))
+        return results
+
+    def build(
+        self, docs: list[str], ids: list[str] | None = None, *, seed: int | None = None
+    ) -> None:
+        self.close()
+        ids = ids or [str(i) for i in range(len(docs))]
+        parts = [p for p in partition(ids, self.shards, self.partition) if p]
+        self._pos = {doc_id: pos for pos, doc_id in enumerate(ids)}
+        self._shard_of = np.empty(len(ids), dtype=np.int64)
+        self._local_pos = np.empty(len(ids), dtype=np.int64)
+        for s, part in enumerate(parts):
+            self._shard_of[part] = s
+            self._local_pos[part] = np.arange(len(part))
+        if self.processes:
+            ctx = multiprocessing.get_context("spawn")
+            self._pools = [
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=ctx,
+                    initializer=_worker_init,
+                    initargs=(self.factory,),
+                )
+                for _ in parts
+            ]
+        else:
+            self._local = [self.factory() for _ in parts]
+        self._call(
+            "build",
+            [([docs[i] for i in part], [ids[i] for i in part]) for part in parts],
+            seed=seed,
+        )
+        if self._supports(("corpus_stats", "set_corpus_stats")):
+            self._share_bm25_stats(parts, len(docs))
+
+    def _supports(self, methods: tuple[str, ...]) -> bool:
+        if self._pools:
+            return bool(self._pools[0].submit(_worker_supports, methods).result())
+        return bool(self._local) and all(hasattr(self._local[0], m) for m in methods)
+
+    def _share_bm25_stats(self, parts: list[list[int]], n_docs: int) -> None:
+        stats = self._call("corpus_stats", [() for _ in parts])
+        merged: dict[str, tuple[int, int, int]] = {}
+        total_len = 0
+        for part, (terms, shard_len) in zip(parts, stats, strict=True):
+            total_len += shard_len
+            for t, (df, first, rank) in terms.items():
+                seen = merged.get(t)
+                key = (part[first], rank)
+                if seen is None:
+                    merged[t] = (df, *key)
+                else:
+                    merged[t] = (seen[0] + df, *min(seen[1:], key))
+        # Replay first-occurrence order so the idf average is bit-identical
+        order = sorted(merged, key=lambda t: merged[t][1:])
+        idf = okapi_idf({t: merged[t][0] for t in order}, n_docs)
+        avgdl = total_len / n_docs if n_docs else 0.0
+        self._call(
+            "set_corpus_stats",
+            [({t: idf[t] for t in terms}, avgdl) for terms, _ in stats],
+        )
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        *,
+        allowed: Sequence[int] | np.ndarray | None = None,
+        deadline: Deadline | None = None,
+    ) -> list[tuple[str, float]]:
+        """Return the merged top-k; with a *deadline*, shards that miss it are left out."""
+        if not self._pools and not self._local:
+            raise RuntimeError("Index not built. Call build() first.")
+        if deadline is not None:
+            deadline.check("sharded search")
+        # Shards in worker processes don't report their inner stages
+        with stage("sharded.scatter"):
+            if allowed is None:
+                results = self._call("search", [(query, k)] * self.live_shards, deadline=deadline)
+            else:
+                # Translate global positions into each shard's own row numbers
+                rows = np.asarray(allowed, dtype=np.int64)
+                owner = self._shard_of[rows]
+                results = self._call(
+                    "search",
+                    [(query, k)] * self.live_shards,
+                    [
+                        {"allowed": self._local_pos[rows[owner == s]]}
+                        for s in range(self.live_shards)
+                    ],
+                    deadline=deadline,
+                )
+        with stage("sharded.merge"):
+            hits = [h for part in results if part is not None for h in part]
+            hits.sort(key=lambda h: (-h[1], self._pos[h[0]]))
+            return hits[:k]
+
+    @property
+    def live_shards(self) -> int:
+        return len(self._pools) or len(self._local)
+
+    def close(self) -> None:
+        """Shut down shard worker processes."""
+        for pool in self._pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+        self._pools = []
+        self._local = []
+
+    def __enter__(self) -> ShardedBackend:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import tempfile
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from ..spimi import SpimiIndex, SpimiStats, build_spimi_index
+from .base import RetrievalBackend
+
+
+class SpimiBackend(RetrievalBackend):
+    """BM25 over an on-disk SPIMI index, built in bounded memory.
+
+    ``build`` accepts the usual in-memory lists; :meth:`build_from` streams any
+    iterable of ``(doc_id, text)`` pairs, and :meth:`open` serves an existing
+    index directory without rebuilding it.
+    """
+
+    def __init__(
+        self, path: str | Path | None = None, *, memory_limit_bytes: int = 256 * 1024 * 1024
+    ) -> None:
+        self.path = Path(path) if path is not None else None
+        self.memory_limit_bytes = memory_limit_bytes
+        self.stats: SpimiStats | None = None
+        self._tmp: tempfile.TemporaryDirectory[str] | None = None
+        self._index: SpimiIndex | None = None
+
+    @classmethod
+    def open(cls, path: str | Path) -> SpimiBackend:
+        backend = cls(path)
+        backend._index = SpimiIndex(path)
+        return backend
+
+    def build_from(self, docs: Iterable[tuple[str, str]]) -> SpimiStats:
+        if self.path is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="spimi-")
+            self.path = Path(self._tmp.name)
+        self.stats = build_spimi_index(docs, self.path, memory_limit_bytes=self.memory_limit_bytes)
+        self._index = SpimiIndex(self.path)
+        return self.stats
+
+    def build(
+        self, docs: list[str], ids: list[str] | None = None, *, seed: int | None = None
+    ) -> None:
+        ids = ids or [str(i) for i in range(len(docs))]
+        self.build_from(zip(ids, docs, strict=True))
+
+    def search(
+        self, query: str, k: int = 5, *, allowed: Sequence[int] | np.ndarray | None = None
+    ) -> list[tuple[str, float]]:
+        if self._index is None:
+            raise RuntimeError("Index not built. Call build() first.")
+        rows = None if allowed is None else np.asarray(allowed, dtype=np.int64)
+        scores = self._index.scores(query)
+        return [
+            (self._index.ids[i], float(scores[i]))
+            for i in self._index.search(query, k, rows, scores=scores)
+        ]
+
+    def close(self) -> None:
+        self._index = None
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
@@ -4,9 +4,11 @@ import re
 from collections.abc import Sequence
 from dataclasses import dataclass
 
+import numpy as np
 from rank_bm25 import BM25Okapi
 
 from rag.chunking import Chunk
+from rag.query import PositionalIndex, is_structured, parse_query, scoring_terms
 
 _WORD_RE = re.compile(r"[A-Za-z0-9_']+")
 
@@ -26,17 +28,41 @@ class BM25ChunkIndex:
         self._chunks: list[Chunk] = []
         self._tok_corpus: list[list[str]] = []
         self._bm25: BM25Okapi | None = None
+        self._positions = PositionalIndex()
 
     def build(self, chunks: Sequence[Chunk]) -> None:
         self._chunks = list(chunks)
         self._tok_corpus = [_tokenize(c.text) for c in self._chunks]
         corpus = self._tok_corpus if self._tok_corpus else [[""]]
         self._bm25 = BM25Okapi(corpus)
+        self._positions.build(self._tok_corpus)
 
-    def search(self, query: str, k: int = 5) -> list[ScoredChunk]:
+    def metadata(self) -> list[dict[str, str | None]]:
+        """Per-chunk metadata (doc id, heading) in index order, for a MetadataIndex."""
+        return [{"doc_id": c.doc_id, "heading": c.heading} for c in self._chunks]
+
+    def search(
+        self, query: str, k: int = 5, *, allowed: Sequence[int] | np.ndarray | None = None
+    ) -> list[ScoredChunk]:
         if self._bm25 is None:
             raise RuntimeError("Index not built. Call build() first.")
-        toks = _tokenize(query)
-        scores = self._bm25.get_scores(toks)
-        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
-        return [ScoredChunk(self._chunks[i], float(scores[i])) for i in order]
+        if is_structured(query):
+            # Boolean/phrase query: only chunks matching it are scored
+            node = parse_query(query, _tokenize)
+            toks = scoring_terms(node)
+            matched = np.asarray(self._positions.match(node) if node else [], dtype=np.int64)
+            if allowed is not None:
+                matched = np.intersect1d(matched, np.asarray(allowed, dtype=np.int64))
+            allowed = matched
+        else:
+            toks = _tokenize(query)
+        if allowed is None:
+            scores = self._bm25.get_scores(toks)
+            order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+            return [ScoredChunk(self._chunks[i], float(scores[i])) for i in order]
+        rows = np.asarray(allowed, dtype=np.int64)
+        if not len(rows) or not self._chunks:
+            return []
+        sub = np.asarray(self._bm25.get_batch_scores(toks, rows.tolist()))
+        top = sorted(range(len(rows)), key=lambda j: sub[j], reverse=True)[:k]
+        return [ScoredChunk(self._chunks[rows[j]], float(sub[j])) for j in top]
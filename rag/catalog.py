@@ -0,0 +1,249 @@
+"""Named document collections served under a shared memory budget.
+
+Each collection lives on disk as ``<root>/<name>/docs.ndjson`` (one
+``{"id", "text", "metadata"?}`` object per line). It is loaded on first use,
+gets its own :class:`IndexRegistry` with lazily built backends, and is unloaded
+back to its on-disk form, least recently used first, whenever the resident
+collections exceed the budget.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable, Iterator, Mapping
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import structlog
+
+from .backends.cascade import CascadeBackend
+from .backends.hybrid import HybridBackend
+from .registry import IndexHandle, IndexRegistry
+from .retriever import BACKEND_NAMES, CorpusSnapshot, backend_builder
+
+logger = structlog.get_logger("catalog")
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+DOCS_FILE = "docs.ndjson"
+
+
+def valid_collection_name(name: str) -> bool:
+    return bool(_NAME_RE.match(name)) and ".." not in name
+
+
+def write_collection(
+    root: str | Path,
+    name: str,
+    docs: Iterable[tuple[str, str]],
+    metadata: Mapping[str, Mapping[str, str]] | None = None,
+) -> Path:
+    """Write (or replace) the on-disk form of collection *name* under *root*."""
+    if not valid_collection_name(name):
+        raise ValueError(f"invalid collection name: {name!r}")
+    path = Path(root) / name
+    path.mkdir(parents=True, exist_ok=True)
+    tmp = path / (DOCS_FILE + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for doc_id, text in docs:
+            rec: dict[str, Any] = {"id": doc_id, "text": text}
+            if metadata and doc_id in metadata:
+                rec["metadata"] = dict(metadata[doc_id])
+            f.write(json.dumps(rec) + "\n")
+    tmp.replace(path / DOCS_FILE)
+    return path
+
+
+def load_snapshot(path: Path) -> CorpusSnapshot:
+    ids: list[str] = []
+    texts: list[str] = []
+    metadata: list[dict[str, str]] = []
+    with (path / DOCS_FILE).open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            ids.append(str(rec["id"]))
+            texts.append(str(rec["text"]))
+            metadata.append({str(k): str(v) for k, v in (rec.get("metadata") or {}).items()})
+    return CorpusSnapshot(ids=tuple(ids), texts=tuple(texts), metadata=tuple(metadata))
+
+
+@dataclass
+class CollectionStats:
+    loads: int = 0
+    load_seconds: float = 0.0  # cumulative time spent loading and building indexes
+    evictions: int = 0
+    resident_bytes: int = 0
+
+
+class Collection:
+    """One collection's corpus and indexes; ``corpus`` is None while unloaded."""
+
+    def __init__(self, name: str, path: Path) -> None:
+        self.name = name
+        self.path = path
+        self.registry = IndexRegistry()
+        self.corpus: CorpusSnapshot | None = None
+        self.stats = CollectionStats()
+        self.lock = threading.Lock()
+
+    @property
+    def resident(self) -> bool:
+        return self.corpus is not None
+
+    def measure(self) -> int:
+        """Recompute the approximate resident size of the corpus and built indexes."""
+        if self.corpus is None:
+            size = 0
+        else:
+            size = self.corpus.nbytes
+            # hybrid/cascade share their bm25/embed parts with those indexes; count each once
+            parts: dict[int, Any] = {}
+            for name in self.registry.generations():
+                handle = self.registry.get(name)
+                backend = handle.backend if handle is not None else None
+                if isinstance(backend, HybridBackend | CascadeBackend):
+                    parts.update({id(p): p for p in (backend.bm25, backend.embed)})
+                elif backend is not None:
+                    parts[id(backend)] = backend
+            size += sum(int(getattr(p, "nbytes", 0)) for p in parts.values())
+        self.stats.resident_bytes = size
+        return size
+
+    def unload(self) -> None:
+        """Drop the corpus and indexes; in-flight queries finish on their leases."""
+        self.registry.clear()
+        self.corpus = None
+        self.stats.resident_bytes = 0
+
+
+class CollectionCatalog:
+    """Collections under *root*, kept within *memory_budget_bytes* by LRU eviction.
+
+    The collection being queried is never evicted, so one collection larger
+    than the budget still serves (alone).
+    """
+
+    def __init__(self, root: str | Path, *, memory_budget_bytes: int) -> None:
+        self.root = Path(root)
+        self.memory_budget_bytes = memory_budget_bytes
+        self._collections: dict[str, Collection] = {}
+        self._lru: OrderedDict[str, None] = OrderedDict()  # resident names, oldest first
+        self._lock = threading.Lock()
+
+    def names(self) -> list[str]:
+        """Every collection on disk, loaded or not."""
+        if not self.root.is_dir():
+            return []
+        return sorted(
+            p.name
+            for p in self.root.iterdir()
+            if (p / DOCS_FILE).is_file() and valid_collection_name(p.name)
+        )
+
+    def get(self, name: str) -> Collection:
+        """Return collection *name* (not necessarily loaded); KeyError if it doesn't exist."""
+        with self._lock:
+            coll = self._collections.get(name)
+            if coll is None:
+                path = self.root / name
+                if not valid_collection_name(name) or not (path / DOCS_FILE).is_file():
+                    raise KeyError(name)
+                coll = self._collections[name] = Collection(name, path)
+            return coll
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(c.stats.resident_bytes for c in list(self._collections.values()))
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            name: {
+                "resident": coll.resident,
+                "indexes": coll.registry.generations(),
+                "resident_bytes": coll.stats.resident_bytes,
+                "loads": coll.stats.loads,
+                "load_seconds": round(coll.stats.load_seconds, 6),
+                "evictions": coll.stats.evictions,
+            }
+            for name, coll in sorted(self._collections.items())
+        }
+
+    @contextmanager
+    def lease(
+        self, name: str, backend: str, options: dict[str, Any]
+    ) -> Iterator[tuple[IndexHandle, CorpusSnapshot]]:
+        """Pin backend *backend* of collection *name*, loading and building it if needed.
+
+        Yields the handle and the corpus snapshot its doc positions refer to.
+        """
+        if backend not in BACKEND_NAMES:
+            raise ValueError(f"unknown backend: {backend}")
+        coll = self.get(name)
+        with ExitStack() as stack:
+            # Pin the index before releasing the lock, so an eviction between here and
+            # the query can only retire it under the lease, never rebuild it unaccounted
+            with coll.lock:
+                start = time.perf_counter()
+                loaded = coll.corpus is None
+                corpus = coll.corpus = coll.corpus or load_snapshot(coll.path)
+                builder = backend_builder(backend, corpus, options, coll.registry)
+                loaded = loaded or coll.registry.get(backend) is None
+                handle = stack.enter_context(coll.registry.lease(backend, builder, source=corpus))
+                if loaded:
+                    coll.stats.loads += 1
+                    coll.stats.load_seconds += time.perf_counter() - start
+                    coll.measure()
+                    logger.info(
+                        "collection_loaded",
+                        collection=name,
+                        backend=backend,
+                        load_ms=round((time.perf_counter() - start) * 1000, 2),
+                        resident_bytes=coll.stats.resident_bytes,
+                    )
+            self._touch(coll)
+            yield handle, handle.source
+
+    def _touch(self, coll: Collection) -> None:
+        with self._lock:
+            self._lru[coll.name] = None
+            self._lru.move_to_end(coll.name)
+            victims: list[Collection] = []
+            total = self.resident_bytes
+            for other in list(self._lru):
+                if total <= self.memory_budget_bytes:
+                    break
+                if other == coll.name:
+                    continue
+                victim = self._collections[other]
+                total -= victim.stats.resident_bytes
+                del self._lru[other]
+                victims.append(victim)
+        for victim in victims:
+            # Skip a victim that is mid-load; it'll be reconsidered on the next touch
+            if not victim.lock.acquire(blocking=False):
+                with self._lock:
+                    self._lru[victim.name] = None
+                continue
+            try:
+                if not victim.resident:  # unloaded by a concurrent touch
+                    continue
+                victim.unload()
+                victim.stats.evictions += 1
+            finally:
+                victim.lock.release()
+            logger.info("collection_evicted", collection=victim.name)
+
+    def clear(self) -> None:
+        with self._lock:
+            colls = list(self._collections.values())
+            self._collections.clear()
+            self._lru.clear()
+        for coll in colls:
+            coll.unload()
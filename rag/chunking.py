@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import re
-from dataclasses import dataclass
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
 
 _HEADING_RE = re.compile(r"^(#{1,6})\s+(?P<title>.+)$", re.M)
 _SPLIT_RE = re.compile(r"(?<=\S)(?:(?<=[.!?])\s+|\n{2,})")
@@ -32,17 +33,21 @@ def _heading_sections(text: str) -> list[tuple[int, int, str | None]]:
     return sections
 
 
-def _sent_spans(text: str) -> list[tuple[int, int]]:
-    spans: list[tuple[int, int]] = []
-    start = 0
-    for m in _SPLIT_RE.finditer(text):
+def _iter_spans(text: str, pos: int = 0) -> Iterator[tuple[int, int]]:
+    # ``pos`` must be 0 or lie inside a sentence span; the split pattern only matches
+    # right after a non-space char, so every match found from there is a real boundary.
+    start = pos
+    for m in _SPLIT_RE.finditer(text, pos):
         end = m.start()
         if text[start:end].strip():
-            spans.append((start, end))
+            yield (start, end)
         start = m.end()
     if start < len(text) and text[start:].strip():
-        spans.append((start, len(text)))
-    return spans
+        yield (start, len(text))
+
+
+def _sent_spans(text: str) -> list[tuple[int, int]]:
+    return list(_iter_spans(text))
 
 
 def _label_for_offset(sections: list[tuple[int, int, str | None]], offset: int) -> str | None:
@@ -90,52 +95,58 @@ def _keep_suffix(
     return (out, tally)
 
 
-def chunk_text(doc_id: str, text: str, *, max_chars: int = 800, overlap: int = 120) -> list[Chunk]:
-    if max_chars <= 0:
-        raise ValueError("max_chars must be > 0")
-    if overlap < 0:
-        raise ValueError("overlap must be >= 0")
-
-    eff_overlap = min(overlap, max_chars)
-    sections = _heading_sections(text)
-    spans = _sent_spans(text)
-    if not spans:
-        return [Chunk(doc_id=doc_id, text=text, start=0, end=len(text), heading=None)]
+def _iter_chunks(
+    doc_id: str,
+    text: str,
+    sections: list[tuple[int, int, str | None]],
+    spans: Iterable[tuple[int, int]],
+    *,
+    max_chars: int,
+    overlap: int,
+    buf: list[tuple[int, int]] | None = None,
+) -> Iterator[tuple[Chunk, int]]:
+    """Greedy sentence packer behind :func:`chunk_text`.
 
-    chunks: list[Chunk] = []
-    buf: list[tuple[int, int]] = []
-    buf_chars = 0
+    Yields ``(chunk, pieces)`` where ``pieces`` is the number of sentence pieces
+    flushed into the chunk (0 for hard-split windows of an over-long sentence).
+    ``buf`` resumes packing with pieces that are still pending a flush.
+    """
+    buf = list(buf or [])
+    buf_chars = sum(e - s for s, e in buf)
 
-    def flush() -> None:
+    def flush() -> tuple[Chunk, int] | None:
         nonlocal buf, buf_chars
         if not buf:
-            return
+            return None
         # Build body from the spans only (no separators) so len(body) == buf_chars
         body = "".join(text[s:e] for s, e in buf).strip()
         if not body:
             buf, buf_chars = [], 0
-            return
+            return None
         s0, e_n = buf[0][0], buf[-1][1]
         heading = _heading_for_chunk(sections, s0, e_n)
-        chunks.append(Chunk(doc_id=doc_id, text=body, start=s0, end=e_n, heading=heading))
-        buf, buf_chars = _keep_suffix(buf, eff_overlap)
+        flushed = (Chunk(doc_id=doc_id, text=body, start=s0, end=e_n, heading=heading), len(buf))
+        buf, buf_chars = _keep_suffix(buf, overlap)
+        return flushed
 
     for s, e in spans:
         span_len = e - s
 
         # If a single span is too long, hard-split it into windows of size max_chars
         if span_len > max_chars:
-            flush()
+            flushed = flush()
+            if flushed:
+                yield flushed
             i = s
             while i < e:
                 j = min(i + max_chars, e)
                 body = text[i:j].strip()
                 if body:
                     heading = _heading_for_chunk(sections, i, j)
-                    chunks.append(Chunk(doc_id=doc_id, text=body, start=i, end=j, heading=heading))
+                    yield (Chunk(doc_id=doc_id, text=body, start=i, end=j, heading=heading), 0)
                 if j >= e:
                     break
-                i = j - eff_overlap if eff_overlap > 0 else j
+                i = j - overlap if overlap > 0 else j
             buf, buf_chars = [], 0
             continue
 
@@ -148,7 +159,9 @@ def chunk_text(doc_id: str, text: str, *, max_chars: int = 800, overlap: int = 1
             buf.append((s, e))
             buf_chars += span_len
         else:
-            flush()
+            flushed = flush()
+            if flushed:
+                yield flushed
             keep = max_chars - span_len
             if keep < 0:
                 keep = 0
@@ -157,5 +170,246 @@ def chunk_text(doc_id: str, text: str, *, max_chars: int = 800, overlap: int = 1
             buf.append((s, e))
             buf_chars += span_len
 
-    flush()
-    return chunks
+    flushed = flush()
+    if flushed:
+        yield flushed
+
+
+def _check_params(max_chars: int, overlap: int) -> None:
+    if max_chars <= 0:
+        raise ValueError("max_chars must be > 0")
+    if overlap < 0:
+        raise ValueError("overlap must be >= 0")
+
+
+def chunk_text(doc_id: str, text: str, *, max_chars: int = 800, overlap: int = 120) -> list[Chunk]:
+    _check_params(max_chars, overlap)
+
+    eff_overlap = min(overlap, max_chars)
+    sections = _heading_sections(text)
+    spans = _sent_spans(text)
+    if not spans:
+        return [Chunk(doc_id=doc_id, text=text, start=0, end=len(text), heading=None)]
+
+    return [
+        c
+        for c, _ in _iter_chunks(
+            doc_id, text, sections, spans, max_chars=max_chars, overlap=eff_overlap
+        )
+    ]
+
+
+# --- incremental re-chunking ------------------------------------------------
+
+_CMP_BLOCK = 4096
+
+
+@dataclass(frozen=True)
+class RechunkResult:
+    """Outcome of :func:`rechunk`.
+
+    ``chunks`` is the full chunk list for the new text (identical to a fresh
+    :func:`chunk_text` run). ``kept`` holds the new chunks whose text and heading
+    are unchanged (tail chunks carry offsets shifted by ``offset_delta``),
+    ``removed`` the old chunks that no longer exist and ``added`` the new ones.
+    """
+
+    chunks: list[Chunk]
+    kept: list[Chunk] = field(default_factory=list)
+    removed: list[Chunk] = field(default_factory=list)
+    added: list[Chunk] = field(default_factory=list)
+    offset_delta: int = 0
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    # Compare in blocks first so long identical stretches stay in C
+    while i + _CMP_BLOCK <= n and a[i : i + _CMP_BLOCK] == b[i : i + _CMP_BLOCK]:
+        i += _CMP_BLOCK
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _common_suffix_len(a: str, b: str, limit: int) -> int:
+    la, lb = len(a), len(b)
+    i = 0
+    while i + _CMP_BLOCK <= limit and (
+        a[la - i - _CMP_BLOCK : la - i] == b[lb - i - _CMP_BLOCK : lb - i]
+    ):
+        i += _CMP_BLOCK
+    while i < limit and a[la - i - 1] == b[lb - i - 1]:
+        i += 1
+    return i
+
+
+def _heading_lines(text: str, limit: int) -> list[tuple[int, int, str]]:
+    out: list[tuple[int, int, str]] = []
+    for m in _HEADING_RE.finditer(text):
+        if m.start() >= limit:
+            break
+        out.append((m.start(), m.end(), m.group(0)))
+    return out
+
+
+def _stable_heading_prefix(old_text: str, new_text: str, prefix: int) -> int:
+    """Return an offset below which chunk headings are the same in both texts."""
+    old_h = _heading_lines(old_text, prefix)
+    new_h = _heading_lines(new_text, prefix)
+    for o, n in zip(old_h, new_h, strict=False):
+        if o != n:
+            return min(o[0], n[0])
+    extra = old_h[len(new_h) :] or new_h[len(old_h) :]
+    return extra[0][0] if extra else prefix
+
+
+def _stable_heading_suffix(old_text: str, new_text: str, suffix_start: int, delta: int) -> int:
+    """Return a new-text offset from which tail chunks keep their old heading.
+
+    That is the first heading line inside the unchanged suffix that both texts
+    parse the same way; ``len(new_text)`` if there is none.
+    """
+    for m in _HEADING_RE.finditer(new_text, suffix_start + 1):
+        # A heading can only be swallowed by an earlier "#" line whose title
+        # wraps onto it, so require the previous non-blank char to be unchanged
+        # and not a "#".
+        p = m.start() - 1
+        while p >= 0 and new_text[p].isspace():
+            p -= 1
+        if p < suffix_start or new_text[p] == "#":
+            continue
+        m_old = _HEADING_RE.match(old_text, m.start() - delta)
+        if m_old is not None and m_old.end() == m.end() - delta:
+            return m.start()
+    return len(new_text)
+
+
+def _diff_chunks(
+    old: Sequence[Chunk], new: Sequence[Chunk], prefix: int, suffix_start: int, delta: int
+) -> tuple[list[Chunk], list[Chunk], list[Chunk]]:
+    by_span = {(c.start, c.end): c for c in old}
+    kept: list[Chunk] = []
+    added: list[Chunk] = []
+    matched: set[tuple[int, int]] = set()
+    for c in new:
+        key: tuple[int, int] | None = None
+        if c.end <= prefix:
+            key = (c.start, c.end)
+        elif c.start >= suffix_start:
+            key = (c.start - delta, c.end - delta)
+        prev = by_span.get(key) if key is not None else None
+        if prev is not None and prev.text == c.text and prev.heading == c.heading:
+            kept.append(c)
+            matched.add((prev.start, prev.end))
+        else:
+            added.append(c)
+    removed = [c for c in old if (c.start, c.end) not in matched]
+    return kept, removed, added
+
+
+def _find_anchor(old_chunks: Sequence[Chunk], text: str, limit: int) -> int | None:
+    # The anchor must have been emitted by a regular flush, which holds for any
+    # chunk made of two or more sentence pieces: its pieces are then exactly the
+    # buffer pending when the packer reached the next sentence. The two chars
+    # after it must be unchanged too so the separator that ended it ("\n\n" at
+    # worst) still matches.
+    for r in range(len(old_chunks) - 1, -1, -1):
+        c = old_chunks[r]
+        if c.end + 2 > limit:
+            continue
+        if _SPLIT_RE.search(text, c.start, c.end):
+            return r
+    return None
+
+
+def rechunk(
+    old_chunks: Sequence[Chunk],
+    old_text: str,
+    new_text: str,
+    *,
+    doc_id: str | None = None,
+    max_chars: int = 800,
+    overlap: int = 120,
+) -> RechunkResult:
+    """Re-chunk an edited document, touching only the region around the edit.
+
+    ``old_chunks`` must be the output of ``chunk_text(doc_id, old_text, ...)`` with
+    the same ``max_chars``/``overlap``. Packing restarts at the last multi-sentence
+    chunk ending before the first changed character and stops as soon as it emits
+    a chunk that already exists (shifted) in the unchanged tail; the remaining tail
+    chunks are reused with shifted offsets. The result equals a full
+    :func:`chunk_text` run over ``new_text``.
+    """
+    _check_params(max_chars, overlap)
+    if doc_id is None:
+        if not old_chunks:
+            raise ValueError("doc_id is required when old_chunks is empty")
+        doc_id = old_chunks[0].doc_id
+    old_chunks = list(old_chunks)
+
+    delta = len(new_text) - len(old_text)
+    prefix = _common_prefix_len(old_text, new_text)
+    if prefix == len(old_text) == len(new_text):
+        return RechunkResult(chunks=old_chunks, kept=list(old_chunks))
+    suffix = _common_suffix_len(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+    suffix_start = len(new_text) - suffix
+
+    eff_overlap = min(overlap, max_chars)
+    head_limit = _stable_heading_prefix(old_text, new_text, prefix)
+    r = _find_anchor(old_chunks, new_text, head_limit)
+    if r is None:
+        chunks = chunk_text(doc_id, new_text, max_chars=max_chars, overlap=overlap)
+        kept, removed, added = _diff_chunks(old_chunks, chunks, prefix, suffix_start, delta)
+        return RechunkResult(chunks, kept, removed, added, delta)
+
+    anchor = old_chunks[r]
+    spans = _iter_spans(new_text, anchor.start)
+    pending: list[tuple[int, int]] = []
+    for s, e in spans:
+        pending.append((s, e))
+        if e >= anchor.end:
+            break
+    if not pending or pending[-1][1] != anchor.end:
+        raise ValueError("old_chunks do not match old_text")
+
+    sections = _heading_sections(new_text)
+    tail_by_span = {(c.start, c.end): i for i, c in enumerate(old_chunks) if i > r}
+    middle: list[Chunk] = []
+    tail_from = len(old_chunks)
+    for c, pieces in _iter_chunks(
+        doc_id, new_text, sections, spans, max_chars=max_chars, overlap=eff_overlap, buf=pending
+    ):
+        middle.append(c)
+        if pieces >= 2 and c.start >= suffix_start:
+            t = tail_by_span.get((c.start - delta, c.end - delta))
+            if t is not None:
+                tail_from = t + 1
+                break
+
+    heading_stable_from = _stable_heading_suffix(old_text, new_text, suffix_start, delta)
+    tail: list[Chunk] = []
+    relabeled: list[Chunk] = []
+    stale: list[Chunk] = []
+    for old in old_chunks[tail_from:]:
+        start, end = old.start + delta, old.end + delta
+        heading = old.heading
+        if start < heading_stable_from:
+            heading = _heading_for_chunk(sections, start, end)
+        c = Chunk(doc_id=doc_id, text=old.text, start=start, end=end, heading=heading)
+        tail.append(c)
+        if heading != old.heading:
+            relabeled.append(c)
+            stale.append(old)
+
+    kept_mid, removed_mid, added_mid = _diff_chunks(
+        old_chunks[r:tail_from], middle, prefix, suffix_start, delta
+    )
+    stale_ids = {id(c) for c in relabeled}
+    return RechunkResult(
+        chunks=old_chunks[:r] + middle + tail,
+        kept=old_chunks[:r] + kept_mid + [c for c in tail if id(c) not in stale_ids],
+        removed=removed_mid + stale,
+        added=added_mid + relabeled,
+        offset_delta=delta,
+    )
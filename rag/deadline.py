@@ -0,0 +1,56 @@
+"""Per-request deadlines carried through retrieval.
+
+A :class:`Deadline` is an absolute point on the monotonic clock, started when
+the request arrived, so time spent queued counts against it. Stages check
+:meth:`Deadline.remaining_ms` before starting work; a stage that gives up on a
+leg records it with :meth:`Deadline.abandon`, which marks the result partial.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+
+
+class DeadlineExceededError(RuntimeError):
+    """The deadline passed before any result could be produced."""
+
+
+class Deadline:
+    def __init__(self, timeout_ms: float, *, start: float | None = None) -> None:
+        self.timeout_ms = timeout_ms
+        self.start = time.monotonic() if start is None else start
+        self.at = self.start + timeout_ms / 1000
+        self.abandoned: list[str] = []
+        self._lock = threading.Lock()
+
+    def remaining_ms(self) -> float:
+        return max(0.0, (self.at - time.monotonic()) * 1000)
+
+    def remaining_s(self) -> float:
+        return self.remaining_ms() / 1000
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.monotonic() - self.start) * 1000
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.abandoned)
+
+    def abandon(self, leg: str) -> None:
+        """Record that *leg* was skipped or cut off, so the results are partial."""
+        with self._lock:
+            if leg not in self.abandoned:
+                self.abandoned.append(leg)
+
+    def check(self, stage: str) -> None:
+        """Raise :class:`DeadlineExceededError` if the deadline passed before *stage*."""
+        if self.expired:
+            raise DeadlineExceededError(
+                f"deadline of {self.timeout_ms:g} ms exceeded before {stage}"
+            )
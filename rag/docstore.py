@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import json
+import lzma
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from pathlib import Path
+from typing import Any
+
+# File layout: MAGIC | compressed blocks ... | zlib(JSON index) | footer
+# The footer holds the index offset/length so readers can find it via one seek.
+MAGIC = b"RAGDOCS1"
+_FOOTER = struct.Struct("<QQ8s")
+
+_COMPRESS: dict[str, Callable[[bytes, int | None], bytes]] = {
+    "zlib": lambda data, level: zlib.compress(data, 6 if level is None else level),
+    "lzma": lambda data, level: lzma.compress(data, preset=6 if level is None else level),
+    "none": lambda data, level: data,
+}
+_DECOMPRESS: dict[str, Callable[[bytes], bytes]] = {
+    "zlib": zlib.decompress,
+    "lzma": lzma.decompress,
+    "none": bytes,
+}
+
+
+def write_docstore(
+    path: str | Path,
+    docs: Iterable[tuple[str, str]],
+    *,
+    block_bytes: int = 64 * 1024,
+    codec: str = "zlib",
+    level: int | None = None,
+) -> None:
+    """Write ``(doc_id, text)`` pairs into a block-compressed document store.
+
+    Documents are packed in order into blocks of roughly ``block_bytes``
+    uncompressed UTF-8 bytes; a document larger than that gets a block of its
+    own. Larger blocks compress better but cost more to decompress per lookup.
+    The file is written next to ``path`` and renamed into place.
+    """
+    if codec not in _COMPRESS:
+        raise ValueError(f"unknown codec: {codec}")
+    if block_bytes <= 0:
+        raise ValueError("block_bytes must be > 0")
+    compress = _COMPRESS[codec]
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+
+    blocks: list[tuple[int, int]] = []
+    index: dict[str, tuple[int, int, int]] = {}
+    pending: list[bytes] = []
+    pending_len = 0
+
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+
+        def flush() -> None:
+            nonlocal pending, pending_len
+            if not pending:
+                return
+            data = compress(b"".join(pending), level)
+            blocks.append((f.tell(), len(data)))
+            f.write(data)
+            pending, pending_len = [], 0
+
+        for doc_id, text in docs:
+            raw = text.encode("utf-8")
+            if pending and pending_len + len(raw) > block_bytes:
+                flush()
+            index[doc_id] = (len(blocks), pending_len, pending_len + len(raw))
+            pending.append(raw)
+            pending_len += len(raw)
+        flush()
+
+        meta = json.dumps({"codec": codec, "blocks": blocks, "docs": index}).encode("utf-8")
+        meta_z = zlib.compress(meta)
+        meta_off = f.tell()
+        f.write(meta_z)
+        f.write(_FOOTER.pack(meta_off, len(meta_z), MAGIC))
+    os.replace(tmp, path)
+
+
+class DocStore(Mapping[str, str]):
+    """Read-only, mmap-backed view over a file written by :func:`write_docstore`.
+
+    Only the offset table lives on the heap; block payloads stay in the page
+    cache and decompressed blocks are kept in an LRU bounded by ``cache_bytes``.
+    ``cache_bytes=0`` disables caching (lowest memory, one decompression per
+    lookup). Safe to share between threads.
+    """
+
+    def __init__(self, path: str | Path, *, cache_bytes: int = 8 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.cache_bytes = max(0, int(cache_bytes))
+        self._cache: OrderedDict[int, bytes] = OrderedDict()
+        self._cached = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self.path.open("rb") as f:
+            try:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file cannot be mapped
+                raise ValueError(f"not a document store: {self.path}") from None
+        footer = self._mm[-_FOOTER.size :] if len(self._mm) >= _FOOTER.size else b""
+        if self._mm[: len(MAGIC)] != MAGIC or not footer.endswith(MAGIC):
+            self._mm.close()
+            raise ValueError(f"not a document store: {self.path}")
+        meta_off, meta_len, _ = _FOOTER.unpack(footer)
+        meta = json.loads(zlib.decompress(self._mm[meta_off : meta_off + meta_len]))
+        self.codec: str = meta["codec"]
+        self._decompress = _DECOMPRESS[self.codec]
+        self._blocks: list[tuple[int, int]] = [(int(o), int(n)) for o, n in meta["blocks"]]
+        self._docs: dict[str, tuple[int, int, int]] = {
+            k: (int(b), int(s), int(e)) for k, (b, s, e) in meta["docs"].items()
+        }
+
+    def _block(self, i: int) -> bytes:
+        with self._lock:
+            data = self._cache.get(i)
+            if data is not None:
+                self._cache.move_to_end(i)
+                self.hits += 1
+                return data
+            self.misses += 1
+        off, n = self._blocks[i]
+        data = self._decompress(self._mm[off : off + n])
+        if len(data) > self.cache_bytes:
+            return data
+        with self._lock:
+            if i not in self._cache:
+                self._cache[i] = data
+                self._cached += len(data)
+                while self._cached > self.cache_bytes:
+                    _, old = self._cache.popitem(last=False)
+                    self._cached -= len(old)
+        return data
+
+    def __getitem__(self, doc_id: str) -> str:
+        block, start, end = self._docs[doc_id]
+        if self.codec == "none":  # uncompressed: read just this document from the map
+            off = self._blocks[block][0]
+            return self._mm[off + start : off + end].decode("utf-8")
+        return self._block(block)[start:end].decode("utf-8")
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._docs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._docs)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def stats(self) -> dict[str, Any]:
+        """Return cache counters and the memory currently held by decompressed blocks."""
+        with self._lock:
+            return {
+                "codec": self.codec,
+                "docs": len(self._docs),
+                "blocks": len(self._blocks),
+                "file_bytes": len(self._mm),
+                "cache_bytes": self.cache_bytes,
+                "cached_bytes": self._cached,
+                "cached_blocks": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._cached = 0
+        self._mm.close()
+
+    def __enter__(self) -> DocStore:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
@@ -0,0 +1,84 @@
+"""Thread pools that report their own utilization.
+
+:class:`TrackedThreadPool` is a :class:`~concurrent.futures.ThreadPoolExecutor`
+that counts queued and running tasks and accumulates busy worker time, so
+saturation can be exported per pool (see :func:`executor_stats`). Pools
+register under their name when created; the newest pool of a name wins.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+_POOLS: weakref.WeakValueDictionary[str, TrackedThreadPool] = weakref.WeakValueDictionary()
+
+
+class TrackedThreadPool(ThreadPoolExecutor):
+    """A thread pool named *name* that tracks queued tasks, busy workers and busy time."""
+
+    def __init__(self, max_workers: int, name: str) -> None:
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        self.workers = max_workers
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._busy = 0
+        self._busy_s = 0.0
+        self._completed = 0
+        _POOLS[name] = self
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future[T]:
+        with self._stats_lock:
+            self._queued += 1
+        try:
+            fut = super().submit(self._run, fn, args, kwargs)
+        except BaseException:
+            with self._stats_lock:
+                self._queued -= 1
+            raise
+        fut.add_done_callback(self._unqueue_cancelled)
+        return fut
+
+    def _unqueue_cancelled(self, fut: Future[Any]) -> None:
+        # Only a task that never started can be cancelled, so _run won't count it
+        if fut.cancelled():
+            with self._stats_lock:
+                self._queued -= 1
+
+    def _run(self, fn: Callable[..., T], args: tuple[Any, ...], kwargs: dict[str, Any]) -> T:
+        with self._stats_lock:
+            self._queued -= 1
+            self._busy += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self._busy -= 1
+                self._busy_s += elapsed
+                self._completed += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Current queue and worker use, plus totals since the pool started."""
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "busy": self._busy,
+                "queued": self._queued,
+                "utilization": self._busy / self.workers,
+                "busy_seconds": self._busy_s,
+                "completed": self._completed,
+            }
+
+
+def executor_stats() -> dict[str, dict[str, Any]]:
+    """:meth:`TrackedThreadPool.stats` of every live pool, by name."""
+    return {name: pool.stats() for name, pool in list(_POOLS.items())}
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping, Sequence
+
+import numpy as np
+
+# Field matched against the start of the document id instead of a stored value
+PREFIX_FIELD = "doc_id_prefix"
+
+# A value is stored as sorted positions while that is smaller than a bitset
+# (4 bytes per position vs. 1 bit per document), like Roaring's array containers.
+_SPARSE_RATIO = 32
+
+
+class _Container:
+    __slots__ = ("positions", "bits")
+
+    def __init__(self, positions: np.ndarray | None, bits: np.ndarray | None) -> None:
+        self.positions = positions
+        self.bits = bits
+
+    @property
+    def nbytes(self) -> int:
+        arr = self.positions if self.positions is not None else self.bits
+        return int(arr.nbytes) if arr is not None else 0
+
+
+def parse_filters(items: Iterable[str]) -> dict[str, list[str]]:
+    """Parse ``field:value`` strings; repeated fields are OR-ed together."""
+    spec: dict[str, list[str]] = {}
+    for item in items:
+        name, sep, value = item.partition(":")
+        if not sep or not name.strip():
+            raise ValueError(f"invalid filter {item!r}, expected field:value")
+        spec.setdefault(name.strip(), []).append(value.strip())
+    return spec
+
+
+class MetadataIndex:
+    """Bitmap index over per-document metadata for pre-scoring filters.
+
+    Each distinct ``(field, value)`` pair maps to the set of document positions
+    (build order, which is also the backends' row order) holding it. Sparse
+    sets are kept as sorted position arrays and dense ones as packed numpy
+    bitsets, so both very selective and very broad filters stay cheap to combine.
+    """
+
+    def __init__(self) -> None:
+        self._n = 0
+        self._fields: dict[str, dict[str, _Container]] = {}
+        self._sorted_ids: np.ndarray = np.array([], dtype=str)
+        self._sorted_pos: np.ndarray = np.array([], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for values in self._fields.values() for c in values.values())
+
+    def build(self, ids: Sequence[str], metadata: Sequence[Mapping[str, object]]) -> None:
+        if len(ids) != len(metadata):
+            raise ValueError("ids and metadata must have the same length")
+        self._n = len(ids)
+        postings: dict[str, dict[str, list[int]]] = {}
+        for pos, meta in enumerate(metadata):
+            for name, value in meta.items():
+                if value is None:
+                    continue
+                postings.setdefault(name, {}).setdefault(str(value), []).append(pos)
+        self._fields = {
+            name: {v: self._container(p) for v, p in values.items()}
+            for name, values in postings.items()
+        }
+        order = np.argsort(np.asarray(ids, dtype=str), kind="stable")
+        self._sorted_ids = np.asarray(ids, dtype=str)[order]
+        self._sorted_pos = order.astype(np.int64)
+
+    def _container(self, positions: list[int]) -> _Container:
+        arr = np.asarray(positions, dtype=np.int64)
+        if len(arr) * _SPARSE_RATIO < self._n:
+            return _Container(arr.astype(np.uint32), None)
+        mask = np.zeros(self._n, dtype=bool)
+        mask[arr] = True
+        return _Container(None, np.packbits(mask))
+
+    def _mask(self, c: _Container) -> np.ndarray:
+        if c.bits is not None:
+            return np.unpackbits(c.bits, count=self._n).view(bool)
+        mask = np.zeros(self._n, dtype=bool)
+        mask[c.positions] = True
+        return mask
+
+    def _field_set(self, name: str, values: list[str]) -> np.ndarray:
+        """Return the OR of ``values`` as sorted positions or as a boolean mask."""
+        if name == PREFIX_FIELD:
+            parts = []
+            for prefix in values:
+                lo = np.searchsorted(self._sorted_ids, prefix, side="left")
+                hi = np.searchsorted(self._sorted_ids, prefix + "\U0010ffff", side="left")
+                parts.append(self._sorted_pos[lo:hi])
+            return np.unique(np.concatenate(parts)) if parts else np.array([], dtype=np.int64)
+        stored = self._fields.get(name, {})
+        found = [stored[v] for v in values if v in stored]
+        if all(c.positions is not None for c in found):
+            arrs = [c.positions.astype(np.int64) for c in found if c.positions is not None]
+            if len(arrs) == 1:
+                return arrs[0]
+            return np.unique(np.concatenate(arrs)) if arrs else np.array([], dtype=np.int64)
+        mask = np.zeros(self._n, dtype=bool)
+        for c in found:
+            mask |= self._mask(c)
+        return mask
+
+    def allowed(self, spec: Mapping[str, Sequence[str]]) -> np.ndarray | None:
+        """Return sorted positions matching every field of *spec*, or None if unfiltered.
+
+        Values of one field are OR-ed; fields are AND-ed. ``doc_id_prefix`` matches
+        id prefixes. Unknown fields or values match nothing.
+        """
+        if not spec:
+            return None
+        positions: np.ndarray | None = None
+        mask: np.ndarray | None = None
+        # Intersect the most selective sets first so later steps gather fewer rows
+        sets = sorted(
+            (self._field_set(name, list(values)) for name, values in spec.items()),
+            key=lambda s: int(s.sum()) if s.dtype == bool else len(s),
+        )
+        for s in sets:
+            if s.dtype == bool:
+                if positions is not None:
+                    positions = positions[s[positions]]
+                else:
+                    mask = s if mask is None else mask & s
+            elif positions is None:
+                positions = s if mask is None else s[mask[s]]
+                mask = None
+            else:
+                positions = np.intersect1d(positions, s, assume_unique=True)
+        if positions is None:
+            positions = np.flatnonzero(mask) if mask is not None else np.arange(self._n)
+        return positions.astype(np.int64, copy=False)
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+import structlog
+
+from .backends.embed import DummyEmbeddingModel, EmbeddingModel, HashingEmbeddingModel
+
+logger = structlog.get_logger("models")
+
+HASHING_MODEL = "hashing"
+
+
+class _STWrapper:
+    def __init__(self, name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(name)
+
+    def encode_texts(self, texts: list[str]) -> Any:
+        return self.model.encode(texts, show_progress_bar=False)
+
+
+def _load(name: str, *, use_dummy: bool) -> EmbeddingModel:
+    # The hashing model needs no download, so it is served even in dummy mode
+    if name == HASHING_MODEL:
+        return HashingEmbeddingModel()
+    return DummyEmbeddingModel() if use_dummy else _STWrapper(name)
+
+
+def normalize_query(text: str) -> str:
+    """Cache key form of *text*: NFKC with whitespace runs collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class QueryEmbeddingCache:
+    """Process-wide LRU of normalized query vectors keyed by (model key, text).
+
+    Bounded by ``max_bytes`` (vector bytes plus the key text); ``max_bytes=0``
+    disables caching. Safe to share between threads.
+    """
+
+    ENTRY_OVERHEAD = 64  # rough per-entry bookkeeping
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024) -> None:
+        self.max_bytes = max(0, int(max_bytes))
+        self._entries: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(key: tuple[str, str], vec: np.ndarray) -> int:
+        return int(vec.nbytes) + len(key[1]) + QueryEmbeddingCache.ENTRY_OVERHEAD
+
+    def get(self, key: tuple[str, str]) -> np.ndarray | None:
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, key: tuple[str, str], vec: np.ndarray) -> None:
+        size = self._size(key, vec)
+        if size > self.max_bytes:
+            return
+        vec.setflags(write=False)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= self._size(key, old)
+            self._entries[key] = vec
+            self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes:
+            key, old = self._entries.popitem(last=False)
+            self._bytes -= self._size(key, old)
+            self.evictions += 1
+
+    def resize(self, max_bytes: int) -> None:
+        with self._lock:
+            self.max_bytes = max(0, int(max_bytes))
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_bytes": self.max_bytes,
+                "bytes": self._bytes,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class CachedEmbeddingModel:
+    """An :class:`EmbeddingModel` that serves queries through a query cache.
+
+    :meth:`encode_texts` is the query path: batches of at most ``max_batch``
+    texts are looked up per normalized text and only the misses reach the
+    wrapped model. Index builds call :meth:`encode_documents`, which never
+    touches the cache, so document text cannot evict queries. Vectors come
+    back L2-normalized.
+    """
+
+    def __init__(
+        self,
+        model: EmbeddingModel,
+        key: str,
+        cache: QueryEmbeddingCache,
+        *,
+        max_batch: int = 16,
+    ) -> None:
+        self.model = model
+        self.key = key
+        self.cache = cache
+        self.max_batch = max_batch
+
+    def fit(self, texts: list[str]) -> CachedEmbeddingModel:
+        """Fit the wrapped model if it supports it; its vectors get their own cache key."""
+        fit = getattr(self.model, "fit", None)
+        if not callable(fit):
+            return self
+        fitted = fit(texts)
+        fingerprint = getattr(fitted, "fingerprint", None) or f"id{id(fitted):x}"
+        return CachedEmbeddingModel(
+            fitted, f"{self.key}@{fingerprint}", self.cache, max_batch=self.max_batch
+        )
+
+    def encode_documents(self, texts: list[str]) -> np.ndarray:
+        """Encode documents with the wrapped model, bypassing the query cache."""
+        return _unit(np.asarray(self.model.encode_texts(texts), dtype=np.float32))
+
+    def encode_texts(self, texts: list[str]) -> np.ndarray:
+        if len(texts) > self.max_batch or self.cache.max_bytes == 0:
+            return self.encode_documents(texts)
+        keys = [(self.key, normalize_query(t)) for t in texts]
+        found: list[np.ndarray] = []
+        missing: list[int] = []
+        for i, key in enumerate(keys):
+            vec = self.cache.get(key)
+            if vec is None:
+                missing.append(i)
+                vec = np.empty(0, dtype=np.float32)  # filled below
+            found.append(vec)
+        if missing:
+            fresh = _unit(
+                np.asarray(self.model.encode_texts([texts[i] for i in missing]), dtype=np.float32)
+            )
+            for i, vec in zip(missing, fresh, strict=True):
+                found[i] = vec.copy()
+                self.cache.put(keys[i], found[i])
+        return np.vstack(found)
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+class ModelRegistry:
+    """Load each embedding model once per process and share it between backends.
+
+    Concurrent requests for a model that is still loading wait for that load
+    instead of starting another one. Models are served through *cache*, so
+    repeat queries skip the forward pass whichever backend encodes them.
+    """
+
+    def __init__(self, cache: QueryEmbeddingCache | None = None) -> None:
+        self.cache = cache if cache is not None else QueryEmbeddingCache()
+        self._models: dict[tuple[str, bool], CachedEmbeddingModel] = {}
+        self._loading: dict[tuple[str, bool], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, *, use_dummy: bool) -> CachedEmbeddingModel:
+        key = (name, use_dummy)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            load_lock = self._loading.setdefault(key, threading.Lock())
+        with load_lock:
+            model = self._models.get(key)
+            if model is None:
+                start = time.perf_counter()
+                key_name = f"{name}:dummy" if use_dummy and name != HASHING_MODEL else name
+                model = CachedEmbeddingModel(_load(name, use_dummy=use_dummy), key_name, self.cache)
+                self._models[key] = model
+                logger.info(
+                    "embedding_model_loaded",
+                    model=name,
+                    dummy=use_dummy,
+                    load_ms=round((time.perf_counter() - start) * 1000, 2),
+                )
+        return model
+
+    def loaded(self) -> list[str]:
+        return sorted(name for name, _ in self._models)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._loading.clear()
+        self.cache.clear()
+
+
+_MODELS = ModelRegistry()
+
+
+def get_embedding_model(name: str, *, use_dummy: bool) -> CachedEmbeddingModel:
+    """Return the process-wide instance of embedding model *name*."""
+    return _MODELS.get(name, use_dummy=use_dummy)
+
+
+def get_model_registry() -> ModelRegistry:
+    return _MODELS
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """The query-vector cache shared by every model from :func:`get_embedding_model`."""
+    return _MODELS.cache
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import re
+import sys
+from bisect import bisect_left
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+# Quoted phrase (closing quote optional), parentheses, or a bare word
+_LEX_RE = re.compile(r'"([^"]*)"?|(\()|(\))|([^\s()"]+)')
+_OPERATORS = {"AND", "OR", "NOT"}
+
+
+class QuerySyntaxError(ValueError):
+    """Raised for malformed boolean queries."""
+
+
+@dataclass(frozen=True)
+class Term:
+    term: str
+
+
+@dataclass(frozen=True)
+class Phrase:
+    terms: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class And:
+    children: tuple[Node, ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    children: tuple[Node, ...]
+
+
+@dataclass(frozen=True)
+class Not:
+    child: Node
+
+
+Node = Term | Phrase | And | Or | Not
+
+
+def is_structured(query: str) -> bool:
+    """True if *query* uses operators, quotes, or parentheses rather than plain words."""
+    return any(c in query for c in '"()') or any(w in _OPERATORS for w in query.split())
+
+
+def parse_query(query: str, tokenize: Callable[[str], list[str]]) -> Node | None:
+    """Parse ``AND``/``OR``/``NOT``, parentheses, and ``"phrases"`` into a query tree.
+
+    Operators are upper-case; ``NOT`` binds tighter than ``AND``, which binds
+    tighter than ``OR``, and adjacent clauses are AND-ed. Words go through
+    *tokenize*, so a word splitting into several tokens becomes a phrase.
+    Returns None when nothing searchable is left.
+    """
+    lexemes: list[tuple[str, str]] = []
+    for m in _LEX_RE.finditer(query):
+        phrase, lpar, rpar, word = m.groups()
+        if phrase is not None:
+            lexemes.append(("phrase", phrase))
+        elif lpar:
+            lexemes.append(("(", lpar))
+        elif rpar:
+            lexemes.append((")", rpar))
+        elif word in _OPERATORS:
+            lexemes.append((word, word))
+        else:
+            lexemes.append(("word", word))
+    parser = _Parser(lexemes, tokenize)
+    node = parser.parse_or()
+    if parser.pos != len(lexemes):
+        raise QuerySyntaxError(f"unexpected {lexemes[parser.pos][1]!r}")
+    return node
+
+
+class _Parser:
+    def __init__(self, lexemes: list[tuple[str, str]], tokenize: Callable[[str], list[str]]):
+        self.lexemes = lexemes
+        self.tokenize = tokenize
+        self.pos = 0
+
+    def _peek(self) -> str | None:
+        return self.lexemes[self.pos][0] if self.pos < len(self.lexemes) else None
+
+    def parse_or(self) -> Node | None:
+        children = [self.parse_and()]
+        while self._peek() == "OR":
+            self.pos += 1
+            children.append(self.parse_and())
+        kept = tuple(c for c in children if c is not None)
+        if len(kept) < 2:
+            return kept[0] if kept else None
+        return Or(kept)
+
+    def parse_and(self) -> Node | None:
+        children = [self.parse_unary()]
+        while self._peek() not in (None, "OR", ")"):
+            if self._peek() == "AND":
+                self.pos += 1
+            children.append(self.parse_unary())
+        kept = tuple(c for c in children if c is not None)
+        if len(kept) < 2:
+            return kept[0] if kept else None
+        return And(kept)
+
+    def parse_unary(self) -> Node | None:
+        kind = self._peek()
+        if kind == "NOT":
+            self.pos += 1
+            child = self.parse_unary()
+            return Not(child) if child is not None else None
+        if kind is None or kind in {"AND", "OR", ")"}:
+            raise QuerySyntaxError("expected a term, phrase or '('")
+        text = self.lexemes[self.pos][1]
+        self.pos += 1
+        if kind == "(":
+            node = self.parse_or()
+            if self._peek() != ")":
+                raise QuerySyntaxError("missing ')'")
+            self.pos += 1
+            return node
+        toks = self.tokenize(text)
+        if not toks:
+            return None
+        return Term(toks[0]) if len(toks) == 1 else Phrase(tuple(toks))
+
+
+def scoring_terms(node: Node | None) -> list[str]:
+    """Distinct terms a match is ranked by: everything not under ``NOT``."""
+    out: dict[str, None] = {}
+
+    def walk(n: Node) -> None:
+        if isinstance(n, Term):
+            out[n.term] = None
+        elif isinstance(n, Phrase):
+            out.update(dict.fromkeys(n.terms))
+        elif isinstance(n, And | Or):
+            for c in n.children:
+                walk(c)
+
+    if node is not None:
+        walk(node)
+    return list(out)
+
+
+def _gallop(b: Sequence[int], x: int, lo: int) -> int:
+    """First index ``>= lo`` with ``b[i] >= x``, probing 1, 2, 4, ... ahead of ``lo``."""
+    hi, step = lo, 1
+    while hi < len(b) and b[hi] < x:
+        lo = hi + 1
+        hi += step
+        step <<= 1
+    return bisect_left(b, x, lo, min(hi, len(b)))
+
+
+def intersect(a: Sequence[int], b: Sequence[int]) -> list[int]:
+    """Intersect sorted lists, galloping through the longer one."""
+    if len(a) > len(b):
+        a, b = b, a
+    out: list[int] = []
+    i = 0
+    for x in a:
+        i = _gallop(b, x, i)
+        if i == len(b):
+            break
+        if b[i] == x:
+            out.append(x)
+    return out
+
+
+def difference(a: Sequence[int], b: Sequence[int]) -> list[int]:
+    """Elements of sorted ``a`` missing from sorted ``b``."""
+    out: list[int] = []
+    i = 0
+    for x in a:
+        i = _gallop(b, x, i)
+        if i == len(b) or b[i] != x:
+            out.append(x)
+    return out
+
+
+class PositionalIndex:
+    """Term -> (sorted doc positions, token offsets per doc) for boolean/phrase matching."""
+
+    def __init__(self) -> None:
+        self.n_docs = 0
+        self._postings: dict[str, tuple[list[int], list[list[int]]]] = {}
+
+    def build(self, tokenized: Sequence[Sequence[str]]) -> None:
+        self.n_docs = len(tokenized)
+        postings: dict[str, tuple[list[int], list[list[int]]]] = {}
+        for doc, toks in enumerate(tokenized):
+            for off, t in enumerate(toks):
+                docs, offsets = postings.setdefault(t, ([], []))
+                if not docs or docs[-1] != doc:
+                    docs.append(doc)
+                    offsets.append([])
+                offsets[-1].append(off)
+        self._postings = postings
+
+    def docs(self, term: str) -> list[int]:
+        return self._postings.get(term, ([], []))[0]
+
+    @property
+    def postings(self) -> int:
+        """Number of (term, document) postings."""
+        return sum(len(docs) for docs, _ in self._postings.values())
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory of the postings: the term dict and its tuples and lists."""
+        size = sys.getsizeof(self._postings)
+        for entry in self._postings.values():
+            docs, offsets = entry
+            size += sys.getsizeof(entry) + sys.getsizeof(docs) + sys.getsizeof(offsets)
+            size += sum(sys.getsizeof(o) for o in offsets)
+        return size
+
+    def _cost(self, node: Node) -> int:
+        if isinstance(node, Term):
+            return len(self.docs(node.term))
+        if isinstance(node, Phrase):
+            return min(len(self.docs(t)) for t in node.terms)
+        if isinstance(node, And):
+            return min(self._cost(c) for c in node.children)
+        if isinstance(node, Or):
+            return sum(self._cost(c) for c in node.children)
+        return self.n_docs
+
+    def _phrase(self, terms: tuple[str, ...]) -> list[int]:
+        lists = sorted((self.docs(t) for t in set(terms)), key=len)
+        candidates = lists[0]
+        for other in lists[1:]:
+            candidates = intersect(candidates, other)
+            if not candidates:
+                return []
+        out: list[int] = []
+        for doc in candidates:
+            starts: set[int] | None = None
+            for i, t in enumerate(terms):
+                docs, offsets = self._postings[t]
+                shifted = {p - i for p in offsets[bisect_left(docs, doc)]}
+                starts = shifted if starts is None else starts & shifted
+                if not starts:
+                    break
+            if starts:
+                out.append(doc)
+        return out
+
+    def match(self, node: Node) -> list[int]:
+        """Sorted positions of the documents satisfying *node*."""
+        if isinstance(node, Term):
+            return list(self.docs(node.term))
+        if isinstance(node, Phrase):
+            return self._phrase(node.terms)
+        if isinstance(node, Not):
+            return difference(range(self.n_docs), self.match(node.child))
+        if isinstance(node, Or):
+            merged: set[int] = set()
+            for c in node.children:
+                merged.update(self.match(c))
+            return sorted(merged)
+        positive = sorted((c for c in node.children if not isinstance(c, Not)), key=self._cost)
+        result = self.match(positive[0]) if positive else list(range(self.n_docs))
+        # Most selective clause first: later intersections only gallop past survivors
+        for c in positive[1:]:
+            if not result:
+                return []
+            result = intersect(result, self.match(c))
+        for c in node.children:
+            if isinstance(c, Not) and result:
+                result = difference(result, self.match(c.child))
+        return result
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import gc
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any
+
+from .backends.base import RetrievalBackend
+from .executors import TrackedThreadPool
+
+
+def low_priority_process_pool() -> ProcessPoolExecutor:
+    """One spawned, niced worker process for building picklable indexes.
+
+    A build thread competes with queries for the GIL; a separate low-priority
+    process only competes for CPU, which the OS scheduler shares more fairly.
+    """
+    return ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=os.nice,
+        initargs=(10,),
+    )
+
+
+class IndexHandle:
+    """One published backend plus its generation and in-flight query count.
+
+    ``source`` is whatever the backend was built from (e.g. a corpus snapshot),
+    so per-generation lookups stay consistent with the backend's doc positions.
+    """
+
+    def __init__(
+        self, name: str, backend: RetrievalBackend, generation: int, source: Any = None
+    ) -> None:
+        self.name = name
+        self.backend = backend
+        self.generation = generation
+        self.source = source
+        self.built_at = time.time()
+        self._inflight = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self._retired:
+                return False
+            self._inflight += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self._inflight -= 1
+            drained = self._retired and self._inflight == 0
+        if drained:
+            self._close()
+
+    def _retire(self) -> None:
+        with self._lock:
+            self._retired = True
+            drained = self._inflight == 0
+        if drained:
+            self._close()
+
+    def _close(self) -> None:
+        close = getattr(self.backend, "close", None)
+        if callable(close):
+            close()
+
+
+class IndexRegistry:
+    """Named backends that can be rebuilt in the background and swapped atomically.
+
+    Readers :meth:`lease` the current handle and keep using it for the whole
+    query, even if a newer generation is published meanwhile. Publishing
+    replaces the handle in one dict assignment, and the previous backend is
+    closed once its last lease ends. Generations increase across all names.
+
+    With ``freeze_gc`` set, every publish collects the young generations and
+    freezes what survives (the new index included) into the collector's
+    permanent generation, so later collections skip it. Nothing is unfrozen,
+    so a publish never pays for a full collection. A retired generation is
+    still freed by reference counting once its last lease ends; only garbage
+    it keeps alive through reference cycles stays until exit.
+    """
+
+    def __init__(self, executor: Executor | None = None) -> None:
+        self._handles: dict[str, IndexHandle] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Re-entrant: a builder may build other indexes it is composed from
+        self._build_lock = threading.RLock()
+        self._executor = executor or TrackedThreadPool(1, "index-rebuild")
+        # Refreeze the heap after each publish, so the collector stops rescanning built indexes
+        self.freeze_gc = False
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def generations(self) -> dict[str, int]:
+        return {name: h.generation for name, h in list(self._handles.items())}
+
+    def get(self, name: str) -> IndexHandle | None:
+        return self._handles.get(name)
+
+    def publish(self, name: str, backend: RetrievalBackend, *, source: Any = None) -> int:
+        """Make *backend* the current index for *name* and return its generation."""
+        with self._lock:
+            self._generation += 1
+            handle = IndexHandle(name, backend, self._generation, source)
+            old = self._handles.get(name)
+            self._handles[name] = handle
+        if old is not None:
+            old._retire()
+        if self.freeze_gc:
+            gc.collect(1)  # don't freeze young garbage; older objects are mostly frozen already
+            gc.freeze()
+        return handle.generation
+
+    def get_or_build(
+        self, name: str, builder: Callable[[], RetrievalBackend], *, source: Any = None
+    ) -> IndexHandle:
+        """Return the current handle, building and publishing it first if missing."""
+        handle = self._handles.get(name)
+        if handle is None:
+            with self._build_lock:
+                handle = self._handles.get(name)
+                if handle is None:
+                    self.publish(name, builder(), source=source)
+                    handle = self._handles[name]
+        return handle
+
+    def warm(
+        self, name: str, builder: Callable[[], RetrievalBackend], *, source: Any = None
+    ) -> Future[int]:
+        """Build *name* on the build thread unless it already exists.
+
+        Unlike :meth:`rebuild` an existing index is kept; the future resolves to
+        the generation being served.
+        """
+        return self._executor.submit(
+            lambda: self.get_or_build(name, builder, source=source).generation
+        )
+
+    def rebuild(
+        self,
+        name: str,
+        builder: Callable[[], RetrievalBackend],
+        *,
+        source: Any = None,
+        executor: Executor | None = None,
+    ) -> Future[int]:
+        """Build a replacement on the executor while the current index keeps serving.
+
+        *executor* overrides the registry's build thread, e.g. with
+        :func:`low_priority_process_pool` (the builder and backend must then be
+        picklable). The returned future resolves to the new generation once it
+        is published.
+        """
+        done: Future[int] = Future()
+
+        def _publish(fut: Future[RetrievalBackend]) -> None:
+            exc = fut.exception()
+            if exc is not None:
+                done.set_exception(exc)
+            else:
+                done.set_result(self.publish(name, fut.result(), source=source))
+
+        (executor or self._executor).submit(builder).add_done_callback(_publish)
+        return done
+
+    @contextmanager
+    def lease(
+        self,
+        name: str,
+        builder: Callable[[], RetrievalBackend] | None = None,
+        *,
+        source: Any = None,
+    ) -> Iterator[IndexHandle]:
+        """Pin the current index for *name* for the duration of the block.
+
+        With a *builder*, a missing index is built (and published) first.
+        """
+        while True:
+            if builder is not None:
+                handle: IndexHandle | None = self.get_or_build(name, builder, source=source)
+            else:
+                handle = self._handles.get(name)
+            if handle is None:
+                raise KeyError(name)
+            if handle._acquire():
+                break
+        try:
+            yield handle
+        finally:
+            handle._release()
+
+    def clear(self) -> None:
+        """Drop every index; each is closed once its in-flight queries finish."""
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for h in handles:
+            h._retire()
@@ -0,0 +1,253 @@
+"""Budgeted second-stage re-ranking of a backend's top candidates.
+
+A :class:`Reranker` takes the first ``top_m`` hits of any
+:class:`~rag.backends.base.RetrievalBackend` search and scores (query, doc)
+pairs with a pluggable :class:`Scorer` in batches of ``batch_size``, best
+first-stage hits first. Before each batch it checks the remaining budget
+against the measured per-document scoring cost; once the next batch no longer
+fits, scoring stops. The scored prefix is re-sorted by the scorer and the
+unscored rest follows in its original order, so a tight budget degrades to the
+first-stage ranking instead of blowing the latency target. Results carry the
+scorer's scores; first-stage scores are on another scale and are dropped.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+import time
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Protocol
+
+import numpy as np
+
+from .backends.base import RetrievalBackend
+from .deadline import Deadline
+
+PROXIMITY_SCORER = "proximity"
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_']+")
+
+
+def _tokenize(text: str) -> list[str]:
+    return [w.lower() for w in _WORD_RE.findall(text)]
+
+
+class Scorer(Protocol):
+    def score(self, query: str, docs: Sequence[str]) -> np.ndarray:
+        """Relevance of each of *docs* to *query*; higher is better."""
+
+
+class ProximityScorer:
+    """Offline lexical scorer: query-term coverage, then how tightly the terms cluster.
+
+    A document scores the fraction of distinct query terms it contains,
+    boosted by up to ``proximity_weight`` when those terms sit close together
+    (all adjacent is the full boost; a single matched term gets none), plus
+    ``phrase_weight`` if the query occurs verbatim. Only the first
+    ``max_tokens`` tokens of a document are read.
+    """
+
+    def __init__(
+        self,
+        *,
+        proximity_weight: float = 0.5,
+        phrase_weight: float = 0.25,
+        max_tokens: int = 2000,
+    ) -> None:
+        self.proximity_weight = proximity_weight
+        self.phrase_weight = phrase_weight
+        self.max_tokens = max_tokens
+
+    def score(self, query: str, docs: Sequence[str]) -> np.ndarray:
+        q_tokens = _tokenize(query)
+        terms = {t: n for n, t in enumerate(dict.fromkeys(q_tokens))}
+        out = np.zeros(len(docs), dtype=np.float32)
+        if not terms:
+            return out
+        phrase = f" {' '.join(q_tokens)} "
+        for i, doc in enumerate(docs):
+            tokens = _tokenize(doc)[: self.max_tokens]
+            hits = [(pos, terms[t]) for pos, t in enumerate(tokens) if t in terms]
+            matched = len({term for _, term in hits})
+            if not matched:
+                continue
+            coverage = matched / len(terms)
+            tightness = 0.0
+            if matched > 1:
+                tightness = (matched - 1) / (_shortest_window(hits, matched) - 1)
+            score = coverage * (1 + self.proximity_weight * tightness)
+            if len(q_tokens) > 1 and phrase in f" {' '.join(tokens)} ":
+                score += self.phrase_weight
+            out[i] = score
+        return out
+
+
+def _shortest_window(hits: list[tuple[int, int]], distinct: int) -> int:
+    """Length in tokens of the shortest run of *hits* covering *distinct* terms."""
+    counts: dict[int, int] = {}
+    best = hits[-1][0] - hits[0][0] + 1
+    lo = 0
+    for pos, term in hits:
+        counts[term] = counts.get(term, 0) + 1
+        while len(counts) == distinct:
+            start, first = hits[lo]
+            best = min(best, pos - start + 1)
+            counts[first] -= 1
+            if not counts[first]:
+                del counts[first]
+            lo += 1
+    return best
+
+
+class CrossEncoderScorer:
+    """A sentence-transformers cross-encoder scoring each (query, doc) pair jointly."""
+
+    def __init__(self, name: str, *, max_length: int = 512) -> None:
+        from sentence_transformers import CrossEncoder
+
+        self.name = name
+        self.model = CrossEncoder(name, max_length=max_length)
+
+    def score(self, query: str, docs: Sequence[str]) -> np.ndarray:
+        pairs = [(query, doc) for doc in docs]
+        scores = self.model.predict(pairs, batch_size=max(1, len(pairs)), show_progress_bar=False)
+        return np.asarray(scores, dtype=np.float32).reshape(len(docs))
+
+
+_SCORERS: dict[tuple[str, bool], Scorer] = {}
+_SCORERS_LOCK = threading.Lock()
+
+
+def get_scorer(name: str, *, use_dummy: bool) -> Scorer:
+    """Return the process-wide scorer *name*: "proximity" or a cross-encoder model.
+
+    With *use_dummy* (no model downloads) every name is served by the
+    proximity scorer.
+    """
+    key = (name, use_dummy)
+    with _SCORERS_LOCK:
+        scorer = _SCORERS.get(key)
+        if scorer is None:
+            if name == PROXIMITY_SCORER or use_dummy:
+                scorer = ProximityScorer()
+            else:
+                scorer = CrossEncoderScorer(name)
+            _SCORERS[key] = scorer
+        return scorer
+
+
+@dataclass(frozen=True)
+class RerankOutcome:
+    # (doc_id, scorer score) best first; None for the unscored rest, in first-stage order
+    results: list[tuple[str, float | None]]
+    candidates: int  # hits considered (at most top_m)
+    scored: int  # candidates the scorer got to before the budget ran out
+    elapsed_ms: float
+
+    @property
+    def exhausted(self) -> bool:
+        return self.scored < self.candidates
+
+
+class Reranker:
+    """Re-order the top ``top_m`` hits by *scorer*, within a per-request budget."""
+
+    def __init__(
+        self,
+        scorer: Scorer,
+        *,
+        top_m: int = 50,
+        batch_size: int = 16,
+        budget_ms: float | None = None,
+    ) -> None:
+        if top_m <= 0 or batch_size <= 0:
+            raise ValueError("top_m and batch_size must be positive")
+        self.scorer = scorer
+        self.top_m = top_m
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms  # default per-request budget; None = unbounded
+        self._doc_cost_ms: float | None = None  # EWMA of scoring time per document
+        self._lock = threading.Lock()
+
+    def rerank(
+        self,
+        query: str,
+        results: Sequence[tuple[str, float]],
+        text_of: Callable[[str], str],
+        *,
+        budget_ms: float | None = None,
+        deadline: Deadline | None = None,
+    ) -> RerankOutcome:
+        """Re-rank *results* (best first); *text_of* maps a doc id to its text.
+
+        *budget_ms* defaults to the constructor's, capped by what is left of
+        *deadline*. Hits past ``top_m`` are never scored and keep their place.
+        """
+        start = time.perf_counter()
+        if budget_ms is None:
+            budget_ms = self.budget_ms
+        if deadline is not None:
+            left = deadline.remaining_ms()
+            budget_ms = left if budget_ms is None else min(budget_ms, left)
+        head = list(results[: self.top_m])
+        scores: list[float] = []
+        for lo in range(0, len(head), self.batch_size):
+            batch = head[lo : lo + self.batch_size]
+            if budget_ms is not None:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                expected_ms = (self._doc_cost_ms or 0.0) * len(batch)
+                if elapsed_ms + expected_ms > budget_ms or elapsed_ms >= budget_ms:
+                    break
+            batch_start = time.perf_counter()
+            batch_scores = self.scorer.score(query, [text_of(doc_id) for doc_id, _ in batch])
+            per_doc = (time.perf_counter() - batch_start) * 1000 / len(batch)
+            with self._lock:
+                prev = self._doc_cost_ms
+                self._doc_cost_ms = per_doc if prev is None else 0.8 * prev + 0.2 * per_doc
+            scores.extend(float(s) for s in batch_scores)
+        n = len(scores)
+        order = sorted(range(n), key=lambda i: (-scores[i], i))
+        reranked: list[tuple[str, float | None]] = [(head[i][0], scores[i]) for i in order]
+        reranked.extend((doc_id, None) for doc_id, _ in results[n:])
+        return RerankOutcome(
+            results=reranked,
+            candidates=len(head),
+            scored=n,
+            elapsed_ms=(time.perf_counter() - start) * 1000,
+        )
+
+
+class RerankingBackend(RetrievalBackend):
+    """Any backend followed by a :class:`Reranker` over its top ``top_m`` hits.
+
+    Pass *texts* (doc id to text) when wrapping a backend that is already
+    built; otherwise :meth:`build` records them. Scores are the reranker's;
+    hits its budget didn't reach follow at ``-inf``.
+    """
+
+    def __init__(
+        self,
+        backend: RetrievalBackend,
+        reranker: Reranker,
+        texts: Mapping[str, str] | None = None,
+    ) -> None:
+        self.backend = backend
+        self.reranker = reranker
+        self._texts: Mapping[str, str] = texts or {}
+
+    def build(
+        self, docs: list[str], ids: list[str] | None = None, *, seed: int | None = None
+    ) -> None:
+        self.backend.build(docs, ids, seed=seed)
+        ids = ids or [str(i) for i in range(len(docs))]
+        self._texts = dict(zip(ids, docs, strict=True))
+
+    def search(
+        self, query: str, k: int = 5, *, allowed: Sequence[int] | np.ndarray | None = None
+    ) -> list[tuple[str, float]]:
+        candidates = self.backend.search(query, max(k, self.reranker.top_m), allowed=allowed)
+        outcome = self.reranker.rerank(query, candidates, self._texts.__getitem__)
+        return [(d, -math.inf if s is None else s) for d, s in outcome.results[:k]]
@@ -1,11 +1,31 @@
 from __future__ import annotations
 
+import sys
+import threading
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import Executor, Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from functools import cached_property, partial
 from typing import Any
 
 from .backends.base import RetrievalBackend
 from .backends.bm25 import BM25Backend
-from .backends.embed import DummyEmbeddingModel, EmbeddingBackend, EmbeddingModel
+from .backends.cascade import CascadeBackend
+from .backends.embed import EmbeddingBackend
 from .backends.hybrid import HybridBackend
+from .backends.sharded import ShardedBackend, partition
+from .deadline import Deadline, DeadlineExceededError
+from .docstore import DocStore, write_docstore
+from .filters import MetadataIndex
+from .models import get_embedding_model
+from .registry import IndexHandle, IndexRegistry, low_priority_process_pool
+from .snippets import SnippetIndex
+
+BACKEND_NAMES = ("bm25", "embed", "hybrid", "cascade")
+# Built from the bm25 and embed indexes; composed from the served ones when possible
+COMPOSED_BACKENDS = ("hybrid", "cascade")
 
 # Small in-memory corpus for demo purposes
 _CORPUS = [
@@ -16,53 +36,476 @@ _CORPUS = [
     ("doc5", "fastapi makes apis fast"),
 ]
 
-_DOC_IDS = [d for d, _ in _CORPUS]
-_DOC_TEXTS = [t for _, t in _CORPUS]
+# Filterable metadata per demo document (see rag.filters)
+_METADATA: dict[str, dict[str, str]] = {
+    "doc1": {"source": "demo", "topic": "animals", "tenant": "acme"},
+    "doc2": {"source": "demo", "topic": "animals", "tenant": "globex"},
+    "doc3": {"source": "demo", "topic": "food", "tenant": "acme"},
+    "doc4": {"source": "demo", "topic": "animals", "tenant": "acme"},
+    "doc5": {"source": "demo", "topic": "tech", "tenant": "globex"},
+}
+
 DOCS_BY_ID: dict[str, str] = {d: t for d, t in _CORPUS}
 
-_BACKENDS: dict[str, RetrievalBackend] = {}
 
+@dataclass(frozen=True)
+class CorpusSnapshot:
+    """Immutable documents an index generation was built from, with derived indexes.
 
-def _embedding_model(name: str, use_dummy: bool) -> EmbeddingModel:
-    if use_dummy:
-        return DummyEmbeddingModel()
-    from sentence_transformers import SentenceTransformer
+    Filters and snippets must use the snapshot their backend was built from:
+    metadata bitmaps address documents by build position.
+    """
 
-    class _STWrapper:
-        def __init__(self, name: str):
-            self.model = SentenceTransformer(name)
+    ids: tuple[str, ...]
+    texts: tuple[str, ...]
+    metadata: tuple[Mapping[str, str], ...]
 
-        def encode_texts(self, texts: list[str]) -> Any:
-            return self.model.encode(texts, show_progress_bar=False)
+    @cached_property
+    def metadata_index(self) -> MetadataIndex:
+        index = MetadataIndex()
+        index.build(self.ids, self.metadata)
+        return index
 
-    return _STWrapper(name)
+    @cached_property
+    def text_by_id(self) -> dict[str, str]:
+        return dict(zip(self.ids, self.texts, strict=True))
 
+    @cached_property
+    def nbytes(self) -> int:
+        """Approximate memory of the documents' ids and texts."""
+        return sum(sys.getsizeof(s) for s in self.ids) + sum(sys.getsizeof(s) for s in self.texts)
 
-def get_backend(
+    @cached_property
+    def snippet_index(self) -> SnippetIndex:
+        index = SnippetIndex()
+        index.build(list(self.texts), list(self.ids))
+        return index
+
+
+def _snapshot(docs: Sequence[tuple[str, str]]) -> CorpusSnapshot:
+    if _PARTITION is not None:
+        keep = partition([d for d, _ in docs], _PARTITION[1])[_PARTITION[0]]
+        docs = [docs[i] for i in keep]
+    return CorpusSnapshot(
+        ids=tuple(d for d, _ in docs),
+        texts=tuple(t for _, t in docs),
+        metadata=tuple(_METADATA.get(d, {}) for d, _ in docs),
+    )
+
+
+_PARTITION: tuple[int, int] | None = None
+_CORPUS_POS: dict[str, int] = {d: n for n, (d, _) in enumerate(_CORPUS)}
+# Chunk ids added for each source document (see add_documents), and the reverse
+_CHUNKS: dict[str, list[str]] = {}
+_CHUNK_OF: dict[str, str] = {}
+_CORPUS_LOCK = threading.Lock()
+_CURRENT = _snapshot(_CORPUS)
+_REGISTRY = IndexRegistry()
+_REBUILD_POOL: Executor | None = None
+_WARMING: dict[str, Future[int]] = {}
+_DOC_STORE_OPTIONS: dict[str, Any] | None = None  # see use_doc_store
+_DOC_STORE: tuple[CorpusSnapshot, DocStore] | None = None
+_DOC_STORE_LOCK = threading.Lock()
+
+
+def use_corpus_partition(index: int, count: int) -> None:
+    """Serve only hash partition ``index`` of ``count`` (one node of a multi-node deployment).
+
+    Uses the same id hashing as :class:`ShardedBackend` and drops any backends
+    already built over the previous corpus.
+    """
+    global _PARTITION, _CURRENT
+    if not 0 <= index < count:
+        raise ValueError(f"invalid partition {index}/{count}")
+    _PARTITION = (index, count)
+    _CURRENT = _snapshot(_CORPUS)
+    _REGISTRY.clear()
+
+
+def set_corpus(
+    docs: Sequence[tuple[str, str]], metadata: Mapping[str, Mapping[str, str]] | None = None
+) -> None:
+    """Replace the corpus that subsequent builds and rebuilds index.
+
+    Published backends keep serving the previous corpus until
+    :func:`rebuild_backends` swaps in new generations.
+    """
+    global _CORPUS, _CURRENT
+    with _CORPUS_LOCK:
+        _CORPUS = list(docs)
+        _CORPUS_POS.clear()
+        _CORPUS_POS.update({d: n for n, (d, _) in enumerate(_CORPUS)})
+        _CHUNKS.clear()
+        _CHUNK_OF.clear()
+        if metadata is not None:
+            _METADATA.update({d: dict(m) for d, m in metadata.items()})
+        DOCS_BY_ID.update({d: t for d, t in _CORPUS})
+        _CURRENT = _snapshot(_CORPUS)
+
+
+def add_documents(
+    docs: Sequence[tuple[str, str]],
+    metadata: Mapping[str, Mapping[str, str]] | None = None,
+    chunks: Mapping[str, Sequence[str]] | None = None,
+) -> None:
+    """Append documents to the corpus, replacing any with the same id.
+
+    *chunks* maps source document ids to the ids of their chunks in *docs*.
+    The chunks previously added for each of those sources (or the source id
+    itself, if it was added whole) are dropped first, so a re-chunked
+    document doesn't leave stale pieces behind; other documents are never
+    touched, whatever their ids look like. Like :func:`set_corpus`, served
+    backends only see the change after a rebuild.
+    """
+    global _CORPUS, _CURRENT
+    with _CORPUS_LOCK:
+        chunks = chunks or {}
+        stale = {
+            c
+            for source in chunks
+            for c in _CHUNKS.pop(source, [source])
+            if _CHUNK_OF.get(c, c) == source
+        }
+        if stale:
+            _CORPUS = [(d, t) for d, t in _CORPUS if d not in stale]
+            _CORPUS_POS.clear()
+            _CORPUS_POS.update({d: n for n, (d, _) in enumerate(_CORPUS)})
+            for d in stale:
+                DOCS_BY_ID.pop(d, None)
+                _METADATA.pop(d, None)
+                _CHUNK_OF.pop(d, None)
+        for doc_id, text in docs:
+            pos = _CORPUS_POS.get(doc_id)
+            if pos is None:
+                _CORPUS_POS[doc_id] = len(_CORPUS)
+                _CORPUS.append((doc_id, text))
+            else:
+                _CORPUS[pos] = (doc_id, text)
+            DOCS_BY_ID[doc_id] = text
+            _CHUNK_OF.pop(doc_id, None)  # a whole document unless listed below
+        for source, ids in chunks.items():
+            _CHUNKS[source] = list(ids)
+            _CHUNK_OF.update({c: source for c in ids})
+        if metadata is not None:
+            _METADATA.update({d: dict(m) for d, m in metadata.items()})
+        _CURRENT = _snapshot(_CORPUS)
+
+
+def create_backend(
     name: str,
     *,
     embedding_model: str,
     hybrid_alpha: float,
     use_dummy_embeddings: bool,
+    shards: int = 1,
+    bm25_prune_keep: float = 1.0,
+    bm25_prune_method: str = "term",
 ) -> RetrievalBackend:
-    if name in _BACKENDS:
-        return _BACKENDS[name]
-    backend: RetrievalBackend
+    """Return a new, unbuilt backend; unlike :func:`get_backend` no index is shared.
+
+    Embedding models still come from the process-wide :mod:`rag.models` registry.
+    """
+    bm25 = partial(BM25Backend, prune_keep=bm25_prune_keep, prune_method=bm25_prune_method)
     if name == "bm25":
-        backend = BM25Backend()
-        backend.build(_DOC_TEXTS, _DOC_IDS)
-    elif name == "embed":
-        model = _embedding_model(embedding_model, use_dummy_embeddings)
-        backend = EmbeddingBackend(model)
-        backend.build(_DOC_TEXTS, _DOC_IDS)
-    elif name == "hybrid":
-        bm = BM25Backend()
-        bm.build(_DOC_TEXTS, _DOC_IDS)
-        model = _embedding_model(embedding_model, use_dummy_embeddings)
-        em = EmbeddingBackend(model)
-        em.build(_DOC_TEXTS, _DOC_IDS)
-        backend = HybridBackend(bm, em, alpha=hybrid_alpha)
-    else:
-        raise ValueError(f"unknown backend: {name}")
-    _BACKENDS[name] = backend
+        return ShardedBackend(bm25, shards) if shards > 1 else bm25()
+    if name == "embed":
+        model = get_embedding_model(embedding_model, use_dummy=use_dummy_embeddings)
+        return EmbeddingBackend(model)
+    if name == "hybrid":
+        model = get_embedding_model(embedding_model, use_dummy=use_dummy_embeddings)
+        return HybridBackend(bm25(), EmbeddingBackend(model), alpha=hybrid_alpha)
+    if name == "cascade":
+        if shards > 1:
+            # Its candidates come from one in-process BM25; a second full one would double memory
+            raise ValueError("cascade needs unsharded BM25 (shards=1)")
+        model = get_embedding_model(embedding_model, use_dummy=use_dummy_embeddings)
+        return CascadeBackend(bm25(), EmbeddingBackend(model), alpha=hybrid_alpha)
+    raise ValueError(f"unknown backend: {name}")
+
+
+def build_backend(
+    name: str, texts: Sequence[str], ids: Sequence[str], options: dict[str, Any]
+) -> RetrievalBackend:
+    """Create and build backend *name*; module-level so rebuilds can run in a subprocess."""
+    backend = create_backend(name, **options)
+    backend.build(list(texts), list(ids))
     return backend
+
+
+def backend_builder(
+    name: str,
+    corpus: CorpusSnapshot,
+    options: dict[str, Any],
+    registry: IndexRegistry | None = None,
+    wait: Sequence[Future[int]] = (),
+) -> Callable[[], RetrievalBackend]:
+    """Return a callable building backend *name* over *corpus*.
+
+    With a *registry*, ``hybrid`` and ``cascade`` are composed from that
+    registry's ``bm25`` and ``embed`` indexes (built there first if missing)
+    instead of duplicating them; *wait* are rebuilds of those to finish before
+    composing.
+    """
+    if name in COMPOSED_BACKENDS and registry is not None:
+        return partial(_compose, name, registry, corpus, options, tuple(wait))
+    return partial(build_backend, name, corpus.texts, corpus.ids, options)
+
+
+def _compose(
+    name: str,
+    registry: IndexRegistry,
+    corpus: CorpusSnapshot,
+    options: dict[str, Any],
+    wait: Sequence[Future[int]],
+) -> RetrievalBackend:
+    for fut in wait:
+        fut.result()
+    # Sharded BM25 lives in worker processes and can't serve the boolean pre-match
+    if options.get("shards", 1) == 1:
+        bm = registry.get_or_build("bm25", backend_builder("bm25", corpus, options), source=corpus)
+        em = registry.get_or_build(
+            "embed", backend_builder("embed", corpus, options), source=corpus
+        )
+        # Both must index this snapshot, or the fused doc positions would disagree
+        if (
+            bm.source is corpus
+            and em.source is corpus
+            and isinstance(bm.backend, BM25Backend)
+            and isinstance(em.backend, EmbeddingBackend)
+        ):
+            fused = HybridBackend if name == "hybrid" else CascadeBackend
+            return fused(bm.backend, em.backend, alpha=options["hybrid_alpha"])
+    return build_backend(name, corpus.texts, corpus.ids, options)
+
+
+def use_rebuild_processes(enabled: bool = True) -> None:
+    """Run background BM25 rebuilds in a low-priority subprocess instead of a thread."""
+    global _REBUILD_POOL
+    if _REBUILD_POOL is not None:
+        _REBUILD_POOL.shutdown(wait=False)
+    _REBUILD_POOL = low_priority_process_pool() if enabled else None
+
+
+def use_gc_freeze(enabled: bool = True) -> None:
+    """``gc.freeze()`` the heap after every publish (see :class:`IndexRegistry`)."""
+    _REGISTRY.freeze_gc = enabled
+
+
+def lease_backend(
+    name: str,
+    *,
+    embedding_model: str,
+    hybrid_alpha: float,
+    use_dummy_embeddings: bool,
+    shards: int = 1,
+    bm25_prune_keep: float = 1.0,
+    bm25_prune_method: str = "term",
+    deadline: Deadline | None = None,
+) -> AbstractContextManager[IndexHandle]:
+    """Pin the current generation of backend *name* (built on first use) for one query.
+
+    The handle's ``source`` is the :class:`CorpusSnapshot` it was built from.
+    With a *deadline*, a first-use build that outlasts it raises
+    :class:`DeadlineExceededError` (the build carries on in the background).
+    """
+    options = {
+        "embedding_model": embedding_model,
+        "hybrid_alpha": hybrid_alpha,
+        "use_dummy_embeddings": use_dummy_embeddings,
+        "shards": shards,
+        "bm25_prune_keep": bm25_prune_keep,
+        "bm25_prune_method": bm25_prune_method,
+    }
+    corpus = _CURRENT
+    builder = backend_builder(name, corpus, options, _REGISTRY)
+    if deadline is not None and _REGISTRY.get(name) is None:
+        try:
+            _REGISTRY.warm(name, builder, source=corpus).result(timeout=deadline.remaining_s())
+        except FutureTimeout:
+            raise DeadlineExceededError(f"{name} index still building") from None
+    return _REGISTRY.lease(name, builder, source=corpus)
+
+
+def get_backend(
+    name: str,
+    *,
+    embedding_model: str,
+    hybrid_alpha: float,
+    use_dummy_embeddings: bool,
+    shards: int = 1,
+    bm25_prune_keep: float = 1.0,
+    bm25_prune_method: str = "term",
+    deadline: Deadline | None = None,
+) -> RetrievalBackend:
+    with lease_backend(
+        name,
+        embedding_model=embedding_model,
+        hybrid_alpha=hybrid_alpha,
+        use_dummy_embeddings=use_dummy_embeddings,
+        shards=shards,
+        bm25_prune_keep=bm25_prune_keep,
+        bm25_prune_method=bm25_prune_method,
+        deadline=deadline,
+    ) as handle:
+        return handle.backend
+
+
+def rebuild_backends(
+    names: Sequence[str] | None = None,
+    *,
+    embedding_model: str,
+    hybrid_alpha: float,
+    use_dummy_embeddings: bool,
+    shards: int = 1,
+    bm25_prune_keep: float = 1.0,
+    bm25_prune_method: str = "term",
+) -> dict[str, Future[int]]:
+    """Rebuild backends over the current corpus in the background.
+
+    Defaults to every backend built so far. The old generations keep serving
+    until each replacement is published; the futures resolve to new generations.
+    ``hybrid`` and ``cascade`` are composed from ``bm25`` and ``embed``, so
+    rebuilding either rebuilds those too.
+    """
+    options = {
+        "embedding_model": embedding_model,
+        "hybrid_alpha": hybrid_alpha,
+        "use_dummy_embeddings": use_dummy_embeddings,
+        "shards": shards,
+        "bm25_prune_keep": bm25_prune_keep,
+        "bm25_prune_method": bm25_prune_method,
+    }
+    corpus = _CURRENT
+    _write_doc_store(corpus)
+    targets = set(names) if names is not None else set(_REGISTRY.generations())
+    for name in targets:
+        if name not in BACKEND_NAMES:
+            raise ValueError(f"unknown backend: {name}")
+    if targets & set(COMPOSED_BACKENDS) and shards == 1:
+        targets |= {"bm25", "embed"}
+    # Only plain BM25 is cheap to pickle back from a worker process
+    pool = _REBUILD_POOL if shards == 1 else None
+    futures: dict[str, Future[int]] = {}
+    for name in sorted(targets, key=BACKEND_NAMES.index):  # composed ones last
+        wait = []
+        if name in COMPOSED_BACKENDS:
+            wait = [futures[n] for n in ("bm25", "embed") if n in futures]
+        futures[name] = _REGISTRY.rebuild(
+            name,
+            backend_builder(name, corpus, options, _REGISTRY, wait),
+            source=corpus,
+            executor=pool if name == "bm25" else None,
+        )
+    return futures
+
+
+def warm_backends(
+    names: Sequence[str],
+    *,
+    embedding_model: str,
+    hybrid_alpha: float,
+    use_dummy_embeddings: bool,
+    shards: int = 1,
+    bm25_prune_keep: float = 1.0,
+    bm25_prune_method: str = "term",
+) -> dict[str, Future[int]]:
+    """Build backends in the background, in ``BACKEND_NAMES`` order, one at a time.
+
+    Until a backend's future resolves :func:`backend_status` reports it as
+    ``"warming"``, so callers can serve something cheaper instead of blocking.
+    """
+    options = {
+        "embedding_model": embedding_model,
+        "hybrid_alpha": hybrid_alpha,
+        "use_dummy_embeddings": use_dummy_embeddings,
+        "shards": shards,
+        "bm25_prune_keep": bm25_prune_keep,
+        "bm25_prune_method": bm25_prune_method,
+    }
+    corpus = _CURRENT
+    _write_doc_store(corpus)
+    futures: dict[str, Future[int]] = {}
+    for name in sorted(set(names), key=BACKEND_NAMES.index):
+        if name not in BACKEND_NAMES:
+            raise ValueError(f"unknown backend: {name}")
+        builder = backend_builder(name, corpus, options, _REGISTRY)
+        futures[name] = _REGISTRY.warm(name, builder, source=corpus)
+    _WARMING.update(futures)
+    return futures
+
+
+def backend_status(name: str) -> str:
+    """``ready`` (built), ``warming`` (background build pending), ``failed`` (that
+    build raised; the next request builds it lazily) or ``cold`` (built on first use).
+    """
+    if _REGISTRY.get(name) is not None:
+        return "ready"
+    fut = _WARMING.get(name)
+    if fut is None:
+        return "cold"
+    if not fut.done():
+        return "warming"
+    return "failed" if fut.exception() is not None else "cold"
+
+
+def get_registry() -> IndexRegistry:
+    return _REGISTRY
+
+
+def use_doc_store(
+    path: str | None,
+    *,
+    cache_bytes: int = 8 * 1024 * 1024,
+    block_bytes: int = 64 * 1024,
+    codec: str = "zlib",
+) -> None:
+    """Hydrate result text from a compressed :class:`DocStore` at *path* (None: from memory).
+
+    The store is (re)written by :func:`warm_backends` and :func:`rebuild_backends`
+    for the corpus they index, never on the query path; a file left at *path*
+    by an earlier run is overwritten, not served.
+    """
+    global _DOC_STORE_OPTIONS, _DOC_STORE
+    with _DOC_STORE_LOCK:
+        _DOC_STORE_OPTIONS = (
+            {"path": path, "cache_bytes": cache_bytes, "block_bytes": block_bytes, "codec": codec}
+            if path
+            else None
+        )
+        _DOC_STORE = None
+
+
+def _write_doc_store(corpus: CorpusSnapshot) -> None:
+    global _DOC_STORE
+    with _DOC_STORE_LOCK:
+        opts = _DOC_STORE_OPTIONS
+        if opts is None or (_DOC_STORE is not None and _DOC_STORE[0] is corpus):
+            return
+        docs = zip(corpus.ids, corpus.texts, strict=True)
+        write_docstore(opts["path"], docs, block_bytes=opts["block_bytes"], codec=opts["codec"])
+        # The previous store may still be read by in-flight requests; its map
+        # closes once they drop it
+        _DOC_STORE = (corpus, DocStore(opts["path"], cache_bytes=opts["cache_bytes"]))
+
+
+def get_doc_store(corpus: CorpusSnapshot) -> Mapping[str, str]:
+    """Return the mapping to hydrate results of an index built over *corpus*.
+
+    Without a store (see :func:`use_doc_store`) this is the in-memory
+    ``DOCS_BY_ID``. With one, it is the store once it has been written for
+    *corpus*, and the snapshot's own texts until then.
+    """
+    if _DOC_STORE_OPTIONS is None:
+        return DOCS_BY_ID
+    entry = _DOC_STORE
+    return entry[1] if entry is not None and entry[0] is corpus else corpus.text_by_id
+
+
+def get_snippet_index() -> SnippetIndex:
+    """Return the snippet index over the current corpus."""
+    return _CURRENT.snippet_index
+
+
+def get_metadata_index() -> MetadataIndex:
+    """Return the metadata filter index over the current corpus, in build order."""
+    return _CURRENT.metadata_index
@@ -0,0 +1,166 @@
+"""Approximate result cache keyed by query-embedding similarity.
+
+Paraphrased queries ("how do I reset my password" / "password reset steps")
+miss an exact-string cache. :class:`SemanticCache` embeds each query and, if a
+cached query of the same scope (backend, k, filters) is at least ``threshold``
+cosine-similar, returns that query's results instead of searching again.
+
+Cached vectors live in one preallocated matrix, so a lookup is a single
+matrix-vector product over the scope's rows; at the intended sizes (a few
+thousand entries) that exact scan is cheaper than maintaining an ANN graph.
+Entries remember the index generation they were computed on and a scope is
+emptied as soon as a lookup or store sees a newer generation.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from .backends.embed import EmbeddingModel
+
+
+@dataclass(frozen=True)
+class SemanticHit:
+    query: str  # the cached query whose results are served
+    similarity: float
+    results: list[tuple[str, float]]
+
+
+@dataclass
+class _Scope:
+    generation: int
+    slots: set[int]
+
+
+class SemanticCache:
+    """Bounded LRU of query vectors and their results, looked up by cosine similarity."""
+
+    def __init__(
+        self, model: EmbeddingModel, *, threshold: float = 0.95, max_entries: int = 1024
+    ) -> None:
+        if not -1.0 <= threshold <= 1.0:
+            raise ValueError("threshold must be a cosine similarity in [-1, 1]")
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        self.model = model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._vecs: np.ndarray | None = None  # (max_entries, dim), allocated on first store
+        self._entries: list[tuple[Hashable, str, list[tuple[str, float]]] | None] = [
+            None
+        ] * max_entries
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lru: OrderedDict[int, None] = OrderedDict()
+        self._scopes: dict[Hashable, _Scope] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def embed(self, query: str) -> np.ndarray:
+        vec = np.asarray(self.model.encode_texts([query]), dtype=np.float32)[0]
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def _scope(self, scope: Hashable, generation: int, *, create: bool) -> _Scope | None:
+        """Return *scope*'s entries for *generation*, dropping ones from older indexes.
+
+        None if the scope is empty (and not created) or already holds results
+        from a newer generation than the caller's lease.
+        """
+        entry = self._scopes.get(scope)
+        if entry is not None and entry.generation > generation:
+            return None
+        if entry is not None and entry.generation < generation:
+            for slot in entry.slots:
+                self._release(slot)
+            self.invalidations += len(entry.slots)
+            entry = None
+            del self._scopes[scope]
+        if entry is None and create:
+            entry = self._scopes[scope] = _Scope(generation, set())
+        return entry
+
+    def _release(self, slot: int) -> None:
+        self._entries[slot] = None
+        self._lru.pop(slot, None)
+        self._free.append(slot)
+
+    def lookup(
+        self, scope: Hashable, generation: int, query: str, vec: np.ndarray | None = None
+    ) -> SemanticHit | None:
+        """Return the most similar cached query's results if above the threshold."""
+        if vec is None:
+            vec = self.embed(query)
+        with self._lock:
+            entry = self._scope(scope, generation, create=False)
+            if entry is None or not entry.slots or self._vecs is None:
+                self.misses += 1
+                return None
+            slots = np.fromiter(entry.slots, dtype=np.int64, count=len(entry.slots))
+            sims = self._vecs[slots] @ vec
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            slot = int(slots[best])
+            _, cached_query, results = self._entries[slot] or (None, "", [])
+            self._lru.move_to_end(slot)
+            self.hits += 1
+            return SemanticHit(cached_query, float(sims[best]), list(results))
+
+    def store(
+        self,
+        scope: Hashable,
+        generation: int,
+        query: str,
+        results: list[tuple[str, float]],
+        vec: np.ndarray | None = None,
+    ) -> None:
+        if vec is None:
+            vec = self.embed(query)
+        with self._lock:
+            entry = self._scope(scope, generation, create=True)
+            if entry is None:
+                return
+            if self._vecs is None:
+                self._vecs = np.zeros((self.max_entries, len(vec)), dtype=np.float32)
+            if not self._free:
+                victim, _ = self._lru.popitem(last=False)
+                old = self._entries[victim]
+                if old is not None and old[0] in self._scopes:
+                    self._scopes[old[0]].slots.discard(victim)
+                self._release(victim)
+                self.evictions += 1
+            slot = self._free.pop()
+            self._vecs[slot] = vec
+            self._entries[slot] = (scope, query, list(results))
+            self._lru[slot] = None
+            entry.slots.add(slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            for slot in list(self._lru):
+                self._release(slot)
+            self._scopes.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "threshold": self.threshold,
+                "max_entries": self.max_entries,
+                "entries": len(self._lru),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
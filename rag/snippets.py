@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from .chunking import chunk_text
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_']+")
+
+
+def _tokenize(text: str) -> list[str]:
+    return [w.lower() for w in _WORD_RE.findall(text)]
+
+
+@dataclass(frozen=True)
+class Snippet:
+    text: str
+    start: int  # absolute char offset in the document (inclusive)
+    end: int  # absolute char offset in the document (exclusive)
+    highlights: list[tuple[int, int]]  # offsets relative to ``text``
+
+
+class SnippetIndex:
+    """Per-document chunk postings used to cut query-biased snippets.
+
+    ``build`` chunks every document once and records which chunks contain each
+    term, so picking a window at query time only touches the chosen chunk
+    instead of re-scanning the whole document.
+    """
+
+    def __init__(self, *, max_chars: int = 800) -> None:
+        self.max_chars = max_chars
+        self._chunks: dict[str, list[tuple[int, int]]] = {}
+        self._postings: dict[str, dict[str, list[int]]] = {}
+
+    def build(self, docs: Sequence[str], ids: Sequence[str]) -> None:
+        self._chunks, self._postings = {}, {}
+        for doc_id, text in zip(ids, docs, strict=True):
+            chunks = chunk_text(doc_id, text, max_chars=self.max_chars, overlap=0)
+            postings: dict[str, list[int]] = {}
+            for n, c in enumerate(chunks):
+                for tok in set(_tokenize(text[c.start : c.end])):
+                    postings.setdefault(tok, []).append(n)
+            self._chunks[doc_id] = [(c.start, c.end) for c in chunks]
+            self._postings[doc_id] = postings
+
+    def _best_chunk(self, doc_id: str, terms: set[str]) -> tuple[int, int] | None:
+        spans = self._chunks.get(doc_id)
+        if not spans:
+            return None
+        postings = self._postings[doc_id]
+        counts: dict[int, int] = {}
+        for t in terms:
+            for n in postings.get(t, ()):
+                counts[n] = counts.get(n, 0) + 1
+        if not counts:
+            return spans[0]
+        best = min(counts, key=lambda n: (-counts[n], n))
+        return spans[best]
+
+    def snippet(self, doc_id: str, text: str, query: str, *, max_chars: int) -> Snippet:
+        """Return the window of at most ``max_chars`` that best covers *query*.
+
+        The window is taken from the chunk matching the most distinct query
+        terms and positioned to cover as many term occurrences as possible.
+        """
+        if max_chars <= 0:
+            return Snippet(text="", start=0, end=0, highlights=[])
+        terms = set(_tokenize(query))
+        lo, hi = self._best_chunk(doc_id, terms) or (0, min(len(text), max_chars))
+        hits = [
+            (m.start(), m.end())
+            for m in _WORD_RE.finditer(text, lo, hi)
+            if m.group(0).lower() in terms
+        ]
+
+        # Slide a max_chars window over the hits and keep the densest placement
+        best_i, best_j, j = 0, 0, 0
+        for i in range(len(hits)):
+            j = max(j, i)
+            while j + 1 < len(hits) and hits[j + 1][1] - hits[i][0] <= max_chars:
+                j += 1
+            if j - i > best_j - best_i:
+                best_i, best_j = i, j
+        if hits:
+            first, last = hits[best_i][0], hits[best_j][1]
+            pad = max(0, (max_chars - (last - first)) // 2)
+            start = max(lo, min(first - pad, hi - max_chars))
+        else:
+            start = lo
+        end = min(hi, start + max_chars)
+        # Avoid cutting words in half at either edge
+        if start > lo and not text[start - 1].isspace():
+            ws = text.find(" ", start, end)
+            if ws != -1 and (not hits or ws < hits[best_i][0]):
+                start = ws + 1
+        if end < hi and not text[end].isspace():
+            ws = text.rfind(" ", start, end)
+            if ws != -1 and (not hits or ws >= hits[best_j][1]):
+                end = ws
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        highlights = [(s - start, e - start) for s, e in hits if start <= s and e <= end]
+        return Snippet(text=text[start:end], start=start, end=end, highlights=highlights)
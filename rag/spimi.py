@@ -0,0 +1,341 @@
+"""Single-pass in-memory indexing (SPIMI) for corpora that don't fit in RAM.
+
+Documents are streamed from an iterator into an in-memory term -> postings
+dictionary. Whenever its estimated size reaches the memory ceiling it is
+written to disk as a sorted run, and at the end all runs are k-way merged into
+the final postings file. Only the dictionary of the current run, one read
+buffer per run and the output buffer are ever held in memory; the final index
+is memory-mapped for search.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import os
+import re
+import shutil
+import struct
+import sys
+import time
+from array import array
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+
+from .backends.base import top_k
+
+_WORD_RE = re.compile(r"[A-Za-z0-9_']+")
+
+# Postings are (doc number, term frequency) pairs stored interleaved, so the
+# chunks of one term from consecutive runs concatenate into a valid list.
+POSTING = np.dtype([("doc", "<u4"), ("tf", "<u4")])
+_RUN_HEADER = struct.Struct("<II")  # term byte length, posting count
+# Rough CPython cost of a new dictionary term (str, dict slot, two arrays)
+_TERM_OVERHEAD = 240
+_COPY_BYTES = 1 << 20
+
+
+def _tokenize(text: str) -> list[str]:
+    return [w.lower() for w in _WORD_RE.findall(text)]
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (Linux), else the getrusage peak, else 0 (Windows)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):  # pragma: no cover - non-Linux
+        pass
+    try:  # pragma: no cover - non-Linux
+        import resource  # POSIX only; imported here so Windows can still load this module
+    except ImportError:  # pragma: no cover - Windows
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # pragma: no cover
+    return peak if sys.platform == "darwin" else peak * 1024  # pragma: no cover - KiB elsewhere
+
+
+@dataclass
+class SpimiStats:
+    docs: int = 0
+    tokens: int = 0
+    terms: int = 0
+    postings: int = 0
+    runs: int = 0
+    memory_limit_bytes: int = 0
+    peak_run_bytes: int = 0  # largest estimated in-memory dictionary
+    peak_rss_bytes: int = 0  # largest RSS sampled at spills and after the merge
+    index_bytes: int = 0
+    build_s: float = 0.0
+    merge_s: float = 0.0
+
+
+def _write_run(path: Path, postings: dict[str, tuple[array, array]]) -> None:
+    with path.open("wb", buffering=_COPY_BYTES) as f:
+        for term in sorted(postings):
+            docs, tfs = postings[term]
+            rec = np.empty(len(docs), dtype=POSTING)
+            rec["doc"] = np.frombuffer(docs, dtype=np.uint32)
+            rec["tf"] = np.frombuffer(tfs, dtype=np.uint32)
+            raw = term.encode("utf-8")
+            f.write(_RUN_HEADER.pack(len(raw), len(docs)))
+            f.write(raw)
+            f.write(rec.tobytes())
+
+
+class _RunReader:
+    def __init__(self, path: Path) -> None:
+        self.f: BinaryIO = path.open("rb", buffering=_COPY_BYTES)
+        self.term = ""
+        self.count = 0
+
+    def next(self) -> bool:
+        head = self.f.read(_RUN_HEADER.size)
+        if not head:
+            self.f.close()
+            return False
+        size, self.count = _RUN_HEADER.unpack(head)
+        self.term = self.f.read(size).decode("utf-8")
+        return True
+
+    def copy_postings(self, out: BinaryIO) -> None:
+        left = self.count * POSTING.itemsize
+        while left:
+            buf = self.f.read(min(left, _COPY_BYTES))
+            out.write(buf)
+            left -= len(buf)
+
+
+def _kway(runs: Sequence[Path]) -> Iterator[tuple[str, list[_RunReader]]]:
+    """Yield each term once, with the readers positioned on it in run order.
+
+    The caller must copy (or skip) each reader's postings before advancing.
+    """
+    readers = [_RunReader(p) for p in runs]
+    heap = [(r.term, i) for i, r in enumerate(readers) if r.next()]
+    heapq.heapify(heap)
+    while heap:
+        term = heap[0][0]
+        # Same term from several runs: ascending run index keeps doc order
+        group: list[int] = []
+        while heap and heap[0][0] == term:
+            group.append(heapq.heappop(heap)[1])
+        yield term, [readers[i] for i in group]
+        for i in group:
+            if readers[i].next():
+                heapq.heappush(heap, (readers[i].term, i))
+
+
+def _merge_to_run(runs: Sequence[Path], path: Path) -> None:
+    with path.open("wb", buffering=_COPY_BYTES) as out:
+        for term, group in _kway(runs):
+            raw = term.encode("utf-8")
+            out.write(_RUN_HEADER.pack(len(raw), sum(r.count for r in group)))
+            out.write(raw)
+            for r in group:
+                r.copy_postings(out)
+    for p in runs:
+        p.unlink()
+
+
+def _merge_runs(runs: Sequence[Path], out_dir: Path, fan_in: int) -> tuple[int, int]:
+    """K-way merge sorted runs into the final postings and lexicon files.
+
+    With more than *fan_in* runs, consecutive groups are merged into larger
+    runs first so only *fan_in* files are open at once.
+    """
+    runs = list(runs)
+    level = 0
+    while len(runs) > fan_in:
+        level += 1
+        merged: list[Path] = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i : i + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            path = group[0].with_name(f"merge-{level}-{i:05d}.bin")
+            _merge_to_run(group, path)
+            merged.append(path)
+        runs = merged
+    offsets = array("q", [0])
+    n_postings = 0
+    with (
+        (out_dir / "postings.bin").open("wb", buffering=_COPY_BYTES) as post,
+        (out_dir / "terms.txt").open("w", encoding="utf-8", buffering=_COPY_BYTES) as terms,
+    ):
+        for term, readers in _kway(runs):
+            for r in readers:
+                r.copy_postings(post)
+                n_postings += r.count
+            terms.write(term + "\n")
+            offsets.append(n_postings)
+    np.save(out_dir / "offsets.npy", np.frombuffer(offsets, dtype=np.int64))
+    return len(offsets) - 1, n_postings
+
+
+def build_spimi_index(
+    docs: Iterable[tuple[str, str]],
+    out_dir: str | Path,
+    *,
+    memory_limit_bytes: int = 256 * 1024 * 1024,
+    fan_in: int = 64,
+    tokenize: Callable[[str], list[str]] = _tokenize,
+) -> SpimiStats:
+    """Build a BM25 inverted index over ``(doc_id, text)`` pairs under *out_dir*.
+
+    The in-memory run dictionary is spilled once its estimated size reaches
+    *memory_limit_bytes*; doc ids and lengths are streamed straight to disk.
+    At most *fan_in* runs are merged at once.
+    """
+    if fan_in < 2:
+        raise ValueError("fan_in must be >= 2")
+    if memory_limit_bytes <= 0:
+        raise ValueError("memory_limit_bytes must be > 0")
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    runs_dir = out / "runs"
+    runs_dir.mkdir(exist_ok=True)
+    stats = SpimiStats(memory_limit_bytes=memory_limit_bytes)
+    t0 = time.perf_counter()
+    runs: list[Path] = []
+    postings: dict[str, tuple[array, array]] = {}
+    used = 0
+
+    def spill() -> None:
+        nonlocal postings, used
+        path = runs_dir / f"run-{len(runs):05d}.bin"
+        _write_run(path, postings)
+        runs.append(path)
+        stats.peak_run_bytes = max(stats.peak_run_bytes, used)
+        stats.peak_rss_bytes = max(stats.peak_rss_bytes, _rss_bytes())
+        postings, used = {}, 0
+
+    with (
+        (out / "ids.txt").open("w", encoding="utf-8", buffering=_COPY_BYTES) as ids_f,
+        (out / "doclens.bin").open("wb", buffering=_COPY_BYTES) as lens_f,
+    ):
+        for doc_id, text in docs:
+            if "\n" in doc_id:
+                raise ValueError(f"doc id contains a newline: {doc_id!r}")
+            toks = tokenize(text)
+            for term, tf in Counter(toks).items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array("I"), array("I"))
+                    used += _TERM_OVERHEAD + len(term)
+                entry[0].append(stats.docs)
+                entry[1].append(tf)
+                used += POSTING.itemsize
+            ids_f.write(doc_id + "\n")
+            lens_f.write(struct.pack("<I", len(toks)))
+            stats.docs += 1
+            stats.tokens += len(toks)
+            if used >= memory_limit_bytes:
+                spill()
+    if postings or not runs:
+        spill()
+    stats.runs = len(runs)
+    stats.build_s = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    stats.terms, stats.postings = _merge_runs(runs, out, fan_in)
+    shutil.rmtree(runs_dir)
+    stats.merge_s = time.perf_counter() - t1
+    stats.peak_rss_bytes = max(stats.peak_rss_bytes, _rss_bytes())
+    stats.index_bytes = sum(p.stat().st_size for p in out.iterdir() if p.is_file())
+    (out / "meta.json").write_text(json.dumps(asdict(stats), indent=2))
+    return stats
+
+
+def iter_ndjson(path: str | Path) -> Iterator[tuple[str, str]]:
+    """Yield ``(id, text)`` from an NDJSON file one line at a time."""
+    with Path(path).open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                yield str(rec["id"]), str(rec["text"])
+
+
+class SpimiIndex:
+    """Memory-mapped reader over a :func:`build_spimi_index` directory with Okapi BM25.
+
+    Scoring follows ``rank_bm25.BM25Okapi`` (same k1/b/epsilon and idf floor),
+    so rankings match :class:`~rag.backends.bm25.BM25Backend` over the same corpus.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+        tokenize: Callable[[str], list[str]] = _tokenize,
+    ) -> None:
+        self.path = Path(path)
+        self.k1, self.b = k1, b
+        self.tokenize = tokenize
+        terms = (self.path / "terms.txt").read_text(encoding="utf-8").split("\n")[:-1]
+        self._term_ids = {t: n for n, t in enumerate(terms)}
+        self._offsets = np.load(self.path / "offsets.npy")
+        size = (self.path / "postings.bin").stat().st_size
+        self._postings = (
+            np.memmap(self.path / "postings.bin", dtype=POSTING, mode="r")
+            if size
+            else np.empty(0, dtype=POSTING)
+        )
+        self._doclens = np.fromfile(self.path / "doclens.bin", dtype="<u4").astype(np.float64)
+        self.ids = (self.path / "ids.txt").read_text(encoding="utf-8").split("\n")[:-1]
+        n = len(self.ids)
+        self.avgdl = float(self._doclens.sum() / n) if n else 0.0
+        df = np.diff(self._offsets).astype(np.float64)
+        idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            idf[idf < 0] = epsilon * (idf.sum() / len(idf))
+        self._idf = idf
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def postings(self, term: str) -> np.ndarray:
+        n = self._term_ids.get(term)
+        if n is None:
+            return np.empty(0, dtype=POSTING)
+        return self._postings[self._offsets[n] : self._offsets[n + 1]]
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document, accumulated from the query terms' postings."""
+        acc = np.zeros(len(self.ids))
+        if not self.avgdl:
+            return acc
+        norm = self.k1 * (1 - self.b + self.b * self._doclens / self.avgdl)
+        for term in self.tokenize(query):
+            n = self._term_ids.get(term)
+            if n is None:
+                continue
+            post = self._postings[self._offsets[n] : self._offsets[n + 1]]
+            docs = post["doc"].astype(np.int64)
+            tf = post["tf"].astype(np.float64)
+            acc[docs] += self._idf[n] * (tf * (self.k1 + 1) / (tf + norm[docs]))
+        return acc
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        allowed: np.ndarray | None = None,
+        *,
+        scores: np.ndarray | None = None,
+    ) -> list[int]:
+        """Top-k document numbers by score (ties by position), optionally within *allowed*."""
+        if scores is None:
+            scores = self.scores(query)
+        rows = np.arange(len(scores)) if allowed is None else np.asarray(allowed, dtype=np.int64)
+        if not len(rows):
+            return []
+        return [int(rows[j]) for j in top_k(scores[rows], rows, k)]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from rag.backends.bm25 import BM25Backend
+from rag.backends.cascade import CascadeBackend
+from rag.backends.embed import EmbeddingBackend, HashingEmbeddingModel
+from rag.backends.hybrid import HybridBackend
+from rag.retriever import create_backend
+
+DOCS = [f"shared words document {i} about topic {i % 7}" for i in range(60)]
+IDS = [f"d{i}" for i in range(60)]
+
+
+def _parts() -> tuple[BM25Backend, EmbeddingBackend]:
+    bm25 = BM25Backend()
+    bm25.build(DOCS, IDS)
+    embed = EmbeddingBackend(HashingEmbeddingModel(dim=64))
+    embed.build(DOCS, IDS)
+    return bm25, embed
+
+
+def test_rescoring_every_candidate_matches_exact_fusion() -> None:
+    bm25, embed = _parts()
+    cascade = CascadeBackend(bm25, embed, alpha=0.5, candidates=len(DOCS))
+    query = "document about topic 3"
+    got = cascade.search(query, k=5)
+    q = embed.encode_query(query)
+    bm = np.array([s for _, s in sorted(bm25.top_rows(query, len(DOCS)))])
+    em = embed.score_rows(q, np.arange(len(DOCS)))
+
+    def norm(x: np.ndarray) -> np.ndarray:
+        return (x - x.min()) / (x.max() - x.min())
+
+    fused = 0.5 * norm(bm) + 0.5 * norm(em)
+    expected = sorted(range(len(DOCS)), key=lambda i: (-fused[i], -bm[i], IDS[i]))[:5]
+    assert [d for d, _ in got] == [IDS[i] for i in expected]
+    assert np.allclose([s for _, s in got], fused[expected], atol=1e-6)
+
+
+def test_candidates_come_from_bm25_and_respect_filters() -> None:
+    bm25, embed = _parts()
+    cascade = CascadeBackend(bm25, embed, candidates=10)
+    top_bm25 = {d for d, _ in bm25.search("topic 3", k=10)}
+    assert {d for d, _ in cascade.search("topic 3", k=5)} <= top_bm25
+    allowed = np.arange(0, 60, 2)
+    assert all(int(d[1:]) % 2 == 0 for d, _ in cascade.search("topic 3", k=5, allowed=allowed))
+    assert cascade.search("topic 3", k=5, allowed=np.zeros(0, dtype=np.int64)) == []
+
+
+def test_budget_shrinks_candidates_but_never_below_k() -> None:
+    bm25, embed = _parts()
+    cascade = CascadeBackend(bm25, embed, candidates=50)
+    assert cascade.budgeted_candidates(5, 0.0, 50) == 5
+    assert cascade.budgeted_candidates(5, 1000.0, 50) == 50
+    assert len(cascade.search("document", k=5, budget_ms=1e-6)) == 5
+    full = HybridBackend(bm25, embed).search("topic 3", k=3)
+    assert len(cascade.search("topic 3", k=3, budget_ms=1000.0)) == len(full)
+
+
+def test_rejects_bad_candidate_count() -> None:
+    bm25, embed = _parts()
+    with pytest.raises(ValueError):
+        CascadeBackend(bm25, embed, candidates=0)
+
+
+def test_cascade_refuses_sharded_bm25() -> None:
+    with pytest.raises(ValueError, match="unsharded"):
+        create_backend(
+            "cascade", embedding_model="", hybrid_alpha=0.5, use_dummy_embeddings=True, shards=2
+        )
@@ -0,0 +1,79 @@
+import pytest
+
+from rag.catalog import CollectionCatalog, valid_collection_name, write_collection
+
+_OPTIONS = {"embedding_model": "", "hybrid_alpha": 0.5, "use_dummy_embeddings": True}
+
+
+def _write(root, name: str, n: int = 50) -> None:
+    docs = [(f"{name}-{i}", f"{name} document number {i} about topic {i % 7}") for i in range(n)]
+    write_collection(root, name, docs, {docs[0][0]: {"tier": "gold"}})
+
+
+def test_collections_load_lazily_and_search_their_own_corpus(tmp_path) -> None:
+    _write(tmp_path, "acme")
+    _write(tmp_path, "globex")
+    catalog = CollectionCatalog(tmp_path, memory_budget_bytes=1 << 30)
+    assert catalog.names() == ["acme", "globex"]
+    assert catalog.stats() == {}
+    with catalog.lease("acme", "bm25", _OPTIONS) as (handle, corpus):
+        assert handle.backend.search("acme", k=1)[0][0].startswith("acme-")
+        assert corpus.metadata_index.allowed({"tier": ["gold"]}).tolist() == [0]
+        index = handle.backend
+    stats = catalog.stats()["acme"]
+    assert stats["resident"] and stats["loads"] == 1
+    # the whole index counts, not just its scoring postings
+    assert index.nbytes > index.index_size()["bytes"] > index.index_size()["scoring_bytes"]
+    assert stats["resident_bytes"] == corpus.nbytes + index.nbytes
+    with catalog.lease("acme", "bm25", _OPTIONS):
+        pass
+    assert catalog.stats()["acme"]["loads"] == 1  # already resident
+
+
+def test_lru_collection_evicted_over_budget_and_reloaded_on_demand(tmp_path) -> None:
+    for name in ("a", "b", "c"):
+        _write(tmp_path, name)
+    catalog = CollectionCatalog(tmp_path, memory_budget_bytes=1 << 30)
+    with catalog.lease("a", "bm25", _OPTIONS):
+        pass
+    one = catalog.resident_bytes
+    catalog.memory_budget_bytes = int(one * 2.5)  # room for two collections
+
+    for name in ("b", "a", "c"):  # "b" is now least recently used
+        with catalog.lease(name, "bm25", _OPTIONS):
+            pass
+    stats = catalog.stats()
+    assert not stats["b"]["resident"] and stats["b"]["evictions"] == 1
+    assert stats["a"]["resident"] and stats["c"]["resident"]
+    assert catalog.resident_bytes <= catalog.memory_budget_bytes
+
+    with catalog.lease("b", "bm25", _OPTIONS) as (handle, _):
+        assert handle.backend.search("b", k=1)[0][0].startswith("b-")
+    assert catalog.stats()["b"]["loads"] == 2
+
+
+def test_eviction_racing_a_lease_leaves_nothing_resident_unaccounted(tmp_path, monkeypatch) -> None:
+    _write(tmp_path, "a")
+    catalog = CollectionCatalog(tmp_path, memory_budget_bytes=1 << 30)
+    touch = catalog._touch
+
+    def evicted_first(coll) -> None:
+        coll.unload()  # another request's touch evicts it right after the load
+        touch(coll)
+
+    monkeypatch.setattr(catalog, "_touch", evicted_first)
+    with catalog.lease("a", "bm25", _OPTIONS) as (handle, _):
+        assert handle.backend.search("a", k=1)[0][0].startswith("a-")
+    coll = catalog.get("a")
+    assert not coll.resident and coll.registry.generations() == {}
+
+
+def test_unknown_or_invalid_collections(tmp_path) -> None:
+    catalog = CollectionCatalog(tmp_path, memory_budget_bytes=1)
+    with pytest.raises(KeyError):
+        catalog.get("missing")
+    with pytest.raises(KeyError):
+        catalog.get("../etc")
+    assert not valid_collection_name("a/b") and valid_collection_name("tenant-1.v2")
+    with pytest.raises(ValueError):
+        write_collection(tmp_path, "..", [])
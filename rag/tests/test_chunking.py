@@ -1,4 +1,4 @@
-from rag.chunking import chunk_text
+from rag.chunking import chunk_text, rechunk
 
 
 def test_chunking_headings_and_overlap():
@@ -15,3 +15,20 @@ def test_chunking_headings_and_overlap():
         assert tail[:40] in b.text
     assert chunks[0].heading == "Intro"
     assert any(c.heading == "Details" for c in chunks)
+
+
+def test_rechunk_matches_full_run_and_reports_diff():
+    paras = [f"Paragraph {i} opens here. It has a second sentence! And a third?" for i in range(40)]
+    old = "# Title\n" + "\n\n".join(paras)
+    old_chunks = chunk_text("doc1", old, max_chars=200, overlap=40)
+    for edit in ("Paragraph 20 was rewritten entirely.", "\n\n## New heading\n", ""):
+        pos = old.index("Paragraph 20")
+        new = old[:pos] + edit + old[pos + len("Paragraph 20 opens here.") :]
+        res = rechunk(old_chunks, old, new, max_chars=200, overlap=40)
+        assert res.chunks == chunk_text("doc1", new, max_chars=200, overlap=40)
+        assert res.offset_delta == len(new) - len(old)
+        assert len(res.kept) + len(res.added) == len(res.chunks)
+        assert len(res.kept) + len(res.removed) == len(old_chunks)
+        if edit.startswith("Paragraph"):  # same sentence count: packing re-syncs
+            assert 0 < len(res.added) < len(res.chunks) // 2
+    assert rechunk(old_chunks, old, old).added == []
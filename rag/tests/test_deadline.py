@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+import pytest
+
+from rag.backends import hybrid as hybrid_mod
+from rag.backends.bm25 import BM25Backend
+from rag.backends.cascade import CascadeBackend
+from rag.backends.embed import DummyEmbeddingModel, EmbeddingBackend
+from rag.backends.hybrid import HybridBackend
+from rag.backends.sharded import ShardedBackend
+from rag.deadline import Deadline, DeadlineExceededError
+
+DOCS = ["the cat sat", "dogs are great pets", "I love pizza", "the quick brown fox"]
+
+
+class _SlowModel(DummyEmbeddingModel):
+    delay = 0.0
+
+    def encode_texts(self, texts: list[str]) -> np.ndarray:
+        time.sleep(self.delay)
+        return super().encode_texts(texts)
+
+
+def _parts() -> tuple[BM25Backend, EmbeddingBackend, _SlowModel]:
+    bm25 = BM25Backend()
+    bm25.build(DOCS)
+    model = _SlowModel()
+    embed = EmbeddingBackend(model)
+    embed.build(DOCS)
+    model.delay = 0.5
+    return bm25, embed, model
+
+
+def test_deadline_counts_time_before_it_was_created() -> None:
+    deadline = Deadline(50, start=time.monotonic() - 0.1)
+    assert deadline.expired and deadline.remaining_ms() == 0.0
+    with pytest.raises(DeadlineExceededError, match="before search"):
+        deadline.check("search")
+    assert not Deadline(10_000).expired
+
+
+def test_hybrid_abandons_a_slow_embedding_leg() -> None:
+    bm25, embed, _ = _parts()
+    deadline = Deadline(50)
+    start = time.monotonic()
+    got = HybridBackend(bm25, embed).search("pizza", k=2, deadline=deadline)
+    assert time.monotonic() - start < 0.4
+    assert deadline.partial and deadline.abandoned == ["embed"]
+    assert got[0][0] == bm25.search("pizza", k=1)[0][0]
+
+
+def test_hybrid_within_deadline_matches_unbounded_search() -> None:
+    bm25, embed, model = _parts()
+    model.delay = 0.0
+    hybrid = HybridBackend(bm25, embed)
+    deadline = Deadline(10_000)
+    assert hybrid.search("the fox", k=3, deadline=deadline) == hybrid.search("the fox", k=3)
+    assert not deadline.partial
+
+
+def test_hybrid_runs_the_leg_inline_when_the_deadline_is_far_off() -> None:
+    bm25, embed, model = _parts()
+    model.delay = 0.0
+    hybrid = HybridBackend(bm25, embed)
+    hybrid.search("the fox", k=3, deadline=Deadline(10_000))  # first leg is timed on the pool
+    before = hybrid_mod._LEGS.stats()["completed"]
+    for _ in range(20):
+        hybrid.search("the fox", k=3, deadline=Deadline(10_000))
+    assert hybrid_mod._LEGS.stats()["completed"] == before
+    hybrid._leg_ms = 2_000.0  # a tight deadline relative to the leg goes back to the pool
+    hybrid.search("the fox", k=3, deadline=Deadline(10_000))
+    assert hybrid_mod._LEGS.stats()["completed"] == before + 1
+
+
+def test_embedding_search_stops_once_its_deadline_expired() -> None:
+    _, embed, model = _parts()
+    model.delay = 5.0  # would be paid if the query were still encoded
+    deadline = Deadline(0)
+    start = time.monotonic()
+    assert embed.search("pizza", k=2, deadline=deadline) == []
+    assert time.monotonic() - start < 0.1 and deadline.abandoned == ["embed"]
+
+
+def test_cascade_returns_bm25_ranking_once_expired() -> None:
+    bm25, embed, _ = _parts()
+    cascade = CascadeBackend(bm25, embed)
+    with pytest.raises(DeadlineExceededError):
+        cascade.search("pizza", k=2, deadline=Deadline(0))
+    deadline = Deadline(1)
+    bm25.top_rows = lambda *a, **kw: (time.sleep(0.01), BM25Backend.top_rows(bm25, *a, **kw))[1]
+    assert cascade.search("pizza", k=1, deadline=deadline) == bm25.search("pizza", k=1)
+    assert deadline.abandoned == ["embed"]
+
+
+class _SlowBM25(BM25Backend):
+    def search(self, *args: object, **kwargs: object) -> list[tuple[str, float]]:
+        time.sleep(0.05)
+        return super().search(*args, **kwargs)  # type: ignore[arg-type]
+
+
+def test_sharded_search_drops_shards_past_the_deadline() -> None:
+    backend = ShardedBackend(_SlowBM25, 2, partition="range", processes=False)
+    backend.build(DOCS)
+    deadline = Deadline(10_000)
+    full = backend.search("the", k=4, deadline=deadline)
+    assert len(full) == 4 and not deadline.partial
+    deadline = Deadline(20)
+    partial = backend.search("the", k=4, deadline=deadline)
+    assert 0 < len(partial) < 4 and set(partial) < set(full)
+    assert deadline.abandoned == ["shard 1"]
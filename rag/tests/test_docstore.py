@@ -0,0 +1,36 @@
+from pathlib import Path
+
+import pytest
+
+from rag.docstore import DocStore, write_docstore
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lzma", "none"])
+def test_docstore_roundtrip(tmp_path: Path, codec: str) -> None:
+    docs = [(f"d{i}", f"document {i} – ünïcode " * (i + 1)) for i in range(50)]
+    path = tmp_path / "docs.store"
+    write_docstore(path, docs, block_bytes=256, codec=codec)
+    with DocStore(path) as store:
+        assert len(store) == 50 and "d7" in store and "nope" not in store
+        assert dict(store.items()) == dict(docs)
+        assert store.stats()["blocks"] > 1
+
+
+def test_docstore_lru_bounded_by_bytes(tmp_path: Path) -> None:
+    path = tmp_path / "docs.store"
+    write_docstore(path, [(f"d{i}", "x" * 100) for i in range(10)], block_bytes=100)
+    with DocStore(path, cache_bytes=250) as store:
+        for doc_id in ["d0", "d1", "d0", "d2", "d1"]:
+            assert store[doc_id] == "x" * 100
+        stats = store.stats()
+        assert stats["cached_bytes"] <= 250 and stats["cached_blocks"] == 2
+        assert (stats["hits"], stats["misses"]) == (1, 4)
+
+
+def test_docstore_rejects_foreign_files(tmp_path: Path) -> None:
+    path = tmp_path / "bogus"
+    path.write_bytes(b"not a store at all, just some bytes here")
+    with pytest.raises(ValueError):
+        DocStore(path)
+    with pytest.raises(ValueError):
+        write_docstore(tmp_path / "x", [], codec="bz2")
@@ -0,0 +1,39 @@
+import threading
+
+from rag.executors import TrackedThreadPool, executor_stats
+
+
+def test_pool_reports_queued_busy_and_busy_time() -> None:
+    pool = TrackedThreadPool(1, "test-pool")
+    started, release = threading.Event(), threading.Event()
+
+    def work() -> int:
+        started.set()
+        release.wait(5)
+        return 1
+
+    first = pool.submit(work)
+    assert started.wait(5)
+    second = pool.submit(lambda: 2)
+    busy = executor_stats()["test-pool"]
+    assert (busy["busy"], busy["queued"], busy["utilization"]) == (1, 1, 1.0)
+    release.set()
+    assert (first.result(), second.result()) == (1, 2)
+    pool.shutdown()
+    idle = pool.stats()
+    assert (idle["busy"], idle["queued"], idle["completed"]) == (0, 0, 2)
+    assert idle["busy_seconds"] > 0
+
+
+def test_cancelled_queued_tasks_leave_the_queue() -> None:
+    pool = TrackedThreadPool(1, "test-cancel")
+    started, release = threading.Event(), threading.Event()
+    pool.submit(lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    queued = [pool.submit(lambda: None) for _ in range(3)]
+    assert pool.stats()["queued"] == 3
+    assert queued[0].cancel()
+    assert pool.stats()["queued"] == 2
+    release.set()
+    pool.shutdown(cancel_futures=True)
+    assert pool.stats()["queued"] == 0 and pool.stats()["busy"] == 0
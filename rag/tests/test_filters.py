@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from rag.bm25_index import BM25ChunkIndex
+from rag.chunking import chunk_text
+from rag.filters import MetadataIndex, parse_filters
+
+
+def _index(n: int = 1000) -> tuple[MetadataIndex, list[str], list[dict[str, str]]]:
+    ids = [f"{'a' if i % 2 else 'b'}-{i:04d}" for i in range(n)]
+    meta = [
+        {"tenant": f"t{i % 3}", "source": "rare" if i % 97 == 0 else "common"} for i in range(n)
+    ]
+    idx = MetadataIndex()
+    idx.build(ids, meta)
+    return idx, ids, meta
+
+
+def test_allowed_matches_brute_force_for_sparse_and_dense_sets() -> None:
+    idx, ids, meta = _index()
+    specs = [
+        {"tenant": ["t1"]},
+        {"source": ["rare"]},
+        {"tenant": ["t0", "t2"], "source": ["rare"]},
+        {"tenant": ["t1"], "doc_id_prefix": ["a-"]},
+        {"source": ["rare", "common"], "doc_id_prefix": ["b-00", "a-09"]},
+        {"tenant": ["missing"]},
+    ]
+    for spec in specs:
+        expected = [
+            i
+            for i in range(len(ids))
+            if all(
+                (
+                    any(ids[i].startswith(v) for v in vals)
+                    if f == "doc_id_prefix"
+                    else meta[i].get(f) in vals
+                )
+                for f, vals in spec.items()
+            )
+        ]
+        got = idx.allowed(spec)
+        assert got is not None
+        assert got.tolist() == expected, spec
+    assert idx.allowed({}) is None
+    # the rare value is kept as positions, the common one as a packed bitset
+    assert idx.nbytes < 4 * len(ids)
+
+
+def test_parse_filters() -> None:
+    assert parse_filters(["tenant:acme", "tenant: globex", "source:a:b"]) == {
+        "tenant": ["acme", "globex"],
+        "source": ["a:b"],
+    }
+    with pytest.raises(ValueError):
+        parse_filters(["tenant"])
+
+
+def test_chunk_index_search_restricted_to_allowed_chunks() -> None:
+    text = "# Pets\nCats purr softly.\n# Space\nCats in orbit are rare."
+    chunks = chunk_text("A", text, max_chars=40, overlap=0)
+    idx = BM25ChunkIndex()
+    idx.build(chunks)
+    meta = MetadataIndex()
+    meta.build([str(i) for i in range(len(chunks))], idx.metadata())
+    allowed = meta.allowed({"heading": ["Space"]})
+    hits = idx.search("cats", k=5, allowed=allowed)
+    assert hits and all(h.chunk.heading == "Space" for h in hits)
+    assert idx.search("cats", k=5, allowed=np.array([], dtype=np.int64)) == []
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from rag.backends.embed import EmbeddingBackend, HashingEmbeddingModel
+from rag.models import ModelRegistry
+
+DOCS = [
+    "Vector databases index dense embeddings for nearest neighbour search.",
+    "BM25 ranks documents by term frequency and inverse document frequency.",
+    "Kubernetes schedules containers across a cluster of nodes.",
+    "The cat sat on the mat while the dog slept by the door.",
+]
+
+
+def test_vectors_are_normalised_and_deterministic() -> None:
+    model = HashingEmbeddingModel(dim=64)
+    a = model.encode_texts(DOCS)
+    assert a.shape == (4, 64) and a.dtype == np.float32
+    assert np.allclose(np.linalg.norm(a, axis=1), 1.0, atol=1e-5)
+    assert np.array_equal(a, HashingEmbeddingModel(dim=64).encode_texts(DOCS))
+    assert not np.allclose(a, HashingEmbeddingModel(dim=64, seed=1).encode_texts(DOCS))
+    assert not model.encode_texts([""]).any()
+
+
+def test_batching_does_not_change_vectors() -> None:
+    whole = HashingEmbeddingModel().encode_texts(DOCS)
+    tiny = HashingEmbeddingModel(batch_bytes=1).encode_texts(DOCS)
+    single = np.vstack([HashingEmbeddingModel().encode_texts([d]) for d in DOCS])
+    assert np.allclose(whole, tiny, atol=1e-6) and np.allclose(whole, single, atol=1e-6)
+
+
+def test_shared_ngrams_make_texts_similar() -> None:
+    v = HashingEmbeddingModel().encode_texts(
+        ["Nearest-neighbour search over embeddings", "embedding nearest neighbor search", *DOCS]
+    )
+    sims = v[1] @ v[2:].T
+    assert float(v[0] @ v[1]) > 0.5
+    assert int(np.argmax(sims)) == 0  # the vector-database document
+
+
+def test_fit_weights_rare_terms_and_leaves_the_shared_model_alone() -> None:
+    model = HashingEmbeddingModel()
+    fitted = model.fit(DOCS + ["the the the"] * 20)
+    assert fitted is not model and model.idf is None and fitted.idf is not None
+    q, kube, cat = fitted.encode_texts(["the kubernetes", DOCS[2], DOCS[3]])
+    assert q @ kube > q @ cat
+
+
+def test_backend_ranks_relevant_document_first() -> None:
+    backend = EmbeddingBackend(HashingEmbeddingModel())
+    backend.build(DOCS, ["vec", "bm25", "k8s", "pets"])
+    assert backend.search("container scheduling on a kubernetes cluster", k=1)[0][0] == "k8s"
+    assert backend.search("inverse document frequency", k=1)[0][0] == "bm25"
+
+
+def test_registry_serves_hashing_without_download() -> None:
+    registry = ModelRegistry()
+    assert isinstance(registry.get("hashing", use_dummy=False).model, HashingEmbeddingModel)
+    assert isinstance(registry.get("hashing", use_dummy=True).model, HashingEmbeddingModel)
+
+
+def test_rejects_bad_parameters() -> None:
+    with pytest.raises(ValueError):
+        HashingEmbeddingModel(projection_nnz=5)
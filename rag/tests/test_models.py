@@ -0,0 +1,104 @@
+import threading
+
+import numpy as np
+
+from rag import retriever
+from rag.backends.embed import DummyEmbeddingModel, EmbeddingBackend, HashingEmbeddingModel
+from rag.backends.hybrid import HybridBackend
+from rag.models import CachedEmbeddingModel, ModelRegistry, QueryEmbeddingCache
+from rag.registry import IndexRegistry
+
+_OPTIONS = {"embedding_model": "test-model", "hybrid_alpha": 0.5, "use_dummy_embeddings": True}
+
+
+def test_each_model_loads_once_even_under_concurrency() -> None:
+    registry = ModelRegistry()
+    got = []
+    threads = [
+        threading.Thread(target=lambda: got.append(registry.get("m", use_dummy=True)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(m) for m in got}) == 1
+    assert registry.get("other", use_dummy=True) is not got[0]
+    assert registry.loaded() == ["m", "other"]
+
+
+def test_hybrid_reuses_the_served_bm25_and_embed_indexes(monkeypatch) -> None:
+    monkeypatch.setattr(retriever, "_REGISTRY", IndexRegistry())
+
+    def current(name: str):
+        with retriever.lease_backend(name, **_OPTIONS) as handle:
+            return handle.backend
+
+    hybrid = current("hybrid")
+    assert isinstance(hybrid, HybridBackend)
+    assert hybrid.bm25 is current("bm25") and hybrid.embed is current("embed")
+    assert hybrid.embed.model is retriever.create_backend("embed", **_OPTIONS).model
+
+    futures = retriever.rebuild_backends(["hybrid"], **_OPTIONS)
+    assert set(futures) == {"bm25", "embed", "hybrid"}
+    for fut in futures.values():
+        fut.result(timeout=10)
+    rebuilt = current("hybrid")
+    assert rebuilt is not hybrid
+    assert rebuilt.bm25 is current("bm25") and rebuilt.embed is current("embed")
+
+
+class _Counting(DummyEmbeddingModel):
+    def __init__(self) -> None:
+        self.encoded: list[str] = []
+
+    def encode_texts(self, texts: list[str]) -> np.ndarray:
+        self.encoded.extend(texts)
+        return super().encode_texts(texts)
+
+
+def test_repeat_queries_skip_the_model() -> None:
+    inner = _Counting()
+    model = CachedEmbeddingModel(inner, "m", QueryEmbeddingCache())
+    first = model.encode_texts(["fast  api"])
+    again = model.encode_texts(["fast api", "other"])
+    assert inner.encoded == ["fast  api", "other"]
+    assert np.array_equal(first[0], again[0])
+    assert np.allclose(np.linalg.norm(again, axis=1), 1.0)
+    assert model.cache.stats()["hits"] == 1 and model.cache.stats()["misses"] == 2
+
+    model.encode_texts([f"doc {i}" for i in range(model.max_batch + 1)])  # build-time batch
+    assert model.cache.stats()["entries"] == 2
+
+
+def test_document_encoding_bypasses_the_query_cache() -> None:
+    inner = _Counting()
+    model = CachedEmbeddingModel(inner, "m", QueryEmbeddingCache())
+    backend = EmbeddingBackend(model)
+    backend.build(["fast api", "slow api"], ["d1", "d2"])  # fewer than max_batch
+    assert model.cache.stats()["entries"] == 0
+    assert backend.search("fast api", k=1)[0][0] == "d1"
+    assert inner.encoded == ["fast api", "slow api", "fast api"]
+    assert model.cache.stats()["entries"] == 1
+
+
+def test_cache_is_bounded_in_bytes_and_keyed_by_model() -> None:
+    cache = QueryEmbeddingCache(max_bytes=3 * (32 * 4 + 1 + QueryEmbeddingCache.ENTRY_OVERHEAD))
+    a = CachedEmbeddingModel(DummyEmbeddingModel(), "a", cache)
+    b = CachedEmbeddingModel(DummyEmbeddingModel(), "b", cache)
+    a.encode_texts(["1", "2", "3"])
+    b.encode_texts(["1"])
+    stats = cache.stats()
+    assert stats["entries"] == 3 and stats["evictions"] == 1 and stats["misses"] == 4
+    assert stats["bytes"] <= stats["max_bytes"]
+    cache.resize(0)
+    assert cache.stats()["entries"] == 0
+
+
+def test_fitted_models_get_their_own_cache_key() -> None:
+    model = CachedEmbeddingModel(HashingEmbeddingModel(dim=32), "hashing", QueryEmbeddingCache())
+    one = model.fit(["alpha beta", "gamma"])
+    two = model.fit(["alpha beta", "gamma"])
+    other = model.fit(["delta"])
+    assert one.key == two.key != other.key != model.key
+    assert CachedEmbeddingModel(DummyEmbeddingModel(), "d", model.cache).fit(["x"]).key == "d"
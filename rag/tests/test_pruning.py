@@ -0,0 +1,52 @@
+import pytest
+
+from rag.backends.bm25 import BM25Backend
+
+_DOCS = [
+    "cat cat cat sat on the mat",
+    "the cat and the dog",
+    "dog dog barks at the mailman",
+    "a bird sings in the tree",
+    "the tree and the cat",
+    "fish swim in the river",
+]
+_IDS = [f"d{i}" for i in range(len(_DOCS))]
+
+
+def _built(**kwargs) -> BM25Backend:
+    b = BM25Backend(**kwargs)
+    b.build(_DOCS, _IDS)
+    return b
+
+
+@pytest.mark.parametrize("method", ["term", "doc"])
+def test_pruning_shrinks_postings_and_keeps_surviving_scores(method) -> None:
+    full, pruned = _built(), _built(prune_keep=0.5, prune_method=method)
+    before, after = full.index_size(), pruned.index_size()
+    assert after["postings"] < before["postings"] and after["bytes"] < before["bytes"]
+    # phrase and boolean matching keep every position, and the size says so
+    assert after["positional_bytes"] == before["positional_bytes"] > 0
+    assert after["bytes"] == after["scoring_bytes"] + after["positional_bytes"]
+    full_scores = dict(full.search("cat", k=6))
+    for doc_id, score in pruned.search("cat", k=6):
+        if score:
+            assert score == pytest.approx(full_scores[doc_id])
+
+
+def test_term_centric_keeps_each_terms_best_documents() -> None:
+    pruned = _built(prune_keep=0.3)
+    assert pruned.search("cat", k=1) == _built().search("cat", k=1)
+    assert pruned.search("dog", k=1)[0][0] == "d2"
+
+
+def test_corpus_stats_describe_the_unpruned_corpus() -> None:
+    assert _built(prune_keep=0.2).corpus_stats() == _built().corpus_stats()
+
+
+def test_invalid_prune_settings() -> None:
+    with pytest.raises(ValueError):
+        BM25Backend(prune_keep=0.0)
+    with pytest.raises(ValueError):
+        BM25Backend(prune_method="random")
+    with pytest.raises(RuntimeError):
+        BM25Backend().prune(0.5)
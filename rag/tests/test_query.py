@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from rag.backends.bm25 import BM25Backend, _tokenize
+from rag.bm25_index import BM25ChunkIndex
+from rag.chunking import chunk_text
+from rag.query import (
+    And,
+    Not,
+    Or,
+    Phrase,
+    PositionalIndex,
+    QuerySyntaxError,
+    Term,
+    difference,
+    intersect,
+    is_structured,
+    parse_query,
+    scoring_terms,
+)
+
+
+def test_parse_precedence_and_phrases() -> None:
+    node = parse_query('cat OR "brown fox" dog NOT (mat OR rug)', _tokenize)
+    assert node == Or(
+        (
+            Term("cat"),
+            And((Phrase(("brown", "fox")), Term("dog"), Not(Or((Term("mat"), Term("rug")))))),
+        )
+    )
+    assert scoring_terms(node) == ["cat", "brown", "fox", "dog"]
+    assert parse_query("e-mail AND x", _tokenize) == And((Phrase(("e", "mail")), Term("x")))
+    assert not is_structured("the quick fox") and is_structured("fox AND dog")
+    for bad in ("cat AND", "(cat", "cat)", "OR dog"):
+        with pytest.raises(QuerySyntaxError):
+            parse_query(bad, _tokenize)
+
+
+def test_galloping_set_operations() -> None:
+    rng = random.Random(3)
+    for _ in range(200):
+        a = sorted(rng.sample(range(500), rng.randint(0, 40)))
+        b = sorted(rng.sample(range(500), rng.randint(0, 300)))
+        assert intersect(a, b) == sorted(set(a) & set(b))
+        assert difference(a, b) == sorted(set(a) - set(b))
+
+
+def test_positional_match_and_bm25_scores_only_survivors() -> None:
+    docs = [
+        "the quick brown fox",
+        "brown quick fox jumps",
+        "the lazy dog sleeps",
+        "quick brown dogs and a fox",
+        "cats sleep on the mat",
+    ]
+    index = PositionalIndex()
+    index.build([_tokenize(d) for d in docs])
+    assert index.match(parse_query('"quick brown"', _tokenize)) == [0, 3]
+    assert index.match(parse_query("fox NOT dogs", _tokenize)) == [0, 1]
+    assert index.match(parse_query("NOT the", _tokenize)) == [1, 3]
+    assert index.match(parse_query("sleeps OR mat", _tokenize)) == [2, 4]
+
+    bm = BM25Backend()
+    bm.build(docs, [f"d{i}" for i in range(len(docs))])
+    hits = bm.search('"quick brown" AND fox', k=5)
+    assert [d for d, _ in hits] == ["d0", "d3"]
+    full = dict(bm.search("quick brown fox", k=5))
+    assert all(score == pytest.approx(full[d]) for d, score in hits)
+    assert bm.search('"brown quick" NOT jumps', k=5) == []
+    assert [d for d, _ in bm.search("(fox)", k=5, allowed=[1, 2])] == ["d1"]
+
+
+def test_chunk_index_phrase_query() -> None:
+    chunks = chunk_text("A", "New York has pizza. York is old. New ideas.", max_chars=20, overlap=0)
+    idx = BM25ChunkIndex()
+    idx.build(chunks)
+    hits = idx.search('"new york"', k=5)
+    assert [h.chunk.text for h in hits] == ["New York has pizza."]
@@ -0,0 +1,104 @@
+import gc
+import threading
+import time
+import weakref
+
+from rag.backends.bm25 import BM25Backend
+from rag.registry import IndexRegistry
+
+
+class _Closable(BM25Backend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _built(*docs: str) -> _Closable:
+    b = _Closable()
+    b.build(list(docs), [f"d{i}" for i in range(len(docs))])
+    return b
+
+
+def test_old_generation_released_after_in_flight_queries_drain() -> None:
+    reg = IndexRegistry()
+    first = _built("cats")
+    assert reg.publish("bm25", first) == 1
+    with reg.lease("bm25") as handle:
+        assert reg.publish("bm25", _built("dogs")) == 2
+        # the pinned generation keeps serving until the lease ends
+        assert handle.generation == 1 and not first.closed
+        assert handle.backend.search("cats", k=1)[0][0] == "d0"
+    assert first.closed
+    with reg.lease("bm25") as handle:
+        assert handle.generation == 2
+    assert reg.generations() == {"bm25": 2}
+
+
+def test_background_rebuild_swaps_while_readers_keep_serving() -> None:
+    reg = IndexRegistry()
+    reg.get_or_build("bm25", lambda: _built("alpha beta", "gamma"))
+    stop = threading.Event()
+    seen: list[int] = []
+    errors: list[BaseException] = []
+
+    def reader() -> None:
+        while not stop.is_set():
+            try:
+                with reg.lease("bm25") as handle:
+                    assert not handle.backend.closed
+                    handle.backend.search("alpha", k=2)
+                    seen.append(handle.generation)
+            except BaseException as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+
+    def slow_build() -> _Closable:
+        time.sleep(0.05)
+        return _built("alpha", "beta", "delta")
+
+    futures = [reg.rebuild("bm25", slow_build) for _ in range(3)]
+    generations = [f.result(timeout=5) for f in futures]
+    time.sleep(0.02)
+    stop.set()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert generations == [2, 3, 4]
+    assert seen and set(seen) <= {1, 2, 3, 4}
+    assert reg.get("bm25") is not None and reg.get("bm25").generation == 4
+
+
+def test_warm_builds_missing_indexes_only() -> None:
+    reg = IndexRegistry()
+    first = _built("cats")
+    reg.publish("bm25", first)
+    assert reg.warm("bm25", lambda: _built("dogs")).result(timeout=5) == 1
+    assert reg.get("bm25").backend is first
+    assert reg.warm("embed", lambda: _built("dogs")).result(timeout=5) == 2
+    assert reg.generations() == {"bm25": 1, "embed": 2}
+
+
+def test_publish_can_freeze_the_heap() -> None:
+    reg = IndexRegistry()
+    reg.freeze_gc = True
+    gc.unfreeze()
+    try:
+        first = _built("cats")
+        garbage = _Closable()
+        garbage.cycle = garbage  # type: ignore[attr-defined]  # only the collector can free it
+        dead, retired = weakref.ref(garbage), weakref.ref(first)
+        del garbage
+        reg.publish("bm25", first)
+        assert gc.get_freeze_count() > 0 and dead() is None
+        del first
+        reg.publish("bm25", _built("dogs"))
+        # a frozen generation is still freed by reference counting once swapped out
+        assert retired() is None
+    finally:
+        gc.unfreeze()
@@ -0,0 +1,83 @@
+import time
+from collections.abc import Sequence
+
+import numpy as np
+import pytest
+
+from rag.backends.bm25 import BM25Backend
+from rag.rerank import ProximityScorer, Reranker, RerankingBackend, get_scorer
+
+TEXTS = {
+    "far": "reset the router and later your password may need a reset",
+    "near": "how to reset your password in three steps",
+    "none": "pizza dough recipes",
+    "phrase": "steps: reset password now",
+}
+
+
+class LengthScorer:
+    """Longer documents first; records every batch it is asked to score."""
+
+    def __init__(self, delay_s: float = 0.0) -> None:
+        self.delay_s = delay_s
+        self.batches: list[int] = []
+
+    def score(self, query: str, docs: Sequence[str]) -> np.ndarray:
+        time.sleep(self.delay_s)
+        self.batches.append(len(docs))
+        return np.array([len(d) for d in docs], dtype=np.float32)
+
+
+def test_proximity_prefers_covered_close_and_verbatim_terms() -> None:
+    scores = ProximityScorer().score("reset password", list(TEXTS.values()))
+    by_id = dict(zip(TEXTS, scores, strict=True))
+    assert by_id["none"] == 0
+    assert by_id["near"] > by_id["far"] > 0
+    assert by_id["phrase"] > by_id["near"]
+    assert not ProximityScorer().score("", ["anything"]).any()
+
+
+def test_rerank_sorts_scored_prefix_and_keeps_rest_in_order() -> None:
+    results = [(f"d{i}", 10.0 - i) for i in range(10)]
+    text = {f"d{i}": "x" * (i % 4) for i in range(10)}
+    scorer = LengthScorer()
+    out = Reranker(scorer, top_m=6, batch_size=4).rerank("q", results, text.__getitem__)
+    scored = ["d3", "d2", "d1", "d5", "d0", "d4"]  # by length, ties in first-stage order
+    assert [d for d, _ in out.results] == scored + [f"d{i}" for i in range(6, 10)]
+    assert [s for _, s in out.results] == [3, 2, 1, 1, 0, 0] + [None] * 4  # the scorer's
+    assert scorer.batches == [4, 2]
+    assert (out.candidates, out.scored, out.exhausted) == (6, 6, False)
+
+
+def test_budget_stops_between_batches() -> None:
+    results = [(f"d{i}", 1.0) for i in range(8)]
+    text = {d: d for d, _ in results}
+    scorer = LengthScorer(delay_s=0.02)
+    reranker = Reranker(scorer, top_m=8, batch_size=2, budget_ms=30)
+    out = reranker.rerank("q", results, text.__getitem__)
+    # after one 20ms batch the next one no longer fits the 30ms budget
+    assert scorer.batches == [2] and out.scored == 2 and out.exhausted
+    assert out.results == [("d0", 2.0), ("d1", 2.0)] + [(d, None) for d, _ in results[2:]]
+
+    scorer.batches.clear()
+    out = reranker.rerank("q", results, text.__getitem__, budget_ms=1e-6)
+    assert scorer.batches == [] and out.scored == 0
+    assert out.results == [(d, None) for d, _ in results]
+
+
+def test_reranking_backend_wraps_first_stage() -> None:
+    docs = list(TEXTS.values())
+    backend = RerankingBackend(BM25Backend(), Reranker(ProximityScorer(), top_m=4))
+    backend.build(docs, list(TEXTS))
+    hits = backend.search("reset password", k=2)
+    assert [d for d, _ in hits] == ["phrase", "near"] and hits[0][1] > hits[1][1]
+    assert backend.search("reset password", k=2, allowed=[0])[0][0] == "far"
+
+
+def test_scorers_are_shared_and_validated() -> None:
+    assert get_scorer("proximity", use_dummy=False) is get_scorer("proximity", use_dummy=False)
+    assert isinstance(
+        get_scorer("cross-encoder/ms-marco-MiniLM-L-6-v2", use_dummy=True), ProximityScorer
+    )
+    with pytest.raises(ValueError):
+        Reranker(ProximityScorer(), top_m=0)
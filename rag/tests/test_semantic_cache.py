@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from rag.backends.embed import HashingEmbeddingModel
+from rag.semantic_cache import SemanticCache
+
+RESULTS = [("d1", 2.0), ("d2", 1.0)]
+
+
+def test_paraphrase_hits_and_unrelated_query_misses() -> None:
+    cache = SemanticCache(HashingEmbeddingModel(), threshold=0.8)
+    cache.store("bm25", 1, "how do I reset my password", RESULTS)
+    hit = cache.lookup("bm25", 1, "How do I reset my password?")
+    assert hit is not None and hit.results == RESULTS
+    assert hit.query == "how do I reset my password" and hit.similarity >= 0.8
+    assert cache.lookup("bm25", 1, "kubernetes pod scheduling") is None
+    assert cache.lookup("embed", 1, "how do I reset my password") is None  # other scope
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_newer_generation_invalidates_the_scope() -> None:
+    cache = SemanticCache(HashingEmbeddingModel(), threshold=0.9)
+    cache.store("bm25", 1, "reset password", RESULTS)
+    cache.store("bm25", 2, "other query", [])  # a lease on the new index
+    assert cache.lookup("bm25", 2, "reset password") is None
+    cache.store("bm25", 1, "reset password", RESULTS)  # late result from the old index
+    assert cache.lookup("bm25", 2, "reset password") is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 1
+
+
+def test_bounded_with_lru_eviction() -> None:
+    cache = SemanticCache(HashingEmbeddingModel(dim=64), threshold=0.99, max_entries=2)
+    cache.store("s", 0, "alpha query", [("a", 1.0)])
+    cache.store("s", 0, "bravo query", [("b", 1.0)])
+    assert cache.lookup("s", 0, "alpha query") is not None  # alpha is now most recent
+    cache.store("s", 0, "charlie query", [("c", 1.0)])
+    assert cache.lookup("s", 0, "bravo query") is None
+    assert cache.lookup("s", 0, "alpha query") is not None
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+
+
+def test_precomputed_vectors_and_validation() -> None:
+    cache = SemanticCache(HashingEmbeddingModel(dim=8), threshold=0.5)
+    vec = np.eye(8, dtype=np.float32)[0]
+    cache.store("s", 0, "q", RESULTS, vec)
+    assert cache.lookup("s", 0, "anything", vec) is not None
+    with pytest.raises(ValueError):
+        SemanticCache(HashingEmbeddingModel(), threshold=1.5)
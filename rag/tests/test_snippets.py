@@ -0,0 +1,22 @@
+from rag.snippets import SnippetIndex
+
+
+def test_snippet_picks_matching_window_with_highlights():
+    filler = "Nothing relevant is said in this sentence. " * 40
+    doc = filler + "The orbital period of Mars is 687 days. Mars has two moons. " + filler
+    index = SnippetIndex(max_chars=300)
+    index.build([doc], ["mars"])
+    snip = index.snippet("mars", doc, "mars moons", max_chars=80)
+    assert len(snip.text) <= 80
+    assert doc[snip.start : snip.end] == snip.text
+    marked = [snip.text[s:e].lower() for s, e in snip.highlights]
+    assert marked.count("mars") == 2 and "moons" in marked
+    assert not snip.text[0].isspace() and not snip.text[-1].isspace()
+
+
+def test_snippet_without_matches_falls_back_to_lead():
+    index = SnippetIndex()
+    index.build(["Alpha beta gamma delta."], ["d"])
+    snip = index.snippet("d", "Alpha beta gamma delta.", "zeta", max_chars=11)
+    assert snip.start == 0 and snip.text == "Alpha beta" and snip.highlights == []
+    assert index.snippet("d", "Alpha", "alpha", max_chars=0).text == ""
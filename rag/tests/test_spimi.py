@@ -0,0 +1,76 @@
+import json
+import random
+import sys
+
+import numpy as np
+import pytest
+
+from rag import spimi as spimi_mod
+from rag.backends.bm25 import BM25Backend
+from rag.backends.spimi import SpimiBackend
+from rag.spimi import SpimiIndex, build_spimi_index, iter_ndjson
+
+_WORDS = "cat dog fox pizza api fast slow red blue green tree river stone cloud".split()
+
+
+def _corpus(n: int, seed: int = 0) -> list[tuple[str, str]]:
+    rng = random.Random(seed)
+    return [
+        (f"d{i}", " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 12)))) for i in range(n)
+    ]
+
+
+def test_rss_falls_back_without_proc_or_resource(monkeypatch) -> None:
+    def no_proc(*args, **kwargs):
+        raise OSError("no /proc")
+
+    monkeypatch.setattr(spimi_mod, "open", no_proc, raising=False)
+    assert spimi_mod._rss_bytes() > 0  # getrusage peak
+    monkeypatch.setitem(sys.modules, "resource", None)  # as on Windows
+    assert spimi_mod._rss_bytes() == 0
+
+
+@pytest.mark.parametrize("fan_in", [2, 64])
+def test_spilled_runs_merge_to_the_same_ranking_as_bm25(tmp_path, fan_in) -> None:
+    docs = _corpus(300)
+    stats = build_spimi_index(iter(docs), tmp_path, memory_limit_bytes=4096, fan_in=fan_in)
+    assert stats.runs > 2 and stats.docs == 300 and stats.peak_rss_bytes > 0
+    assert not (tmp_path / "runs").exists()
+    assert json.loads((tmp_path / "meta.json").read_text())["runs"] == stats.runs
+
+    spimi = SpimiBackend.open(tmp_path)
+    bm25 = BM25Backend()
+    bm25.build([t for _, t in docs], [d for d, _ in docs])
+    for query in ["cat", "red fox", "cloud river stone", "missing"]:
+        got, want = spimi.search(query, k=10), bm25.search(query, k=10)
+        assert [d for d, _ in got] == [d for d, _ in want]
+        assert [s for _, s in got] == pytest.approx([s for _, s in want])
+
+
+def test_postings_stay_sorted_across_runs(tmp_path) -> None:
+    build_spimi_index(iter(_corpus(200, seed=1)), tmp_path, memory_limit_bytes=2048)
+    index = SpimiIndex(tmp_path)
+    for term in _WORDS:
+        docs = index.postings(term)["doc"]
+        assert len(docs) and np.all(np.diff(docs.astype(np.int64)) > 0)
+
+
+def test_allowed_restricts_results_and_tmpdir_is_cleaned(tmp_path) -> None:
+    backend = SpimiBackend(memory_limit_bytes=1024)
+    backend.build(["cat sat on the mat", "cat cat", "dog", "bird", "fish"], list("abcde"))
+    assert backend.stats is not None and backend.stats.runs >= 1
+    assert [d for d, _ in backend.search("cat", k=3)] == ["b", "a", "c"]
+    assert [d for d, _ in backend.search("cat", k=5, allowed=[0, 2])] == ["a", "c"]
+    path = backend.path
+    backend.close()
+    assert path is not None and not path.exists()
+    with pytest.raises(RuntimeError):
+        backend.search("cat")
+
+
+def test_iter_ndjson_streams_records(tmp_path) -> None:
+    src = tmp_path / "docs.ndjson"
+    src.write_text('{"id": "x", "text": "hello"}\n\n{"id": 2, "text": "world"}\n')
+    assert list(iter_ndjson(src)) == [("x", "hello"), ("2", "world")]
+    with pytest.raises(ValueError):
+        build_spimi_index([("bad\nid", "t")], tmp_path / "idx")
@@ -0,0 +1,63 @@
+from rag.backends.bm25 import BM25Backend
+from rag.backends.embed import EmbeddingBackend, HashingEmbeddingModel
+from rag.backends.hybrid import HybridBackend
+from rag.deadline import Deadline
+from rag.timing import StageTimer, set_tracing, span, stage, timed
+
+DOCS = ["the quick brown fox", "lazy dogs sleep", "a fox and a dog"]
+
+
+def _hybrid() -> HybridBackend:
+    bm25, embed = BM25Backend(), EmbeddingBackend(HashingEmbeddingModel(dim=32))
+    hybrid = HybridBackend(bm25, embed)
+    hybrid.build(DOCS)
+    return hybrid
+
+
+def test_stages_are_collected_only_inside_timed() -> None:
+    hybrid = _hybrid()
+    with timed() as timer:
+        hybrid.search("fox", k=2)
+        with stage("bm25.score"):
+            pass
+    assert list(timer.stages)[:3] == ["bm25.tokenize", "bm25.score", "bm25.topk"]
+    assert {"embed.encode", "embed.score", "hybrid.fusion"} <= timer.stages.keys()
+    hybrid.search("fox", k=2)
+    assert len(timer._samples) == len(timer.stages) + 1  # repeats are summed, nothing added after
+
+
+def test_worker_thread_legs_report_into_the_callers_timer() -> None:
+    hybrid = _hybrid()
+    with timed() as timer:
+        hybrid.search("fox", k=2, deadline=Deadline(5000))
+    assert {"embed.encode", "bm25.score", "hybrid.fusion"} <= timer.stages.keys()
+
+
+def test_server_timing_header_value() -> None:
+    timer = StageTimer()
+    timer.add("bm25.score", 0.0015)
+    timer.add("bm25.score", 0.0005)
+    timer.add("search.hydrate", 0.00025)
+    assert timer.server_timing() == "bm25.score;dur=2.000, search.hydrate;dur=0.250"
+
+
+def test_stages_become_child_spans_while_tracing() -> None:
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    import rag.timing
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    assert set_tracing(True)
+    rag.timing._tracer = provider.get_tracer("test")
+    try:
+        with span("search"), stage("bm25.score"):
+            pass
+    finally:
+        set_tracing(False)
+    child, parent = exporter.get_finished_spans()
+    assert (child.name, parent.name) == ("bm25.score", "search")
+    assert child.parent is not None and child.parent.span_id == parent.context.span_id
@@ -0,0 +1,115 @@
+"""Per-stage timing of a search, for metrics, tracing and ``Server-Timing``.
+
+Code on the search path wraps each stage in ``with stage("bm25.score"):``.
+While a :class:`StageTimer` is active in the current context (see
+:func:`timed`) the stage's wall time is added to it; while tracing is on
+(:func:`set_tracing`) the stage also runs in an OpenTelemetry child span.
+With neither, :func:`stage` returns a shared no-op context manager, so an
+untimed stage costs one context-variable lookup.
+
+Stage names are a fixed, low-cardinality set of ``<component>.<stage>``
+strings. Worker threads started for a search should run in a copy of the
+caller's context (:func:`contextvars.copy_context`) to report into its timer.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from types import TracebackType
+from typing import Any
+
+_TIMER: ContextVar[StageTimer | None] = ContextVar("rag_stage_timer", default=None)
+_NULL: AbstractContextManager[None] = nullcontext()
+_tracer: Any = None  # opentelemetry Tracer while tracing is on
+
+
+class StageTimer:
+    """Accumulated wall time per stage, in first-seen order."""
+
+    def __init__(self) -> None:
+        # list.append is atomic, so stages on worker threads need no lock
+        self._samples: list[tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self._samples.append((name, seconds))
+
+    @property
+    def stages(self) -> dict[str, float]:
+        """Seconds per stage name, summed over repeats."""
+        totals: dict[str, float] = {}
+        for name, seconds in list(self._samples):
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def server_timing(self) -> str:
+        """The stages as a ``Server-Timing`` header value (durations in ms)."""
+        return ", ".join(f"{name};dur={s * 1000:.3f}" for name, s in self.stages.items())
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start", "span")
+
+    def __init__(self, timer: StageTimer | None, name: str) -> None:
+        self.timer = timer
+        self.name = name
+        self.span: Any = None
+
+    def __enter__(self) -> None:
+        if _tracer is not None:
+            self.span = _tracer.start_as_current_span(self.name)
+            self.span.__enter__()
+        self.start = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        elapsed = time.perf_counter() - self.start
+        if self.timer is not None:
+            self.timer._samples.append((self.name, elapsed))
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+
+
+def stage(name: str) -> AbstractContextManager[None]:
+    """Time the enclosed block as stage *name* (a no-op unless timing or tracing)."""
+    timer = _TIMER.get()
+    if timer is None and _tracer is None:
+        return _NULL
+    return _Stage(timer, name)
+
+
+@contextmanager
+def timed() -> Iterator[StageTimer]:
+    """Collect the stages run in this context (and copies of it) into a new timer."""
+    timer = StageTimer()
+    token = _TIMER.set(timer)
+    try:
+        yield timer
+    finally:
+        _TIMER.reset(token)
+
+
+def span(name: str) -> AbstractContextManager[Any]:
+    """An OpenTelemetry span that stages nest under; a no-op while tracing is off."""
+    return _NULL if _tracer is None else _tracer.start_as_current_span(name)
+
+
+def set_tracing(enabled: bool) -> bool:
+    """Emit a span per stage from now on; False if OpenTelemetry isn't installed."""
+    global _tracer
+    if not enabled:
+        _tracer = None
+        return False
+    try:
+        from opentelemetry import trace
+    except ImportError:  # pragma: no cover - OTEL optional
+        _tracer = None
+        return False
+    _tracer = trace.get_tracer("rag")
+    return True
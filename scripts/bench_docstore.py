@@ -0,0 +1,101 @@
+"""Measure memory vs. hydration latency of the compressed document store."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# ensure repo root on path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from rag.docstore import DocStore, write_docstore
+
+
+def load_docs(corpus: Path, scale: int) -> list[tuple[str, str]]:
+    base = [(p.stem, p.read_text(encoding="utf-8")) for p in sorted(corpus.glob("*.txt"))]
+    return [(f"{doc_id}-{i}" if i else doc_id, text) for i in range(scale) for doc_id, text in base]
+
+
+def bench(
+    docs: list[tuple[str, str]],
+    *,
+    codec: str,
+    block_bytes: int,
+    cache_sizes: list[int],
+    lookups: int,
+    seed: int,
+) -> dict[str, object]:
+    rng = random.Random(seed)
+    ids = [d for d, _ in docs]
+    # Skewed access: a few documents are hit far more often than the rest
+    weights = [1.0 / (rank + 1) for rank in range(len(ids))]
+    rng.shuffle(weights)
+    pattern = rng.choices(ids, weights=weights, k=lookups)
+
+    raw_bytes = sum(sys.getsizeof(t) for _, t in docs)
+    runs: list[dict[str, object]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "docs.store"
+        write_docstore(path, docs, block_bytes=block_bytes, codec=codec)
+        for cache_bytes in cache_sizes:
+            with DocStore(path, cache_bytes=cache_bytes) as store:
+                lat = np.empty(len(pattern))
+                for n, doc_id in enumerate(pattern):
+                    t0 = time.perf_counter()
+                    store[doc_id]
+                    lat[n] = time.perf_counter() - t0
+                stats = store.stats()
+            total = stats["hits"] + stats["misses"]
+            runs.append(
+                {
+                    "cache_bytes": cache_bytes,
+                    "resident_bytes": stats["cached_bytes"],
+                    "hit_rate": stats["hits"] / total if total else 0.0,
+                    "p50_us": float(np.percentile(lat, 50) * 1e6),
+                    "p99_us": float(np.percentile(lat, 99) * 1e6),
+                }
+            )
+        file_bytes = path.stat().st_size
+    return {
+        "docs": len(docs),
+        "codec": codec,
+        "block_bytes": block_bytes,
+        "dict_bytes": raw_bytes,
+        "file_bytes": file_bytes,
+        "runs": runs,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the compressed document store")
+    parser.add_argument("--corpus", type=Path, default=Path("data/corpus"))
+    parser.add_argument("--scale", type=int, default=20, help="replicate the corpus N times")
+    parser.add_argument("--codec", choices=["zlib", "lzma", "none"], default="zlib")
+    parser.add_argument("--block-bytes", type=int, default=64 * 1024)
+    parser.add_argument(
+        "--cache-bytes",
+        default="0,262144,1048576,8388608",
+        help="Comma-separated LRU budgets to compare",
+    )
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1337)
+    args = parser.parse_args()
+    report = bench(
+        load_docs(args.corpus, args.scale),
+        codec=args.codec,
+        block_bytes=args.block_bytes,
+        cache_sizes=[int(c) for c in args.cache_bytes.split(",")],
+        lookups=args.lookups,
+        seed=args.seed,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Measure search latency while an index rebuild runs in the background."""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import sys
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# ensure repo root on path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from rag.backends.bm25 import BM25Backend
+from rag.registry import IndexRegistry, low_priority_process_pool
+
+
+def load_corpus(corpus: Path, scale: int) -> tuple[list[str], list[str]]:
+    base = [(p.stem, p.read_text(encoding="utf-8")) for p in sorted(corpus.glob("*.txt"))]
+    ids = [f"{d}-{i}" for i in range(scale) for d, _ in base]
+    texts = [t for _, t in base for _ in range(scale)]
+    return texts, ids
+
+
+def build_bm25(texts: list[str], ids: list[str]) -> BM25Backend:
+    backend = BM25Backend()
+    backend.build(texts, ids)
+    return backend
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark search p99 during hot-swap rebuilds")
+    parser.add_argument("--corpus", type=Path, default=Path("data/corpus"))
+    parser.add_argument("--queries", type=Path, default=Path("data/queries.jsonl"))
+    parser.add_argument("--scale", type=int, default=100, help="replicate the corpus N times")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument(
+        "--executor",
+        choices=["thread", "process"],
+        default="process",
+        help="where rebuilds run; process keeps index building off the serving GIL",
+    )
+    args = parser.parse_args()
+
+    texts, ids = load_corpus(args.corpus, args.scale)
+    queries = [json.loads(line)["q"] for line in args.queries.read_text().splitlines() if line]
+
+    build = functools.partial(build_bm25, texts, ids)
+    executor: Executor
+    if args.executor == "process":
+        executor = low_priority_process_pool()
+    else:
+        executor = ThreadPoolExecutor(1)
+    registry = IndexRegistry(executor)
+    registry.get_or_build("bm25", build)
+
+    def run(rebuilding: bool) -> dict[str, float]:
+        lat: list[float] = []
+        swaps = 0
+        pending = registry.rebuild("bm25", build) if rebuilding else None
+        end = time.perf_counter() + args.seconds
+        n = 0
+        while time.perf_counter() < end:
+            if pending is not None and pending.done():
+                pending.result()
+                swaps += 1
+                pending = registry.rebuild("bm25", build)
+            t0 = time.perf_counter()
+            with registry.lease("bm25") as handle:
+                handle.backend.search(queries[n % len(queries)], args.k)
+            lat.append(time.perf_counter() - t0)
+            n += 1
+        if pending is not None:
+            pending.result()
+        arr = np.asarray(lat) * 1e3
+        return {
+            "queries": len(lat),
+            "p50_ms": float(np.percentile(arr, 50)),
+            "p99_ms": float(np.percentile(arr, 99)),
+            "swaps": swaps,
+        }
+
+    print(
+        json.dumps(
+            {
+                "docs": len(texts),
+                "executor": args.executor,
+                "steady": run(False),
+                "rebuilding": run(True),
+            },
+            indent=2,
+        )
+    )
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
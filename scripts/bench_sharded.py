@@ -0,0 +1,75 @@
+"""Measure how sharded BM25 search scales with the number of worker processes."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# ensure repo root on path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from rag.backends.base import RetrievalBackend
+from rag.backends.bm25 import BM25Backend
+from rag.backends.sharded import ShardedBackend
+
+
+def load_corpus(corpus: Path, scale: int) -> tuple[list[str], list[str]]:
+    base = [(p.stem, p.read_text(encoding="utf-8")) for p in sorted(corpus.glob("*.txt"))]
+    ids = [f"{d}-{i}" for i in range(scale) for d, _ in base]
+    texts = [t for _ in range(scale) for _, t in base]
+    return texts, ids
+
+
+def time_queries(
+    backend: RetrievalBackend, queries: list[str], k: int
+) -> tuple[list[list[tuple[str, float]]], np.ndarray]:
+    results, lat = [], np.empty(len(queries))
+    for n, q in enumerate(queries):
+        t0 = time.perf_counter()
+        results.append(backend.search(q, k))
+        lat[n] = time.perf_counter() - t0
+    return results, lat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ShardedBackend scaling")
+    parser.add_argument("--corpus", type=Path, default=Path("data/corpus"))
+    parser.add_argument("--queries", type=Path, default=Path("data/queries.jsonl"))
+    parser.add_argument("--scale", type=int, default=400, help="replicate the corpus N times")
+    parser.add_argument("--shards", default=None, help="Comma-separated shard counts")
+    parser.add_argument("--partition", choices=["hash", "range"], default="hash")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    texts, ids = load_corpus(args.corpus, args.scale)
+    queries = [json.loads(line)["q"] for line in args.queries.read_text().splitlines() if line]
+    cpus = os.cpu_count() or 1
+    counts = [int(s) for s in args.shards.split(",")] if args.shards else [1, 2, 4, cpus]
+
+    base = BM25Backend()
+    base.build(texts, ids)
+    expected, base_lat = time_queries(base, queries, args.k)
+    rows = [{"shards": 0, "mean_ms": float(base_lat.mean() * 1e3), "speedup": 1.0, "exact": True}]
+    for n in sorted(set(counts)):
+        with ShardedBackend(BM25Backend, n, partition=args.partition) as backend:
+            backend.build(texts, ids)
+            got, lat = time_queries(backend, queries, args.k)
+        rows.append(
+            {
+                "shards": n,
+                "mean_ms": float(lat.mean() * 1e3),
+                "p99_ms": float(np.percentile(lat, 99) * 1e3),
+                "speedup": float(base_lat.mean() / lat.mean()),
+                "exact": got == expected,
+            }
+        )
+    print(json.dumps({"docs": len(texts), "cpus": cpus, "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
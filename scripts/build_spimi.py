@@ -0,0 +1,49 @@
+"""Build an on-disk SPIMI index in bounded memory and report peak RSS."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections.abc import Iterator
+from dataclasses import asdict
+from pathlib import Path
+
+# ensure repo root on path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from rag.spimi import SpimiIndex, build_spimi_index, iter_ndjson
+
+
+def iter_corpus(corpus: Path, scale: int) -> Iterator[tuple[str, str]]:
+    """Yield the ``*.txt`` corpus replicated *scale* times without materialising it."""
+    base = [(p.stem, p.read_text(encoding="utf-8")) for p in sorted(corpus.glob("*.txt"))]
+    for i in range(scale):
+        for doc_id, text in base:
+            yield f"{doc_id}-{i}", text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a SPIMI index larger than RAM")
+    parser.add_argument("out", type=Path, help="index directory")
+    parser.add_argument("--corpus", type=Path, default=Path("data/corpus"))
+    parser.add_argument("--ndjson", type=Path, help="stream {id, text} records instead")
+    parser.add_argument("--scale", type=int, default=100, help="replicate the corpus N times")
+    parser.add_argument("--memory-mb", type=float, default=256.0, help="run dictionary ceiling")
+    parser.add_argument("--fan-in", type=int, default=64)
+    parser.add_argument("--query", default="", help="optionally search the built index")
+    args = parser.parse_args()
+
+    docs = iter_ndjson(args.ndjson) if args.ndjson else iter_corpus(args.corpus, args.scale)
+    stats = build_spimi_index(
+        docs, args.out, memory_limit_bytes=int(args.memory_mb * 2**20), fan_in=args.fan_in
+    )
+    report = asdict(stats)
+    report["peak_rss_mb"] = round(stats.peak_rss_bytes / 2**20, 1)
+    if args.query:
+        index = SpimiIndex(args.out)
+        report["top"] = [index.ids[i] for i in index.search(args.query, k=5)]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
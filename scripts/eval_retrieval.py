@@ -8,6 +8,7 @@ import os
 import random
 import subprocess
 import sys
+import time
 from collections.abc import Sequence
 from pathlib import Path
 from typing import Any, cast
@@ -17,7 +18,15 @@ import numpy as np
 # ensure repo root on path
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 from fastapi_app.app.config import settings
-from rag.retriever import get_backend
+from rag.backends.base import RetrievalBackend
+from rag.backends.bm25 import PRUNE_METHODS, BM25Backend
+from rag.backends.cascade import CascadeBackend
+from rag.backends.embed import EmbeddingBackend
+from rag.backends.hybrid import HybridBackend
+from rag.models import get_embedding_model
+from rag.rerank import Reranker, RerankingBackend, get_scorer
+from rag.retriever import BACKEND_NAMES, create_backend
+from rag.semantic_cache import SemanticCache
 
 METRICS_KS = [1, 3, 5, 10]
 
@@ -53,27 +62,22 @@ def load_queries(path: Path) -> list[dict[str, object]]:
     return queries
 
 
-def evaluate(backend_name: str, k: int, seed: int, manifest_path: Path) -> dict[str, object]:
-    set_deterministic(seed)
-    texts, ids = load_corpus(manifest_path)
-    backend = get_backend(
-        backend_name,
-        embedding_model=settings.embedding_model,
-        hybrid_alpha=settings.hybrid_alpha,
-        use_dummy_embeddings=settings.use_dummy_embeddings,
-    )
-    backend.build(texts, ids, seed=seed)
-    queries = load_queries(manifest_path.parent / "queries.jsonl")
-
+def run_queries(
+    backend: RetrievalBackend, queries: list[dict[str, object]], k: int
+) -> tuple[dict[str, float], list[float]]:
+    """Search every query; return quality metrics and per-query latencies (ms)."""
     recall_counts = {m: 0 for m in METRICS_KS}
     mrr_total = 0.0
     ndcg_total = 0.0
+    latencies: list[float] = []
 
     for q in queries:
         query_text = str(q["q"])
         rel_ids = cast(Sequence[Any], q["relevant_ids"])
         relevant = [str(r) for r in rel_ids]
+        start = time.perf_counter()
         results = backend.search(query_text, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
         retrieved_ids = [doc_id for doc_id, _ in results]
 
         for m in METRICS_KS:
@@ -97,37 +101,458 @@ def evaluate(backend_name: str, k: int, seed: int, manifest_path: Path) -> dict[
     metrics = {f"recall@{m}": recall_counts[m] / n for m in METRICS_KS}
     metrics["MRR"] = mrr_total / n
     metrics["NDCG@10"] = ndcg_total / n
+    return metrics, latencies
+
+
+def _latency_summary(latencies: list[float]) -> dict[str, float]:
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_ms": float(np.mean(latencies)),
+    }
+
+
+def evaluate_pruning(
+    texts: list[str],
+    ids: list[str],
+    queries: list[dict[str, object]],
+    k: int,
+    keeps: Sequence[float],
+    method: str,
+) -> list[dict[str, object]]:
+    """Index size, latency and quality of BM25 pruned to each *keeps* ratio vs unpruned."""
+    rows: list[dict[str, object]] = []
+    base_bytes = 0
+    for keep in [1.0, *keeps]:
+        backend = BM25Backend(prune_keep=keep, prune_method=method)
+        backend.build(texts, ids)
+        size = backend.index_size()
+        base_bytes = base_bytes or size["bytes"]
+        run_queries(backend, queries[:5], k)  # warm up
+        metrics, latencies = run_queries(backend, queries, k)
+        rows.append(
+            {
+                "keep": keep,
+                "method": method if keep < 1 else None,
+                "postings": size["postings"],
+                "index_bytes": size["bytes"],
+                "scoring_bytes": size["scoring_bytes"],
+                "size_ratio": size["bytes"] / base_bytes if base_bytes else 1.0,
+                "latency": _latency_summary(latencies),
+                "metrics": metrics,
+            }
+        )
+    return rows
+
+
+def evaluate_models(
+    texts: list[str],
+    ids: list[str],
+    queries: list[dict[str, object]],
+    k: int,
+    models: Sequence[str],
+) -> list[dict[str, object]]:
+    """Quality, encode throughput and query latency of the embed backend per model.
+
+    A model that can't be loaded here (e.g. sentence-transformers missing) is
+    reported with its error instead of failing the whole run.
+    """
+    rows: list[dict[str, object]] = []
+    total_bytes = sum(len(t.encode()) for t in texts)
+    for name in models:
+        try:
+            backend = EmbeddingBackend(get_embedding_model(name, use_dummy=False))
+            start = time.perf_counter()
+            backend.build(texts, ids)
+            build_s = time.perf_counter() - start
+        except Exception as exc:  # noqa: BLE001 - report and move on
+            rows.append({"model": name, "error": f"{type(exc).__name__}: {exc}"})
+            continue
+        run_queries(backend, queries[:5], k)  # warm up
+        metrics, latencies = run_queries(backend, queries, k)
+        rows.append(
+            {
+                "model": name,
+                "build_s": build_s,
+                "docs_per_s": len(texts) / build_s if build_s else 0.0,
+                "mb_per_s": total_bytes / build_s / 1e6 if build_s else 0.0,
+                "latency": _latency_summary(latencies),
+                "metrics": metrics,
+            }
+        )
+    return rows
+
+
+def evaluate_cascade(
+    texts: list[str],
+    ids: list[str],
+    queries: list[dict[str, object]],
+    k: int,
+    candidates: Sequence[int],
+    budgets_ms: Sequence[float] = (),
+) -> list[dict[str, object]]:
+    """Cascade quality and latency per candidate count (and budget) vs full hybrid.
+
+    ``recall_vs_hybrid`` is the fraction of full hybrid's top-k that the
+    cascade also returns; both share one BM25 and one embedding index.
+    """
+    bm25 = BM25Backend()
+    bm25.build(texts, ids)
+    embed = EmbeddingBackend(
+        get_embedding_model(settings.embedding_model, use_dummy=settings.use_dummy_embeddings)
+    )
+    embed.build(texts, ids)
+    hybrid = HybridBackend(bm25, embed, alpha=settings.hybrid_alpha)
+    run_queries(hybrid, queries[:5], k)  # warm up
+    metrics, latencies = run_queries(hybrid, queries, k)
+    reference = {str(q["q"]): {d for d, _ in hybrid.search(str(q["q"]), k=k)} for q in queries}
+    rows: list[dict[str, object]] = [
+        {"backend": "hybrid", "latency": _latency_summary(latencies), "metrics": metrics}
+    ]
+    settings_grid = [(n, None) for n in candidates] + [
+        (max(candidates, default=200), b) for b in budgets_ms
+    ]
+    for n, budget in settings_grid:
+        cascade = CascadeBackend(
+            bm25, embed, alpha=settings.hybrid_alpha, candidates=n, budget_ms=budget
+        )
+        run_queries(cascade, queries[:5], k)
+        metrics, latencies = run_queries(cascade, queries, k)
+        overlap = [
+            len(reference[str(q["q"])] & {d for d, _ in cascade.search(str(q["q"]), k=k)})
+            / max(1, len(reference[str(q["q"])]))
+            for q in queries
+        ]
+        rows.append(
+            {
+                "backend": "cascade",
+                "candidates": n,
+                "budget_ms": budget,
+                "recall_vs_hybrid": float(np.mean(overlap)),
+                "latency": _latency_summary(latencies),
+                "metrics": metrics,
+            }
+        )
+    return rows
+
+
+def evaluate_rerank(
+    backend: RetrievalBackend,
+    texts: list[str],
+    ids: list[str],
+    queries: list[dict[str, object]],
+    k: int,
+    scorer: str,
+    candidates: Sequence[int],
+    budgets_ms: Sequence[float] = (),
+    batch_size: int = 16,
+) -> list[dict[str, object]]:
+    """Quality and latency of *backend* re-ranked by *scorer* per top-M (and budget).
+
+    The first row is the backend alone; latencies include the first-stage search.
+    """
+    model = get_scorer(scorer, use_dummy=settings.use_dummy_embeddings)
+    docs = dict(zip(ids, texts, strict=True))
+    run_queries(backend, queries[:5], k)  # warm up
+    metrics, latencies = run_queries(backend, queries, k)
+    rows: list[dict[str, object]] = [
+        {"top_m": 0, "latency": _latency_summary(latencies), "metrics": metrics}
+    ]
+    grid = [(m, None) for m in candidates or [50]] + [
+        (max(candidates, default=50), b) for b in budgets_ms
+    ]
+    for top_m, budget in grid:
+        reranker = Reranker(model, top_m=top_m, batch_size=batch_size, budget_ms=budget)
+        reranked = RerankingBackend(backend, reranker, docs)
+        run_queries(reranked, queries[:5], k)
+        metrics, latencies = run_queries(reranked, queries, k)
+        rows.append(
+            {
+                "top_m": top_m,
+                "budget_ms": budget,
+                "scorer": scorer,
+                "latency": _latency_summary(latencies),
+                "metrics": metrics,
+            }
+        )
+    return rows
+
+
+def _paraphrases(query: str, rng: random.Random) -> list[str]:
+    """Cheap rewordings that should hit the cache: filler words, punctuation, word order."""
+    words = query.split()
+    shuffled = words[:]
+    rng.shuffle(shuffled)
+    return [f"tell me {query}?", f"{query.upper()}!", " ".join(shuffled)]
+
+
+def evaluate_semantic_cache(
+    backend: RetrievalBackend,
+    queries: list[dict[str, object]],
+    k: int,
+    thresholds: Sequence[float],
+    model: str,
+    seed: int,
+) -> list[dict[str, object]]:
+    """Hit and false-hit rates of the semantic cache over the eval queries and paraphrases.
+
+    Queries and paraphrases are replayed in a seeded random order through a
+    cache per threshold. A hit is false when the cached query it matched has
+    different relevant documents than the incoming one (it answers another
+    question); ``recall@k`` compares the served results with a fresh search.
+    """
+    rng = random.Random(seed)
+    relevant: dict[str, frozenset[str]] = {}
+    for query in queries:
+        rel = frozenset(str(r) for r in cast(Sequence[Any], query["relevant_ids"]))
+        text = str(query["q"])
+        for variant in [text, *_paraphrases(text, rng)]:
+            relevant.setdefault(variant, rel)
+    stream = list(relevant)
+    rng.shuffle(stream)
+    fresh = {q: backend.search(q, k=k) for q in stream}
+    embedding = get_embedding_model(model, use_dummy=settings.use_dummy_embeddings)
+    vecs = {q: SemanticCache(embedding).embed(q) for q in stream}
+    rows: list[dict[str, object]] = []
+    for threshold in thresholds:
+        cache = SemanticCache(embedding, threshold=threshold, max_entries=len(stream))
+        hits = false_hits = found = found_fresh = 0
+        for q in stream:
+            hit = cache.lookup("eval", 0, q, vecs[q])
+            if hit is None:
+                results = fresh[q]
+                cache.store("eval", 0, q, results, vecs[q])
+            else:
+                results = hit.results
+                hits += 1
+                false_hits += relevant[hit.query] != relevant[q]
+            found += any(doc_id in relevant[q] for doc_id, _ in results)
+            found_fresh += any(doc_id in relevant[q] for doc_id, _ in fresh[q])
+        n = len(stream)
+        rows.append(
+            {
+                "threshold": threshold,
+                "model": model,
+                "queries": n,
+                "hits": hits,
+                "hit_rate": hits / n,
+                "false_hits": false_hits,
+                "false_hit_rate": false_hits / hits if hits else 0.0,
+                f"recall@{k}": found / n,
+                f"recall@{k}_uncached": found_fresh / n,
+            }
+        )
+    return rows
+
+
+def evaluate(
+    backend_name: str,
+    k: int,
+    seed: int,
+    manifest_path: Path,
+    prune: Sequence[float] = (),
+    prune_method: str = "term",
+    embedding_model: str | None = None,
+    compare_models: Sequence[str] = (),
+    semantic_cache: Sequence[float] = (),
+    cascade: Sequence[int] = (),
+    cascade_budgets: Sequence[float] = (),
+    rerank: str | None = None,
+    rerank_candidates: Sequence[int] = (),
+    rerank_budgets: Sequence[float] = (),
+) -> dict[str, object]:
+    set_deterministic(seed)
+    texts, ids = load_corpus(manifest_path)
+    embedding_model = embedding_model or settings.embedding_model
+    # A private instance: the served backends in the registry stay untouched
+    backend = create_backend(
+        backend_name,
+        embedding_model=embedding_model,
+        hybrid_alpha=settings.hybrid_alpha,
+        use_dummy_embeddings=settings.use_dummy_embeddings,
+    )
+    backend.build(texts, ids, seed=seed)
+    queries = load_queries(manifest_path.parent / "queries.jsonl")
+    metrics, latencies = run_queries(backend, queries, k)
+    n = len(queries)
 
     git_sha = subprocess.check_output(["git", "rev-parse", "HEAD"]).decode().strip()
     manifest = json.loads(manifest_path.read_text())
     report = {
         "git_sha": git_sha,
         "backend": backend_name,
+        "embedding_model": embedding_model if backend_name != "bm25" else None,
         "seed": seed,
         "manifest_version": manifest["version"],
         "metrics": metrics,
         "stats": {"queries": n, "docs": manifest["docs_count"]},
+        "latency": _latency_summary(latencies),
         "versions": {"numpy": np.__version__},
     }
+    if prune:
+        report["pruning"] = evaluate_pruning(texts, ids, queries, k, prune, prune_method)
+    if cascade or cascade_budgets:
+        report["cascade"] = evaluate_cascade(texts, ids, queries, k, cascade, cascade_budgets)
+    if rerank:
+        report["rerank"] = evaluate_rerank(
+            backend, texts, ids, queries, k, rerank, rerank_candidates, rerank_budgets
+        )
+    if semantic_cache:
+        report["semantic_cache"] = evaluate_semantic_cache(
+            backend, queries, k, semantic_cache, settings.semantic_cache_model, seed
+        )
+    if compare_models:
+        report["embedding_models"] = evaluate_models(texts, ids, queries, k, compare_models)
     reports_dir = Path("evals/reports")
     reports_dir.mkdir(parents=True, exist_ok=True)
     out_path = reports_dir / f"{backend_name}-{git_sha}.json"
     out_path.write_text(json.dumps(report, indent=2))
     Path("evals/latest.json").write_text(json.dumps(report, indent=2))
-    from rag import retriever as retriever_mod
-
-    retriever_mod._BACKENDS.pop(backend_name, None)
     return report
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Evaluate retrieval quality")
-    parser.add_argument("--backend", choices=["bm25", "embed", "hybrid"], required=True)
+    parser.add_argument("--backend", choices=BACKEND_NAMES, required=True)
     parser.add_argument("--k", type=int, default=10)
     parser.add_argument("--seed", type=int, default=1337)
     parser.add_argument("--manifest", type=Path, default=Path("data/manifest.json"))
+    parser.add_argument(
+        "--prune",
+        type=float,
+        action="append",
+        default=[],
+        metavar="KEEP",
+        help="also compare BM25 statically pruned to this fraction of postings (repeatable)",
+    )
+    parser.add_argument("--prune-method", choices=PRUNE_METHODS, default="term")
+    parser.add_argument(
+        "--embedding-model",
+        help="embedding model for embed/hybrid (default EMBEDDING_MODEL; 'hashing' needs no download)",
+    )
+    parser.add_argument(
+        "--compare-model",
+        action="append",
+        default=[],
+        metavar="MODEL",
+        help="also report quality and encode throughput of the embed backend with MODEL "
+        "(repeatable, e.g. hashing and sentence-transformers/all-MiniLM-L6-v2)",
+    )
+    parser.add_argument(
+        "--semantic-cache",
+        type=float,
+        action="append",
+        default=[],
+        metavar="THRESHOLD",
+        help="also replay the queries and paraphrases through the semantic result cache at "
+        "this cosine threshold and report hit and false-hit rates (repeatable)",
+    )
+    parser.add_argument(
+        "--cascade",
+        type=int,
+        action="append",
+        default=[],
+        metavar="N",
+        help="also compare the cascade backend rescoring N BM25 candidates against full "
+        "hybrid (repeatable)",
+    )
+    parser.add_argument(
+        "--cascade-budget",
+        type=float,
+        action="append",
+        default=[],
+        metavar="MS",
+        help="also compare the cascade under this per-query latency budget (repeatable)",
+    )
+    parser.add_argument(
+        "--rerank",
+        metavar="SCORER",
+        help="also report the backend re-ranked by SCORER ('proximity' or a cross-encoder model)",
+    )
+    parser.add_argument(
+        "--rerank-candidates",
+        type=int,
+        action="append",
+        default=[],
+        metavar="M",
+        help="re-rank the top M hits (repeatable, default 50)",
+    )
+    parser.add_argument(
+        "--rerank-budget",
+        type=float,
+        action="append",
+        default=[],
+        metavar="MS",
+        help="also re-rank the largest M under this per-query budget (repeatable)",
+    )
     args = parser.parse_args()
-    evaluate(args.backend, args.k, args.seed, args.manifest)
+    if any(m <= 0 for m in args.rerank_candidates) or any(b <= 0 for b in args.rerank_budget):
+        parser.error("--rerank-candidates and --rerank-budget values must be positive")
+    if any(n <= 0 for n in args.cascade) or any(b <= 0 for b in args.cascade_budget):
+        parser.error("--cascade and --cascade-budget values must be positive")
+    if any(not 0 < keep <= 1 for keep in args.prune):
+        parser.error("--prune values must be in (0, 1]")
+    if any(not -1 <= t <= 1 for t in args.semantic_cache):
+        parser.error("--semantic-cache thresholds must be in [-1, 1]")
+    report = evaluate(
+        args.backend,
+        args.k,
+        args.seed,
+        args.manifest,
+        args.prune,
+        args.prune_method,
+        args.embedding_model,
+        args.compare_model,
+        args.semantic_cache,
+        args.cascade,
+        args.cascade_budget,
+        args.rerank,
+        args.rerank_candidates,
+        args.rerank_budget,
+    )
+    for row in cast(list[dict[str, Any]], report.get("pruning", [])):
+        print(
+            f"keep={row['keep']:.2f} postings={row['postings']} "
+            f"size={row['size_ratio']:.2f} p50={row['latency']['p50_ms']:.2f}ms "
+            f"recall@{METRICS_KS[-1]}={row['metrics'][f'recall@{METRICS_KS[-1]}']:.3f} "
+            f"MRR={row['metrics']['MRR']:.3f}"
+        )
+    for row in cast(list[dict[str, Any]], report.get("cascade", [])):
+        label = "hybrid" if row["backend"] == "hybrid" else f"cascade N={row['candidates']}"
+        if row.get("budget_ms") is not None:
+            label += f" budget={row['budget_ms']:.2f}ms"
+        vs = f" vs_hybrid={row['recall_vs_hybrid']:.3f}" if "recall_vs_hybrid" in row else ""
+        print(
+            f"{label} p50={row['latency']['p50_ms']:.3f}ms "
+            f"recall@{METRICS_KS[-1]}={row['metrics'][f'recall@{METRICS_KS[-1]}']:.3f} "
+            f"MRR={row['metrics']['MRR']:.3f}{vs}"
+        )
+    for row in cast(list[dict[str, Any]], report.get("rerank", [])):
+        label = f"rerank M={row['top_m']}" if row["top_m"] else args.backend
+        if row.get("budget_ms") is not None:
+            label += f" budget={row['budget_ms']:.2f}ms"
+        print(
+            f"{label} p50={row['latency']['p50_ms']:.3f}ms "
+            f"p95={row['latency']['p95_ms']:.3f}ms "
+            f"NDCG@10={row['metrics']['NDCG@10']:.3f} MRR={row['metrics']['MRR']:.3f}"
+        )
+    for row in cast(list[dict[str, Any]], report.get("semantic_cache", [])):
+        print(
+            f"threshold={row['threshold']:.2f} hit_rate={row['hit_rate']:.3f} "
+            f"false_hit_rate={row['false_hit_rate']:.3f} "
+            f"recall@{args.k}={row[f'recall@{args.k}']:.3f} "
+            f"(uncached {row[f'recall@{args.k}_uncached']:.3f})"
+        )
+    for row in cast(list[dict[str, Any]], report.get("embedding_models", [])):
+        if "error" in row:
+            print(f"model={row['model']} error={row['error']}")
+            continue
+        print(
+            f"model={row['model']} docs/s={row['docs_per_s']:.0f} "
+            f"p50={row['latency']['p50_ms']:.2f}ms "
+            f"recall@{METRICS_KS[-1]}={row['metrics'][f'recall@{METRICS_KS[-1]}']:.3f} "
+            f"MRR={row['metrics']['MRR']:.3f}"
+        )
 
 
 if __name__ == "__main__":
@@ -48,6 +48,51 @@ def test_eval_outputs_schema(monkeypatch):
         assert {"recall@1", "MRR", "NDCG@10"}.issubset(report["metrics"].keys())
 
 
+def test_eval_reports_pruned_vs_unpruned(monkeypatch):
+    monkeypatch.setenv("USE_DUMMY_EMBEDDINGS", "true")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manifest = _make_tiny_dataset(Path(tmpdir))
+        report = eval_retrieval.evaluate(
+            "bm25", 10, 1337, manifest, prune=[0.5], prune_method="doc"
+        )
+        full, pruned = report["pruning"]
+        assert full["keep"] == 1.0 and pruned["keep"] == 0.5
+        assert pruned["postings"] < full["postings"]
+        assert {"p50_ms", "p95_ms"} <= pruned["latency"].keys()
+        assert {"recall@10", "MRR"} <= pruned["metrics"].keys()
+
+
+def test_eval_reports_semantic_cache_false_hits(monkeypatch):
+    monkeypatch.setenv("USE_DUMMY_EMBEDDINGS", "true")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manifest = _make_tiny_dataset(Path(tmpdir))
+        report = eval_retrieval.evaluate("bm25", 10, 1337, manifest, semantic_cache=[0.0, 1.0])
+        loose, strict = report["semantic_cache"]
+        assert loose["hit_rate"] > strict["hit_rate"]
+        assert loose["false_hits"] > 0 and strict["false_hit_rate"] == 0.0
+        assert strict["recall@10"] == strict["recall@10_uncached"]
+
+
+def test_eval_reports_rerank_tradeoffs(monkeypatch):
+    monkeypatch.setenv("USE_DUMMY_EMBEDDINGS", "true")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manifest = _make_tiny_dataset(Path(tmpdir))
+        report = eval_retrieval.evaluate(
+            "bm25",
+            10,
+            1337,
+            manifest,
+            rerank="proximity",
+            rerank_candidates=[1, 2],
+            rerank_budgets=[5.0],
+        )
+        base, *reranked = report["rerank"]
+        assert base["top_m"] == 0
+        assert [(r["top_m"], r["budget_ms"]) for r in reranked] == [(1, None), (2, None), (2, 5.0)]
+        assert all({"NDCG@10", "MRR"} <= r["metrics"].keys() for r in reranked)
+        assert all("p95_ms" in r["latency"] for r in reranked)
+
+
 def test_compare_eval_regression_guard(tmp_path):
     current = tmp_path / "cur.json"
     baseline = tmp_path / "base.json"
@@ -1,18 +1,356 @@
 from __future__ import annotations
 
+import time
+
 from fastapi.testclient import TestClient
 
-from fastapi_app.app import config
+from fastapi_app.app import config, main
 from fastapi_app.app.main import app
+from rag import retriever
+from rag.docstore import DocStore, write_docstore
+from rag.registry import IndexHandle
 
 
-def test_api_search_backends() -> None:
+def test_api_search_backends(monkeypatch) -> None:
     config.settings.use_dummy_embeddings = True
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
     client = TestClient(app)
-    for name in ["bm25", "embed", "hybrid"]:
+    for name in ["bm25", "embed", "hybrid", "cascade"]:
         r = client.get("/api/v1/search", params={"q": "fast", "backend": name, "k": 2})
         assert r.status_code == 200
         data = r.json()
         assert data["backend"] == name
         assert len(data["results"]) == 2
         assert {"doc_id", "score", "text"} <= data["results"][0].keys()
+
+
+def _rebuild_bm25() -> IndexHandle:
+    for fut in retriever.rebuild_backends(["bm25"], **main._backend_options()).values():
+        fut.result()
+    with retriever.lease_backend("bm25", **main._backend_options()) as handle:
+        return handle
+
+
+def test_api_search_hydrates_from_docstore(tmp_path) -> None:
+    path = tmp_path / "docs.store"
+    write_docstore(path, [("doc1", "stale text from an earlier run")])
+    retriever.use_doc_store(str(path))
+    try:
+        # Queries never write the store; the rebuild that indexes the corpus does
+        client = TestClient(app)
+        params = {"q": "fastapi", "backend": "bm25", "k": 1}
+        assert client.get("/api/v1/search", params=params).json()["results"][0]["text"] == (
+            "fastapi makes apis fast"
+        )
+        handle = _rebuild_bm25()
+        assert isinstance(retriever.get_doc_store(handle.source), DocStore)
+        assert dict(DocStore(path)) == dict(retriever.DOCS_BY_ID)
+        assert client.get("/api/v1/search", params=params).json()["results"][0]["text"] == (
+            "fastapi makes apis fast"
+        )
+    finally:
+        retriever.use_doc_store(None)
+
+
+def test_api_docstore_follows_corpus_updates(tmp_path) -> None:
+    retriever.use_doc_store(str(tmp_path / "docs.store"))
+    client = TestClient(app)
+    params = {"q": "fastapi", "backend": "bm25", "k": 1}
+    original = list(retriever._CORPUS)
+    try:
+        _rebuild_bm25()
+        retriever.add_documents([("doc1", "fastapi makes apis faster")])
+        handle = _rebuild_bm25()
+        assert retriever.get_doc_store(handle.source)["doc1"] == "fastapi makes apis faster"
+        hit = client.get("/api/v1/search", params=params).json()["results"][0]
+        assert hit == {"doc_id": "doc1", "score": hit["score"], "text": "fastapi makes apis faster"}
+    finally:
+        retriever.use_doc_store(None)
+        retriever.set_corpus(original)
+        _rebuild_bm25()
+
+
+def test_api_search_snippet_mode() -> None:
+    client = TestClient(app)
+    r = client.get(
+        "/api/v1/search", params={"q": "pizza", "backend": "bm25", "k": 2, "snippet": True}
+    )
+    assert r.status_code == 200
+    top = r.json()["results"][0]
+    assert "text" not in top
+    snip = top["snippet"]
+    assert snip["text"] == "I love pizza"
+    assert [snip["text"][s:e] for s, e in snip["highlights"]] == ["pizza"]
+
+
+def test_api_search_metadata_filter(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    config.settings.use_dummy_embeddings = True
+    client = TestClient(app)
+    for name in ["bm25", "embed", "hybrid"]:
+        r = client.get(
+            "/api/v1/search",
+            params=[
+                ("q", "the"),
+                ("backend", name),
+                ("k", 5),
+                ("filter", "topic:animals"),
+                ("filter", "tenant:acme"),
+            ],
+        )
+        assert r.status_code == 200
+        assert sorted(h["doc_id"] for h in r.json()["results"]) == ["doc1", "doc4"]
+    r = client.get("/api/v1/search", params={"q": "the", "filter": "doc_id_prefix:doc5"})
+    assert [h["doc_id"] for h in r.json()["results"]] == ["doc5"]
+    r = client.get("/api/v1/search", params={"q": "the", "filter": "topic"})
+    assert r.status_code == 400
+
+
+def test_api_search_boolean_query(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    client = TestClient(app)
+    r = client.get("/api/v1/search", params={"q": "the NOT cat", "k": 5})
+    assert [h["doc_id"] for h in r.json()["results"]] == ["doc4"]
+    r = client.get("/api/v1/search", params={"q": "cat AND", "k": 5})
+    assert r.status_code == 400
+
+
+def test_api_rebuild_hot_swaps_generation(monkeypatch) -> None:
+    from rag import retriever
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    client = TestClient(app)
+    before = client.get("/api/v1/search", params={"q": "zebra", "k": 1}).json()
+    original = list(retriever._CORPUS)
+    retriever.set_corpus(original + [("doc6", "a zebra crossing")])
+    try:
+        # old generation keeps serving the old corpus until the swap
+        assert client.get("/api/v1/search", params={"q": "zebra", "k": 1}).json() == before
+        r = client.post("/api/v1/index/rebuild", json={"backends": ["bm25"]})
+        assert r.status_code == 202 and r.json()["scheduled"] == ["bm25"]
+        for _ in range(100):
+            after = client.get("/api/v1/search", params={"q": "zebra", "k": 1}).json()
+            if after["generation"] > before["generation"]:
+                break
+            time.sleep(0.01)
+        assert after["results"][0]["doc_id"] == "doc6"
+        ready = client.get("/api/v1/ready").json()
+        assert ready["indexes"]["bm25"] == after["generation"] <= ready["generation"]
+        assert client.post("/api/v1/index/rebuild", json={"backends": ["nope"]}).status_code == 400
+    finally:
+        retriever.set_corpus(original)
+        for fut in retriever.rebuild_backends(
+            embedding_model="", hybrid_alpha=0.5, use_dummy_embeddings=True
+        ).values():
+            fut.result()
+
+
+def test_api_collection_search_and_metrics(tmp_path, monkeypatch) -> None:
+    from fastapi_app.app import main
+    from rag.catalog import write_collection
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(config.settings, "collections_dir", str(tmp_path))
+    monkeypatch.setattr(main, "_catalog", None)
+    write_collection(tmp_path, "acme", [("a1", "rockets and engines"), ("a2", "gardening tips")])
+    client = TestClient(app)
+
+    r = client.get("/api/v1/collections/acme/search", params={"q": "rockets", "k": 1})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["collection"] == "acme"
+    top = body["results"][0]
+    assert (top["doc_id"], top["text"]) == ("a1", "rockets and engines")
+    assert client.get("/api/v1/collections/nope/search", params={"q": "x"}).status_code == 404
+    listing = client.get("/api/v1/collections").json()
+    assert listing["collections"] == ["acme"] and listing["loaded"]["acme"]["resident"]
+    metrics = client.get("/metrics").text
+    assert 'rag_collection_resident{collection="acme"} 1.0' in metrics
+    assert "rag_collection_load_seconds_count" in metrics
+
+
+def test_api_repeat_query_hits_the_embedding_cache(monkeypatch) -> None:
+    from rag.models import get_query_cache
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    client = TestClient(app)
+    before = get_query_cache().stats()["hits"]
+    for name in ["embed", "hybrid", "embed"]:
+        r = client.get("/api/v1/search", params={"q": "cache me please", "backend": name})
+        assert r.status_code == 200
+    assert get_query_cache().stats()["hits"] >= before + 2
+    assert "rag_query_embedding_cache_hits_total" in client.get("/metrics").text
+
+
+def test_api_semantic_cache_serves_paraphrases(monkeypatch) -> None:
+    from fastapi_app.app import main
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(config.settings, "semantic_cache", True)
+    monkeypatch.setattr(config.settings, "semantic_cache_threshold", 0.9)
+    monkeypatch.setattr(main, "_semantic_cache", None)
+    client = TestClient(app)
+
+    def search(q: str) -> dict:
+        r = client.get("/api/v1/search", params={"q": q, "backend": "bm25", "k": 2})
+        assert r.status_code == 200
+        return r.json()
+
+    first = search("pizza recipes")
+    assert "semantic_cache" not in first
+    again = search("Pizza recipes?")
+    assert again["semantic_cache"]["hit"] and again["semantic_cache"]["query"] == "pizza recipes"
+    assert again["results"] == first["results"] and again["query"] == "Pizza recipes?"
+    assert "semantic_cache" not in search("fastapi")
+    metrics = client.get("/metrics").text
+    assert "rag_semantic_cache_hits_total 1.0" in metrics
+
+
+def test_api_semantic_cache_respects_query_syntax_and_budget(monkeypatch) -> None:
+    from fastapi_app.app import main
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(config.settings, "semantic_cache", True)
+    monkeypatch.setattr(main, "_semantic_cache", None)
+    client = TestClient(app)
+
+    def search(q: str, **params) -> dict:
+        r = client.get("/api/v1/search", params={"q": q, "k": 5, **params})
+        assert r.status_code == 200
+        return r.json()
+
+    assert search("quick fox", backend="bm25")["results"]
+    phrase = search('"quick fox"', backend="bm25")
+    assert "semantic_cache" not in phrase
+    assert phrase["results"] == search('"quick fox"', backend="bm25")["results"]
+    assert "semantic_cache" not in search("fox NOT dog", backend="bm25")
+
+    search("lazy dog", backend="cascade", budget_ms=1)
+    assert "semantic_cache" not in search("lazy dog", backend="cascade", budget_ms=5000)
+    assert search("lazy dog", backend="cascade", budget_ms=5000)["semantic_cache"]["hit"]
+
+
+def test_api_search_reranks_within_budget(monkeypatch) -> None:
+    from fastapi_app.app import main
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    client = TestClient(app)
+    params = {"q": "the quick fox", "backend": "bm25", "k": 2}
+    assert client.get("/api/v1/search", params={**params, "rerank": True}).status_code == 400
+    plain = client.get("/api/v1/search", params=params).json()
+    assert "rerank" not in plain
+
+    monkeypatch.setattr(config.settings, "rerank_scorer", "proximity")
+    monkeypatch.setattr(config.settings, "rerank_candidates", 4)
+    monkeypatch.setattr(main, "_reranker", None)
+    assert "rerank" not in client.get("/api/v1/search", params=params).json()  # opt-in
+    body = client.get("/api/v1/search", params={**params, "rerank": True}).json()
+    assert body["rerank"]["scorer"] == "proximity"
+    assert body["rerank"]["candidates"] >= 2 and not body["rerank"]["exhausted"]
+    assert body["results"][0]["doc_id"] == "doc4" and len(body["results"]) == 2
+    scores = [hit["score"] for hit in body["results"]]
+    assert scores == sorted(scores, reverse=True)  # the scorer's, not first-stage ones
+
+    starved_params = {**params, "rerank": True, "rerank_budget_ms": 1e-6}
+    starved = client.get("/api/v1/search", params=starved_params).json()
+    assert starved["rerank"]["scored"] == 0 and starved["rerank"]["exhausted"]
+    assert [h["doc_id"] for h in starved["results"]] == [h["doc_id"] for h in plain["results"]]
+    assert all(hit["score"] is None for hit in starved["results"])
+
+    monkeypatch.setattr(config.settings, "rerank_default", True)
+    assert "rerank" in client.get("/api/v1/search", params=params).json()
+    off = client.get("/api/v1/search", params={**params, "rerank": False}).json()
+    assert "rerank" not in off
+
+
+def test_api_search_reports_stage_timings(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    client = TestClient(app)
+    r = client.get("/api/v1/search", params={"q": "fox", "backend": "hybrid"})
+    assert r.status_code == 200
+    timings = dict(part.split(";dur=") for part in r.headers["Server-Timing"].split(", "))
+    assert {"search.lease", "bm25.score", "embed.encode", "hybrid.fusion"} <= timings.keys()
+    assert {"search.hydrate", "search.serialize"} <= timings.keys()
+    assert all(float(ms) >= 0 for ms in timings.values())
+    metrics = client.get("/metrics").text
+    assert 'rag_search_stage_seconds_bucket{le="0.001",stage="hybrid.fusion"}' in metrics
+
+
+def test_api_cascade_rejected_with_sharded_bm25(monkeypatch) -> None:
+    monkeypatch.setattr(config.settings, "bm25_shards", 2)
+    r = TestClient(app).get("/api/v1/search", params={"q": "fox", "backend": "cascade"})
+    assert r.status_code == 400 and "bm25_shards" in r.json()["detail"]
+
+
+def test_api_search_deadline_partial_results_and_timeouts(monkeypatch) -> None:
+    import numpy as np
+
+    from fastapi_app.app.main import _backend_options
+    from rag import retriever
+    from rag.backends.embed import DummyEmbeddingModel
+    from rag.registry import IndexRegistry
+
+    class SlowModel(DummyEmbeddingModel):
+        def encode_texts(self, texts: list[str]) -> np.ndarray:
+            time.sleep(0.5)
+            return super().encode_texts(texts)
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(retriever, "_REGISTRY", IndexRegistry())
+    client = TestClient(app)
+    assert client.get("/api/v1/search", params={"q": "fox", "backend": "hybrid"}).status_code == 200
+    with retriever.lease_backend("hybrid", **_backend_options()) as handle:
+        monkeypatch.setattr(handle.backend.embed, "model", SlowModel())
+
+    start = time.monotonic()
+    r = client.get("/api/v1/search", params={"q": "fox", "backend": "hybrid", "timeout_ms": 100})
+    assert time.monotonic() - start < 0.45
+    body = r.json()
+    assert r.status_code == 200 and body["partial"] is True and body["abandoned"] == ["embed"]
+    assert body["results"][0]["doc_id"] == "doc4"
+
+    r = client.get("/api/v1/search", params={"q": "fox"}, headers={"X-Request-Timeout-Ms": "1e-6"})
+    assert r.status_code == 504
+    assert r.headers["content-type"].startswith("application/problem+json")
+    r = client.get("/api/v1/search", params={"q": "fox"}, headers={"X-Request-Timeout-Ms": "soon"})
+    assert r.status_code == 400
+
+
+def test_api_serves_bm25_while_embedding_backends_warm_up(monkeypatch) -> None:
+    from concurrent.futures import Future
+
+    from rag import retriever
+    from rag.registry import IndexRegistry
+
+    monkeypatch.setattr(config.settings, "rate_limit_qps", 0.0)
+    monkeypatch.setattr(retriever, "_REGISTRY", IndexRegistry())
+    pending: Future[int] = Future()
+    monkeypatch.setattr(retriever, "_WARMING", {"embed": pending, "hybrid": pending})
+    client = TestClient(app)
+
+    r = client.get("/api/v1/search", params={"q": "fox", "backend": "embed"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(config.settings.warmup_retry_after_s)
+    assert r.headers["content-type"].startswith("application/problem+json")
+
+    r = client.get("/api/v1/search", params={"q": "fox", "backend": "hybrid", "k": 1})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["degraded"] is True and body["served_by"] == "bm25"
+    assert body["results"][0]["doc_id"] == "doc4"
+    # cascade isn't warmed itself but needs the embedding index
+    r = client.get("/api/v1/search", params={"q": "fox", "backend": "cascade", "k": 1})
+    assert r.status_code == 200 and r.json()["served_by"] == "bm25"
+
+    backends = client.get("/api/v1/ready").json()["backends"]
+    assert backends == {
+        "bm25": "ready",
+        "embed": "warming",
+        "hybrid": "warming",
+        "cascade": "cold",
+    }
+    pending.set_exception(RuntimeError("model download failed"))
+    assert client.get("/api/v1/ready").json()["backends"]["embed"] == "failed"
+    # a failed warmup falls back to building on first use
+    r = client.get("/api/v1/search", params={"q": "fox", "backend": "hybrid"})
+    assert r.status_code == 200 and "degraded" not in r.json()
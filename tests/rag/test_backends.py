@@ -3,6 +3,7 @@ from __future__ import annotations
 import builtins
 import importlib
 
+import numpy as np
 import pytest
 
 from rag.backends.bm25 import BM25Backend
@@ -79,3 +80,40 @@ def test_embed_fallback_without_faiss(monkeypatch: pytest.MonkeyPatch) -> None:
     backend = embed_mod.EmbeddingBackend(embed_mod.DummyEmbeddingModel())
     backend.build(["a", "b"], ["a", "b"])
     assert backend.search("a", k=1)
+
+
+@pytest.mark.parametrize(("partition", "processes"), [("hash", False), ("range", True)])
+def test_sharded_bm25_matches_unsharded(partition: str, processes: bool) -> None:
+    from rag.backends.sharded import ShardedBackend
+
+    words = ["cat", "dog", "fish", "bird", "the", "a", "mat", "pet"]
+    docs = [" ".join(words[(i * j) % len(words)] for j in range(i % 7 + 1)) for i in range(60)]
+    ids = [f"d{i}" for i in range(len(docs))]
+    ref = BM25Backend()
+    ref.build(docs, ids)
+    with ShardedBackend(BM25Backend, 3, partition=partition, processes=processes) as sharded:
+        sharded.build(docs, ids)
+        for q in ["cat", "the dog", "fish mat pet", "unknown"]:
+            assert sharded.search(q, k=7) == ref.search(q, k=7)
+
+
+def test_filtered_search_matches_post_filtering() -> None:
+    from rag.backends.sharded import ShardedBackend
+
+    docs = [f"cat {'dog ' * (i % 4)}fish {i}" for i in range(40)]
+    ids = [f"d{i}" for i in range(40)]
+    for allowed in (np.arange(0, 40, 7), np.arange(3, 40)):
+        keep = {ids[i] for i in allowed}
+        bm = BM25Backend()
+        bm.build(docs, ids)
+        expected = [h for h in bm.search("dog fish", k=40) if h[0] in keep][:5]
+        assert bm.search("dog fish", k=5, allowed=allowed) == expected
+        sharded = ShardedBackend(BM25Backend, 3, processes=False)
+        sharded.build(docs, ids)
+        assert sharded.search("dog fish", k=5, allowed=allowed) == expected
+        em = EmbeddingBackend(DummyEmbeddingModel())
+        em.build(docs, ids)
+        full = [h for h in em.search("dog", k=40) if h[0] in keep][:5]
+        got = em.search("dog", k=5, allowed=allowed)
+        assert [i for i, _ in got] == [i for i, _ in full]
+        assert [s for _, s in got] == pytest.approx([s for _, s in full])